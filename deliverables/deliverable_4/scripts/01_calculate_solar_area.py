@@ -3,6 +3,8 @@ Script para calcular área útil para paneles solares
 
 Aplica factor de eficiencia de 0.476 a las áreas totales de techos
 para estimar área realmente utilizable para instalación de paneles.
+Si el motor por edificación (src/preprocessing/usable_roof_area.py) ya
+calculó properties.useful_area_m2 y el join la sumó, se usa esa suma.
 
 Factor de eficiencia = orientación (0.7) × pendiente (0.8) × obstrucciones (0.85)
 
@@ -13,7 +15,6 @@ Deliverable: 4
 
 import sys
 from pathlib import Path
-from datetime import datetime
 import logging
 
 PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
@@ -31,12 +32,103 @@ logger = logging.getLogger(__name__)
 # Factor de eficiencia para área útil
 EFFICIENCY_FACTOR = 0.476  # 47.6% del área total
 
-def calculate_solar_area(db):
+def per_building_complete(dataset):
+    """Condición: todas las edificaciones del documento tienen useful_area_m2"""
+    buildings = f'${dataset}.useful_area_buildings'
+    return {
+        '$and': [
+            {'$gt': [{'$ifNull': [buildings, 0]}, 0]},
+            {'$eq': [buildings, f'${dataset}.count']}
+        ]
+    }
+
+
+def useful_area_fields(dataset):
+    """
+    Expresiones de agregación que derivan el área útil de un dataset
+
+    Se evalúan en el servidor dentro de un update con pipeline. Si el join
+    sumó properties.useful_area_m2 para todas las edificaciones del
+    municipio, se usa esa suma geométrica; si no, área total × factor.
+    Sin área (> 0) se conservan los valores actuales.
+
+    Args:
+        dataset (str): Subdocumento a procesar ('microsoft' o 'google')
+
+    Returns:
+        dict: Campos para un stage $set
+    """
+    total = f'${dataset}.total_area_m2'
+    per_building = per_building_complete(dataset)
+    has_area = {'$or': [per_building, {'$gt': [{'$ifNull': [total, 0]}, 0]}]}
+    area_util = {
+        '$cond': [
+            per_building,
+            f'${dataset}.useful_area_m2',
+            {'$multiply': [total, EFFICIENCY_FACTOR]}
+        ]
+    }
+
+    def derived(field, expr):
+        return {'$cond': [has_area, expr, f'${dataset}.{field}']}
+
+    return {
+        f'{dataset}.area_util_m2': derived('area_util_m2', {'$round': [area_util, 2]}),
+        f'{dataset}.area_util_km2': derived(
+            'area_util_km2', {'$round': [{'$divide': [area_util, 1_000_000]}, 4]}
+        ),
+        f'{dataset}.area_util_ha': derived(
+            'area_util_ha', {'$round': [{'$divide': [area_util, 10_000]}, 2]}
+        )
+    }
+
+
+def confidence_hist_fields():
+    """Área útil por umbral de confianza Google (histograma del join)"""
+    area_ge = '$google.confidence_hist.area_ge_m2'
+    useful_ge = '$google.confidence_hist.useful_area_ge_m2'
+    return {
+        'google.confidence_hist.area_util_ge_m2': {
+            '$switch': {
+                'branches': [
+                    {
+                        'case': {'$and': [per_building_complete('google'), {'$isArray': useful_ge}]},
+                        'then': useful_ge
+                    },
+                    {
+                        'case': {'$isArray': area_ge},
+                        'then': {
+                            '$map': {
+                                'input': area_ge,
+                                'in': {'$round': [{'$multiply': ['$$this', EFFICIENCY_FACTOR]}, 2]}
+                            }
+                        }
+                    }
+                ],
+                'default': '$google.confidence_hist.area_util_ge_m2'
+            }
+        }
+    }
+
+
+def calculate_solar_area(db, collection_name='buildings_by_municipality', query=None):
     """
     Calcula área útil para paneles solares basado en área total de techos
 
+    Todo el cálculo ocurre en MongoDB con un único update_many con pipeline,
+    sin traer documentos a Python. Funciona igual para cualquier granularidad
+    que tenga subdocumentos microsoft/google con total_area_m2.
+
+    Los totales del resumen salen de un segundo aggregate: $merge tiene que
+    ser la última etapa de un pipeline (y no se admite dentro de $facet), así
+    que la escritura y el $group no caben en una sola agregación. Esa
+    segunda lectura recorre un documento por municipio (o celda), no las
+    edificaciones.
+
     Args:
         db: Conexión a MongoDB
+        collection_name (str): Colección a actualizar
+        query (dict, optional): Filtro de documentos a procesar
     """
     logger.info("=" * 70)
     logger.info("CÁLCULO DE ÁREA ÚTIL PARA PANELES SOLARES")
@@ -45,73 +137,35 @@ def calculate_solar_area(db):
     logger.info("")
 
     # Colección de entrada
-    buildings_coll = db.buildings_by_municipality
-
-    # Contar documentos
-    total_docs = buildings_coll.count_documents({})
-    logger.info(f"Total municipios a procesar: {total_docs}")
-
-    # Procesamiento
-    updated = 0
-    errors = 0
-
-    for doc in buildings_coll.find({}):
-        try:
-            muni_code = doc.get('muni_code', 'unknown')
-            muni_name = doc.get('muni_name', 'Unknown')
-
-            # Procesar Microsoft
-            ms_data = doc.get('microsoft', {})
-            if 'total_area_m2' in ms_data and ms_data['total_area_m2'] > 0:
-                area_total = ms_data['total_area_m2']
-                area_util = area_total * EFFICIENCY_FACTOR
-
-                ms_data['area_util_m2'] = round(area_util, 2)
-                ms_data['area_util_km2'] = round(area_util / 1_000_000, 4)
-                ms_data['area_util_ha'] = round(area_util / 10_000, 2)
-
-            # Procesar Google
-            gg_data = doc.get('google', {})
-            if 'total_area_m2' in gg_data and gg_data['total_area_m2'] > 0:
-                area_total = gg_data['total_area_m2']
-                area_util = area_total * EFFICIENCY_FACTOR
-
-                gg_data['area_util_m2'] = round(area_util, 2)
-                gg_data['area_util_km2'] = round(area_util / 1_000_000, 4)
-                gg_data['area_util_ha'] = round(area_util / 10_000, 2)
-
-            # Actualizar documento
-            buildings_coll.update_one(
-                {'_id': doc['_id']},
-                {
-                    '$set': {
-                        'microsoft': ms_data,
-                        'google': gg_data,
-                        'updated_at': datetime.utcnow()
-                    }
-                }
-            )
-
-            updated += 1
+    buildings_coll = db[collection_name]
+    query = query or {}
 
-            if updated % 20 == 0:
-                logger.info(f"Procesados: {updated}/{total_docs}")
+    # Update con pipeline: MongoDB deriva todos los campos en el servidor
+    update_pipeline = [
+        {
+            '$set': {
+                **useful_area_fields('microsoft'),
+                **useful_area_fields('google'),
+                **confidence_hist_fields(),
+                'updated_at': '$$NOW'
+            }
+        }
+    ]
 
-        except Exception as e:
-            logger.error(f"Error en {muni_name}: {str(e)}")
-            errors += 1
-            continue
+    logger.info(f"Ejecutando update_many en {collection_name}...")
+    result = buildings_coll.update_many(query, update_pipeline)
 
     # Resumen
     logger.info("")
     logger.info("=" * 70)
     logger.info("RESUMEN")
     logger.info("=" * 70)
-    logger.info(f"Municipios actualizados: {updated}")
-    logger.info(f"Errores: {errors}")
+    logger.info(f"Documentos encontrados: {result.matched_count}")
+    logger.info(f"Documentos actualizados: {result.modified_count}")
 
-    # Calcular totales
+    # Calcular totales (segunda lectura, solo de los campos sumados)
     pipeline = [
+        {'$match': query},
         {
             '$group': {
                 '_id': None,
@@ -125,8 +179,8 @@ def calculate_solar_area(db):
 
     result = list(buildings_coll.aggregate(pipeline))
 
-    if result:
-        totals = result[0]
+    totals = result[0] if result else {}
+    if totals:
         logger.info("")
         logger.info("Totales calculados:")
         logger.info(f"  Microsoft:")
@@ -140,6 +194,8 @@ def calculate_solar_area(db):
     logger.info("Cálculo completado exitosamente")
     logger.info("=" * 70)
 
+    return totals
+
 
 def main():
     """Función principal"""
@@ -150,6 +206,7 @@ def main():
         logger.error(f"ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
+        sys.exit(1)
 
 
 if __name__ == '__main__':
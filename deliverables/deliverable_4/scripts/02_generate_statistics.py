@@ -18,6 +18,10 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.database.connection import get_database
+from src.analysis.confidence_histogram import threshold_index
+from src.analysis.size_distribution import QUANTILES
+from src.analysis.solar_scenarios import load_aggregates
+from src.analysis.uncertainty import uncertainty_columns
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,9 +29,66 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Umbrales de confianza Google reportados (se leen del histograma del join)
+DEFAULT_CONFIDENCE_THRESHOLDS = [0.70, 0.80, 0.90]
+
+COVERAGE_SOURCES = ('vector', 'raster')
+
+
+def confidence_threshold_fields(thresholds):
+    """
+    Campos $project con conteo y área útil de Google por umbral de confianza
+
+    Cada umbral es una lectura directa ($arrayElemAt) del histograma
+    acumulado guardado por el join, sin volver a recorrer edificaciones.
+    """
+    fields = {}
+    for threshold in thresholds:
+        idx = threshold_index(threshold)
+        suffix = f"conf{int(round(threshold * 100))}"
+        fields[f'gg_buildings_count_{suffix}'] = {
+            '$arrayElemAt': ['$google.confidence_hist.count_ge', idx]
+        }
+        fields[f'gg_useful_area_km2_{suffix}'] = {
+            '$round': [
+                {'$divide': [
+                    {'$arrayElemAt': ['$google.confidence_hist.area_util_ge_m2', idx]},
+                    1_000_000
+                ]},
+                4
+            ]
+        }
+    return fields
+
+
+def coverage_field(dataset, vector_field, source):
+    """
+    Expresión de cobertura (%) según la fuente
+
+    'raster' usa la estadística zonal de src/analysis/coverage_raster.py
+    (<dataset>.raster_coverage.coverage_pct) y, si el municipio no la
+    tiene, la cobertura vectorial.
+    """
+    if source == 'raster':
+        return {'$round': [{'$ifNull': [f'${dataset}.raster_coverage.coverage_pct', vector_field]}, 4]}
+    return {'$round': [vector_field, 4]}
+
+
+def generate_statistics_mongodb(db, confidence_thresholds=None, uncertainty_samples=0, workers=None,
+                                coverage_source='vector'):
+    """
+    Genera estadísticas usando agregaciones de MongoDB
+
+    Args:
+        db: Conexión a MongoDB
+        confidence_thresholds (list): Umbrales de confianza Google a reportar
+        uncertainty_samples (int): Muestras Monte Carlo para P10/P50/P90 (0 = desactivado)
+        workers (int, optional): Procesos para la simulación Monte Carlo
+        coverage_source (str): 'vector' (área de techos / área municipal) o 'raster'
+    """
+    if confidence_thresholds is None:
+        confidence_thresholds = DEFAULT_CONFIDENCE_THRESHOLDS
 
-def generate_statistics_mongodb(db):
-    """Genera estadísticas usando agregaciones de MongoDB"""
     logger.info("=" * 70)
     logger.info("GENERACIÓN DE ESTADÍSTICAS - AGREGACIONES MONGODB")
     logger.info("=" * 70)
@@ -144,7 +205,8 @@ def generate_statistics_mongodb(db):
                 'ms_useful_area_km2': {'$round': ['$microsoft.area_util_km2', 4]},
                 'ms_useful_area_ha': {'$round': ['$microsoft.area_util_ha', 2]},
                 'ms_density_buildings_km2': {'$round': ['$ms_density', 2]},
-                'ms_coverage_pct': {'$round': ['$ms_coverage', 4]},
+                'ms_coverage_pct': coverage_field('microsoft', '$ms_coverage', coverage_source),
+                **{f'ms_area_p{q}_m2': f'$microsoft.area_quantiles.p{q}' for q in QUANTILES},
 
                 # Google
                 'gg_buildings_count': '$google.count',
@@ -153,12 +215,23 @@ def generate_statistics_mongodb(db):
                 'gg_useful_area_km2': {'$round': ['$google.area_util_km2', 4]},
                 'gg_useful_area_ha': {'$round': ['$google.area_util_ha', 2]},
                 'gg_density_buildings_km2': {'$round': ['$gg_density', 2]},
-                'gg_coverage_pct': {'$round': ['$gg_coverage', 4]},
+                'gg_coverage_pct': coverage_field('google', '$gg_coverage', coverage_source),
+                **{f'gg_area_p{q}_m2': f'$google.area_quantiles.p{q}' for q in QUANTILES},
 
                 # Comparación
                 'diff_count': 1,
                 'diff_pct': {'$round': ['$diff_pct', 2]},
-                'agreement_score': {'$round': ['$agreement_score', 4]}
+                'agreement_score': {'$round': ['$agreement_score', 4]},
+
+                # Emparejamiento por edificación (src/analysis/footprint_matching.py)
+                'matched_buildings': '$footprint_matching.matched',
+                'ms_only_count': '$footprint_matching.ms_only',
+                'gg_only_count': '$footprint_matching.google_only',
+                'fused_buildings_count': '$footprint_matching.fused_count',
+                'footprint_agreement': '$footprint_matching.agreement',
+
+                # Google por umbral de confianza
+                **confidence_threshold_fields(confidence_thresholds)
             }
         },
         {
@@ -179,6 +252,14 @@ def generate_statistics_mongodb(db):
     # Convertir a DataFrame
     df = pd.DataFrame(results)
 
+    # Percentiles de área útil (Monte Carlo sobre los mismos agregados)
+    if uncertainty_samples:
+        logger.info(f"Modo incertidumbre: {uncertainty_samples:,} muestras")
+        bands = uncertainty_columns(load_aggregates(db), uncertainty_samples, num_workers=workers)
+        df['muni_code'] = df['muni_code'].astype(str)
+        df = df.merge(bands, on='muni_code', how='left')
+        logger.info("")
+
     # Exportar CSV
     output_dir = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'tables'
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -222,14 +303,47 @@ def generate_statistics_mongodb(db):
 
 def main():
     """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Estadísticas por municipio PDET')
+    parser.add_argument(
+        '--confidence-thresholds',
+        type=float,
+        nargs='+',
+        default=DEFAULT_CONFIDENCE_THRESHOLDS,
+        help='Umbrales de confianza Google a reportar (default: 0.70 0.80 0.90)'
+    )
+    parser.add_argument(
+        '--uncertainty',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Agregar columnas P10/P50/P90 con N muestras Monte Carlo (default: desactivado)'
+    )
+    parser.add_argument('--workers', type=int, default=None, help='Procesos para Monte Carlo')
+    parser.add_argument(
+        '--coverage-source',
+        choices=COVERAGE_SOURCES,
+        default='vector',
+        help='Cobertura desde el área de techos (vector) o desde el raster de cobertura (raster)'
+    )
+    args = parser.parse_args()
+
     try:
         db = get_database()
-        df = generate_statistics_mongodb(db)
+        df = generate_statistics_mongodb(
+            db,
+            confidence_thresholds=args.confidence_thresholds,
+            uncertainty_samples=args.uncertainty,
+            workers=args.workers,
+            coverage_source=args.coverage_source
+        )
         logger.info("Proceso completado exitosamente")
     except Exception as e:
         logger.error(f"ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -4,6 +4,10 @@ Script para generar resumen agregado por región PDET usando MongoDB
 Usa $group y agregaciones de MongoDB para calcular totales por región.
 MongoDB hace el trabajo pesado en el servidor.
 
+Los cuantiles de área por región y nacionales se obtienen sumando los
+sketches de área de los municipios (area_sketch del join espacial), no
+promediando los cuantiles municipales.
+
 Autor: Equipo PDET Solar Analysis
 Fecha: Noviembre 2025
 Deliverable: 4
@@ -18,6 +22,7 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.database.connection import get_database
+from src.analysis.size_distribution import QUANTILES, merge_sketches, sketch_quantiles
 
 logging.basicConfig(
     level=logging.INFO,
@@ -61,6 +66,9 @@ def generate_regional_summary_mongodb(db):
                     }
                 },
 
+                # Microsoft - sketches de área (se combinan en Python)
+                'ms_area_sketches': {'$push': '$microsoft.area_sketch'},
+
                 # Google - totales
                 'gg_total_buildings': {'$sum': '$google.count'},
                 'gg_total_roof_area_km2': {'$sum': '$google.total_area_km2'},
@@ -75,7 +83,10 @@ def generate_regional_summary_mongodb(db):
                         'name': '$muni_name',
                         'count': '$google.count'
                     }
-                }
+                },
+
+                # Google - sketches de área
+                'gg_area_sketches': {'$push': '$google.area_sketch'}
             }
         },
         {
@@ -92,6 +103,7 @@ def generate_regional_summary_mongodb(db):
                 'ms_avg_buildings_per_muni': {'$round': ['$ms_avg_buildings_per_muni', 0]},
                 'ms_top_municipality': '$ms_top_muni.name',
                 'ms_top_municipality_count': '$ms_top_muni.count',
+                'ms_area_sketches': 1,
 
                 # Google
                 'gg_total_buildings': 1,
@@ -99,7 +111,8 @@ def generate_regional_summary_mongodb(db):
                 'gg_total_useful_area_km2': {'$round': ['$gg_total_useful_area_km2', 2]},
                 'gg_avg_buildings_per_muni': {'$round': ['$gg_avg_buildings_per_muni', 0]},
                 'gg_top_municipality': '$gg_top_muni.name',
-                'gg_top_municipality_count': '$gg_top_muni.count'
+                'gg_top_municipality_count': '$gg_top_muni.count',
+                'gg_area_sketches': 1
             }
         },
         {
@@ -117,6 +130,21 @@ def generate_regional_summary_mongodb(db):
     logger.info(f"MongoDB agrupó {len(results)} regiones PDET")
     logger.info("")
 
+    # Cuantiles de área: suma de los sketches municipales por región y nacional
+    national_sketches = {'ms': [], 'gg': []}
+    for row in results:
+        for prefix in ('ms', 'gg'):
+            sketches = row.pop(f'{prefix}_area_sketches', None) or []
+            region_sketch = merge_sketches(*sketches)
+            national_sketches[prefix].append(region_sketch)
+            for name, value in sketch_quantiles(region_sketch).items():
+                row[f'{prefix}_area_{name}_m2'] = value
+
+    national_quantiles = {
+        prefix: sketch_quantiles(merge_sketches(*sketches))
+        for prefix, sketches in national_sketches.items()
+    }
+
     # Convertir a DataFrame
     df = pd.DataFrame(results)
 
@@ -148,6 +176,11 @@ def generate_regional_summary_mongodb(db):
     logger.info(f"Total edificaciones Google: {df['gg_total_buildings'].sum():,}")
     logger.info(f"Área útil total MS: {df['ms_total_useful_area_km2'].sum():.2f} km²")
     logger.info(f"Área útil total Google: {df['gg_total_useful_area_km2'].sum():.2f} km²")
+    for prefix, label in (('ms', 'MS'), ('gg', 'Google')):
+        quantiles = national_quantiles[prefix]
+        if quantiles[f'p{QUANTILES[0]}'] is not None:
+            values = ', '.join(f"{name}={value:,.1f}" for name, value in quantiles.items())
+            logger.info(f"Cuantiles de área {label} (m²): {values}")
     logger.info("")
     logger.info("=" * 70)
     logger.info("NOTA: Todas las agregaciones hechas por MongoDB con $group")
@@ -166,6 +199,7 @@ def main():
         logger.error(f"ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -1,7 +1,9 @@
 """
 Script para exportar datos geoespaciales con estadísticas
 
-Exporta municipios PDET con todas las estadísticas calculadas en formato GeoJSON
+Exporta municipios PDET con todas las estadísticas calculadas en formato GeoJSON.
+Los features se escriben en streaming (GeoJSONWriter), por lo que también
+sirve para exportar edificaciones completas con --buildings.
 
 Autor: Equipo PDET Solar Analysis
 Fecha: Noviembre 2025
@@ -13,10 +15,14 @@ from pathlib import Path
 import json
 import logging
 
+from tqdm import tqdm
+
 PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.database.connection import get_database
+from src.utils.geojson_writer import GeoJSONWriter, DEFAULT_PRECISION, FORMATS
+from src.utils.geometry_simplify import SIMPLIFY_TOLERANCES, simplify_features, write_topojson
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,107 +31,216 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def export_geojson(db):
-    """Exporta municipios con estadísticas en formato GeoJSON"""
+def municipality_feature(muni):
+    """Construye el feature de un municipio a partir del resultado del $lookup"""
+    stats = muni.get('stats', {})
+    ms = stats.get('microsoft', {})
+    gg = stats.get('google', {})
+
+    return {
+        'type': 'Feature',
+        'geometry': muni['geom'],
+        'properties': {
+            # Identificación
+            'muni_code': muni.get('muni_code', ''),
+            'muni_name': muni.get('muni_name', ''),
+            'dept_name': stats.get('dept_name', muni.get('dept_name', '')),
+            'pdet_region': stats.get('pdet_region', muni.get('pdet_region', '')),
+            'pdet_subregion': stats.get('pdet_subregion', muni.get('pdet_subregion', '')),
+            'area_muni_km2': round(muni.get('area_km2', 0), 2),
+
+            # Microsoft
+            'ms_buildings_count': ms.get('count', 0),
+            'ms_avg_area_m2': round(ms.get('avg_area_m2', 0), 2),
+            'ms_total_area_km2': round(ms.get('total_area_km2', 0), 4),
+            'ms_useful_area_km2': round(ms.get('area_util_km2', 0), 4),
+            'ms_useful_area_ha': round(ms.get('area_util_ha', 0), 2),
+
+            # Google
+            'gg_buildings_count': gg.get('count', 0),
+            'gg_avg_area_m2': round(gg.get('avg_area_m2', 0), 2),
+            'gg_total_area_km2': round(gg.get('total_area_km2', 0), 4),
+            'gg_useful_area_km2': round(gg.get('area_util_km2', 0), 4),
+            'gg_useful_area_ha': round(gg.get('area_util_ha', 0), 2)
+        }
+    }
+
+
+def export_geojson(db, precision=DEFAULT_PRECISION, fmt='geojson'):
+    """
+    Exporta municipios con estadísticas en formato GeoJSON
+
+    Las estadísticas se unen en el servidor con $lookup y cada feature se
+    escribe a medida que avanza el cursor (memoria constante).
+
+    Args:
+        db: Conexión a MongoDB
+        precision (int): Decimales de coordenadas
+        fmt (str): 'geojson' o 'geojsonseq'
+    """
     logger.info("=" * 70)
     logger.info("EXPORTACIÓN GEOJSON")
     logger.info("=" * 70)
 
-    # Leer municipios con geometrías
-    munis_coll = db.pdet_municipalities
-    stats_coll = db.buildings_by_municipality
-
-    # Crear diccionario de estadísticas por código de municipio
-    stats_dict = {}
-    for doc in stats_coll.find({}):
-        muni_code = doc.get('muni_code', '')
-        stats_dict[muni_code] = doc
-
-    # Construir GeoJSON
-    features = []
-
-    for muni in munis_coll.find({}):
-        muni_code = muni.get('muni_code', '')
-        muni_name = muni.get('muni_name', '')
-        geom = muni.get('geom')
-
-        if not geom:
-            logger.warning(f"Sin geometría: {muni_name}")
-            continue
-
-        # Obtener estadísticas
-        stats = stats_dict.get(muni_code, {})
-        ms = stats.get('microsoft', {})
-        gg = stats.get('google', {})
-
-        # Crear feature
-        feature = {
-            'type': 'Feature',
-            'geometry': geom,
-            'properties': {
-                # Identificación
-                'muni_code': muni_code,
-                'muni_name': muni_name,
-                'dept_name': stats.get('dept_name', muni.get('dept_name', '')),
-                'pdet_region': stats.get('pdet_region', muni.get('pdet_region', '')),
-                'pdet_subregion': stats.get('pdet_subregion', muni.get('pdet_subregion', '')),
-                'area_muni_km2': round(muni.get('area_km2', 0), 2),
-
-                # Microsoft
-                'ms_buildings_count': ms.get('count', 0),
-                'ms_avg_area_m2': round(ms.get('avg_area_m2', 0), 2),
-                'ms_total_area_km2': round(ms.get('total_area_km2', 0), 4),
-                'ms_useful_area_km2': round(ms.get('area_util_km2', 0), 4),
-                'ms_useful_area_ha': round(ms.get('area_util_ha', 0), 2),
-
-                # Google
-                'gg_buildings_count': gg.get('count', 0),
-                'gg_avg_area_m2': round(gg.get('avg_area_m2', 0), 2),
-                'gg_total_area_km2': round(gg.get('total_area_km2', 0), 4),
-                'gg_useful_area_km2': round(gg.get('area_util_km2', 0), 4),
-                'gg_useful_area_ha': round(gg.get('area_util_ha', 0), 2)
+    # Municipios con sus estadísticas unidas en MongoDB
+    pipeline = [
+        {'$match': {'geom': {'$ne': None}}},
+        {
+            '$lookup': {
+                'from': 'buildings_by_municipality',
+                'localField': 'muni_code',
+                'foreignField': 'muni_code',
+                'as': 'stats'
             }
-        }
-
-        features.append(feature)
-
-    # Crear FeatureCollection
-    geojson = {
-        'type': 'FeatureCollection',
-        'name': 'municipios_pdet_with_stats',
-        'crs': {
-            'type': 'name',
-            'properties': {'name': 'urn:ogc:def:crs:OGC:1.3:CRS84'}
         },
-        'features': features
-    }
+        {'$set': {'stats': {'$ifNull': [{'$arrayElemAt': ['$stats', 0]}, {}]}}}
+    ]
 
-    # Exportar
     output_dir = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'geojson'
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    geojson_path = output_dir / 'municipalities_with_stats.geojson'
+    geojson_path = output_dir / f'municipalities_with_stats{FORMATS[fmt]}'
 
-    with open(geojson_path, 'w', encoding='utf-8') as f:
-        json.dump(geojson, f, indent=2, ensure_ascii=False)
+    writer = GeoJSONWriter(geojson_path, precision=precision, fmt=fmt, name='municipios_pdet_with_stats')
+    with writer:
+        for muni in db.pdet_municipalities.aggregate(pipeline, allowDiskUse=True):
+            writer.write(municipality_feature(muni))
+
+    skipped = db.pdet_municipalities.count_documents({'geom': None})
+    if skipped:
+        logger.warning(f"Municipios sin geometría: {skipped}")
 
     logger.info(f"GeoJSON exportado: {geojson_path}")
-    logger.info(f"   Features: {len(features)}")
+    logger.info(f"   Features: {writer.count}")
+    logger.info(f"   Precisión: {precision} decimales")
     logger.info(f"   Tamaño: {geojson_path.stat().st_size / 1024:.1f} KB")
     logger.info("")
     logger.info("=" * 70)
 
+    return geojson_path
+
+
+def export_simplified(geojson_path, precision=5, topojson=False):
+    """
+    Genera versiones simplificadas (topología preservada) para los mapas web
+
+    Escribe municipalities_with_stats_<nivel>.geojson para cada tolerancia de
+    SIMPLIFY_TOLERANCES y, opcionalmente, la versión TopoJSON con arcos
+    compartidos.
+
+    Args:
+        geojson_path (Path): GeoJSON completo de municipios
+        precision (int): Decimales de coordenadas de las versiones simplificadas
+        topojson (bool): Escribir también .topojson
+    """
+    logger.info("Generando geometrías simplificadas...")
+
+    # ~170 municipios: la cobertura completa cabe en memoria
+    with open(geojson_path, 'r', encoding='utf-8') as f:
+        collection = json.load(f)
+
+    full_size = geojson_path.stat().st_size
+    for level, tolerance in SIMPLIFY_TOLERANCES.items():
+        features = simplify_features(collection['features'], tolerance)
+
+        output_path = geojson_path.with_name(f'{geojson_path.stem}_{level}.geojson')
+        with GeoJSONWriter(output_path, precision=precision, name=collection.get('name')) as writer:
+            for feature in features:
+                writer.write(feature)
+
+        size = output_path.stat().st_size
+        logger.info(f"   {level} (tolerancia {tolerance}°): {size / 1024:.1f} KB "
+                    f"({full_size / max(size, 1):.1f}x más pequeño)")
+
+        if topojson:
+            topo_path = output_path.with_suffix('.topojson')
+            if write_topojson(features, topo_path):
+                logger.info(f"   {level} TopoJSON: {topo_path.stat().st_size / 1024:.1f} KB")
+
+
+def export_buildings(db, dataset, precision=DEFAULT_PRECISION, fmt='geojsonseq', muni_code=None):
+    """
+    Exporta edificaciones (todas o las de un municipio) en streaming
+
+    Args:
+        db: Conexión a MongoDB
+        dataset (str): 'microsoft' o 'google'
+        precision (int): Decimales de coordenadas
+        fmt (str): 'geojson' o 'geojsonseq'
+        muni_code (str, optional): Limitar a un municipio ($geoWithin sobre el centroide)
+    """
+    logger.info("=" * 70)
+    logger.info(f"EXPORTACIÓN DE EDIFICACIONES: {dataset}")
+    logger.info("=" * 70)
+
+    query = {}
+    suffix = ''
+    if muni_code:
+        muni = db.pdet_municipalities.find_one({'muni_code': muni_code}, {'geom': 1})
+        if not muni or not muni.get('geom'):
+            raise ValueError(f"Municipio sin geometría o inexistente: {muni_code}")
+        query = {'centroid': {'$geoWithin': {'$geometry': muni['geom']}}}
+        suffix = f'_{muni_code}'
+
+    output_dir = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'geojson'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f'{dataset}_buildings{suffix}{FORMATS[fmt]}'
+
+    cursor = db[f'{dataset}_buildings'].find(
+        query, {'geometry': 1, 'properties': 1}
+    ).batch_size(5000)
+
+    writer = GeoJSONWriter(output_path, precision=precision, fmt=fmt, name=f'{dataset}_buildings')
+    with writer:
+        for doc in tqdm(cursor, desc=f"Exportando {dataset}", unit=' edif'):
+            writer.write({
+                'type': 'Feature',
+                'id': str(doc['_id']),
+                'geometry': doc.get('geometry'),
+                'properties': doc.get('properties', {})
+            })
+
+    logger.info(f"Archivo exportado: {output_path}")
+    logger.info(f"   Features: {writer.count:,}")
+    logger.info(f"   Tamaño: {output_path.stat().st_size / (1024 * 1024):.1f} MB")
+    logger.info("=" * 70)
+
 
 def main():
     """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Exportación GeoJSON de municipios y edificaciones')
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION,
+                        help='Decimales de coordenadas (default: 6)')
+    parser.add_argument('--format', choices=list(FORMATS), default='geojson',
+                        help='geojson (FeatureCollection) o geojsonseq (un feature por línea)')
+    parser.add_argument('--buildings', choices=['microsoft', 'google'], default=None,
+                        help='Exportar edificaciones de un dataset en lugar de municipios')
+    parser.add_argument('--muni-code', type=str, default=None,
+                        help='Con --buildings: limitar a un municipio')
+    parser.add_argument('--no-simplify', action='store_true',
+                        help='No generar las versiones simplificadas para mapas')
+    parser.add_argument('--topojson', action='store_true',
+                        help='Escribir también TopoJSON simplificado (requiere paquete topojson)')
+    args = parser.parse_args()
+
     try:
         db = get_database()
-        export_geojson(db)
+        if args.buildings:
+            export_buildings(db, args.buildings, precision=args.precision,
+                             fmt=args.format, muni_code=args.muni_code)
+        else:
+            geojson_path = export_geojson(db, precision=args.precision, fmt=args.format)
+            if args.format == 'geojson' and not args.no_simplify:
+                export_simplified(geojson_path, precision=min(args.precision, 5),
+                                  topojson=args.topojson)
         logger.info("Exportación completada exitosamente")
     except Exception as e:
         logger.error(f"ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -3,6 +3,8 @@ Script para generar visualizaciones y mapas interactivos
 
 Genera:
 - Mapas coropléticos HTML (Folium)
+- Mapa de calor de edificaciones (grilla de densidad calculada en MongoDB)
+- Mapa de celdas de ~1 km recortadas a municipios (src/analysis/cell_aggregation.py)
 - Gráficos estadísticos PNG (Matplotlib)
 
 Autor: Equipo PDET Solar Analysis
@@ -18,11 +20,15 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import folium
 from folium import plugins
+from branca.colormap import linear
 import logging
 
 PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
+from src.utils.geometry_simplify import MAP_RESOLUTION
+from src.analysis.density_grid import density_grid, heatmap_points, pdet_bbox, MAP_GRID_RESOLUTION
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s'
@@ -34,58 +40,47 @@ plt.style.use('seaborn-v0_8-darkgrid')
 sns.set_palette("husl")
 
 
-def create_choropleth_map():
-    """Crea mapa coroplético de área útil para paneles solares"""
-    logger.info("=" * 70)
-    logger.info("GENERANDO MAPA COROPLÉTICO - ÁREA ÚTIL SOLAR")
-    logger.info("=" * 70)
+def load_map_geojson():
+    """
+    Lee el GeoJSON de municipios para los mapas
 
-    # Leer GeoJSON
-    geojson_path = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'geojson' / 'municipalities_with_stats.geojson'
+    Usa la versión simplificada de 04_export_geojson.py (topología preservada)
+    y, si no existe, la de resolución completa.
+    """
+    geojson_dir = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'geojson'
+    geojson_path = geojson_dir / f'municipalities_with_stats_{MAP_RESOLUTION}.geojson'
+    if not geojson_path.exists():
+        geojson_path = geojson_dir / 'municipalities_with_stats.geojson'
 
     logger.info(f"Leyendo GeoJSON: {geojson_path}")
     with open(geojson_path, 'r', encoding='utf-8') as f:
-        geojson_data = json.load(f)
-
-    # Crear mapa centrado en Colombia
-    m = folium.Map(
-        location=[4.5709, -74.2973],  # Centro de Colombia
-        zoom_start=6,
-        tiles='CartoDB positron'
-    )
-
-    # Añadir mapa coroplético
-    folium.Choropleth(
-        geo_data=geojson_data,
-        name='Área Útil para Paneles Solares',
-        data=pd.DataFrame([f['properties'] for f in geojson_data['features']]),
-        columns=['muni_code', 'ms_useful_area_km2'],
-        key_on='feature.properties.muni_code',
-        fill_color='YlOrRd',
-        fill_opacity=0.7,
-        line_opacity=0.2,
-        legend_name='Área Útil para Paneles Solares (km²)',
-        nan_fill_color='lightgray'
-    ).add_to(m)
-
-    # Añadir tooltips con información
-    style_function = lambda x: {
-        'fillColor': '#ffffff',
-        'color': '#000000',
-        'fillOpacity': 0.1,
-        'weight': 0.1
-    }
-
-    highlight_function = lambda x: {
-        'fillColor': '#000000',
-        'color': '#000000',
-        'fillOpacity': 0.50,
-        'weight': 0.1
-    }
+        return json.load(f)
+
+
+def add_choropleth_layer(m, geojson_data, column, colormap, caption, name, fields, aliases):
+    """
+    Agrega una única capa GeoJson con relleno por valor, resaltado y tooltip
+
+    Relleno y tooltip comparten la misma capa, por lo que las geometrías se
+    incrustan una sola vez en el HTML.
+    """
+    values = [f['properties'].get(column) for f in geojson_data['features']]
+    values = [v for v in values if v is not None]
+    colormap = colormap.scale(min(values, default=0), max(values, default=1))
+    colormap.caption = caption
+
+    def style_function(feature):
+        value = feature['properties'].get(column)
+        return {
+            'fillColor': colormap(value) if value is not None else 'lightgray',
+            'color': '#000000',
+            'fillOpacity': 0.7,
+            'weight': 0.2
+        }
 
     tooltip = folium.features.GeoJsonTooltip(
-        fields=['muni_name', 'dept_name', 'pdet_region', 'ms_buildings_count', 'ms_useful_area_km2', 'ms_useful_area_ha'],
-        aliases=['Municipio:', 'Departamento:', 'Región PDET:', 'Edificaciones:', 'Área Útil (km²):', 'Área Útil (ha):'],
+        fields=fields,
+        aliases=aliases,
         localize=True,
         sticky=False,
         labels=True,
@@ -100,11 +95,39 @@ def create_choropleth_map():
 
     folium.GeoJson(
         geojson_data,
+        name=name,
         style_function=style_function,
-        control=False,
-        highlight_function=highlight_function,
+        highlight_function=lambda x: {'fillOpacity': 0.9, 'weight': 1.0},
         tooltip=tooltip
     ).add_to(m)
+    colormap.add_to(m)
+
+
+def create_choropleth_map():
+    """Crea mapa coroplético de área útil para paneles solares"""
+    logger.info("=" * 70)
+    logger.info("GENERANDO MAPA COROPLÉTICO - ÁREA ÚTIL SOLAR")
+    logger.info("=" * 70)
+
+    geojson_data = load_map_geojson()
+
+    # Crear mapa centrado en Colombia
+    m = folium.Map(
+        location=[4.5709, -74.2973],  # Centro de Colombia
+        zoom_start=6,
+        tiles='CartoDB positron'
+    )
+
+    add_choropleth_layer(
+        m,
+        geojson_data,
+        column='ms_useful_area_km2',
+        colormap=linear.YlOrRd_09,
+        caption='Área Útil para Paneles Solares (km²)',
+        name='Área Útil para Paneles Solares',
+        fields=['muni_name', 'dept_name', 'pdet_region', 'ms_buildings_count', 'ms_useful_area_km2', 'ms_useful_area_ha'],
+        aliases=['Municipio:', 'Departamento:', 'Región PDET:', 'Edificaciones:', 'Área Útil (km²):', 'Área Útil (ha):']
+    )
 
     # Añadir control de capas
     folium.LayerControl().add_to(m)
@@ -132,11 +155,7 @@ def create_density_map():
     logger.info("GENERANDO MAPA COROPLÉTICO - DENSIDAD DE EDIFICACIONES")
     logger.info("=" * 70)
 
-    # Leer GeoJSON
-    geojson_path = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'geojson' / 'municipalities_with_stats.geojson'
-
-    with open(geojson_path, 'r', encoding='utf-8') as f:
-        geojson_data = json.load(f)
+    geojson_data = load_map_geojson()
 
     # Crear mapa
     m = folium.Map(
@@ -145,35 +164,17 @@ def create_density_map():
         tiles='CartoDB positron'
     )
 
-    # Añadir mapa coroplético
-    folium.Choropleth(
-        geo_data=geojson_data,
+    add_choropleth_layer(
+        m,
+        geojson_data,
+        column='ms_buildings_count',
+        colormap=linear.Blues_09,
+        caption='Número de Edificaciones',
         name='Densidad de Edificaciones',
-        data=pd.DataFrame([f['properties'] for f in geojson_data['features']]),
-        columns=['muni_code', 'ms_buildings_count'],
-        key_on='feature.properties.muni_code',
-        fill_color='Blues',
-        fill_opacity=0.7,
-        line_opacity=0.2,
-        legend_name='Número de Edificaciones',
-        nan_fill_color='lightgray'
-    ).add_to(m)
-
-    # Tooltips
-    tooltip = folium.features.GeoJsonTooltip(
         fields=['muni_name', 'dept_name', 'ms_buildings_count', 'area_muni_km2'],
-        aliases=['Municipio:', 'Departamento:', 'Edificaciones:', 'Área Municipal (km²):'],
-        localize=True
+        aliases=['Municipio:', 'Departamento:', 'Edificaciones:', 'Área Municipal (km²):']
     )
 
-    folium.GeoJson(
-        geojson_data,
-        style_function=lambda x: {'fillColor': '#ffffff', 'color': '#000000', 'fillOpacity': 0.1, 'weight': 0.1},
-        control=False,
-        highlight_function=lambda x: {'fillColor': '#000000', 'color': '#000000', 'fillOpacity': 0.50, 'weight': 0.1},
-        tooltip=tooltip
-    ).add_to(m)
-
     folium.LayerControl().add_to(m)
     plugins.Fullscreen().add_to(m)
 
@@ -188,6 +189,105 @@ def create_density_map():
     return map_path
 
 
+def create_building_heatmap(dataset='microsoft', resolution=MAP_GRID_RESOLUTION):
+    """
+    Crea mapa de calor de edificaciones a partir de la grilla de densidad
+
+    MongoDB agrupa los centroides por celda (src/analysis/density_grid.py)
+    dentro del bbox de los municipios PDET. Todas las celdas quedan dentro
+    del HTML: con la resolución por defecto (0.05°) son del orden de miles;
+    a 0.01° pueden ser decenas de miles.
+    """
+    logger.info("")
+    logger.info("=" * 70)
+    logger.info(f"GENERANDO MAPA DE CALOR - EDIFICACIONES {dataset.upper()}")
+    logger.info("=" * 70)
+
+    from src.database.connection import get_database
+
+    db = get_database()
+    cells = density_grid(db, dataset, resolution=resolution, bbox=pdet_bbox(db))
+
+    m = folium.Map(
+        location=[4.5709, -74.2973],
+        zoom_start=6,
+        tiles='CartoDB positron'
+    )
+
+    plugins.HeatMap(
+        heatmap_points(cells, weight='count'),
+        name=f'Densidad de edificaciones ({resolution}°)',
+        radius=8,
+        blur=6,
+        min_opacity=0.3
+    ).add_to(m)
+
+    folium.LayerControl().add_to(m)
+    plugins.Fullscreen().add_to(m)
+
+    output_dir = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'maps'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    map_path = output_dir / f'{dataset}_buildings_heatmap.html'
+    m.save(str(map_path))
+
+    logger.info(f"Mapa de calor guardado: {map_path}")
+    logger.info(f"   Celdas: {len(cells):,}")
+    logger.info(f"   Tamaño: {map_path.stat().st_size / 1024:.1f} KB")
+
+    return map_path
+
+
+def create_cell_map(dataset='microsoft'):
+    """
+    Crea mapa de área útil por celda de grilla dentro de los municipios PDET
+
+    Lee buildings_by_cell_<dataset>.geojson exportado por
+    src/analysis/cell_aggregation.py.
+    """
+    logger.info("")
+    logger.info("=" * 70)
+    logger.info(f"GENERANDO MAPA DE CELDAS - ÁREA ÚTIL {dataset.upper()}")
+    logger.info("=" * 70)
+
+    geojson_path = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'geojson' / f'buildings_by_cell_{dataset}.geojson'
+    if not geojson_path.exists():
+        raise FileNotFoundError(f"{geojson_path} no existe (ejecutar src/analysis/cell_aggregation.py)")
+
+    with open(geojson_path, 'r', encoding='utf-8') as f:
+        geojson_data = json.load(f)
+
+    m = folium.Map(
+        location=[4.5709, -74.2973],
+        zoom_start=6,
+        tiles='CartoDB positron'
+    )
+
+    add_choropleth_layer(
+        m,
+        geojson_data,
+        column='useful_area_m2',
+        colormap=linear.YlOrRd_09,
+        caption='Área Útil por Celda (m²)',
+        name='Área Útil por Celda',
+        fields=['muni_name', 'building_count', 'roof_area_m2', 'useful_area_m2', 'buildings_per_km2'],
+        aliases=['Municipio:', 'Edificaciones:', 'Área Techos (m²):', 'Área Útil (m²):', 'Edificaciones/km²:']
+    )
+
+    folium.LayerControl().add_to(m)
+    plugins.Fullscreen().add_to(m)
+
+    output_dir = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'maps'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    map_path = output_dir / f'{dataset}_useful_area_cells.html'
+    m.save(str(map_path))
+
+    logger.info(f"Mapa de celdas guardado: {map_path}")
+    logger.info(f"   Celdas: {len(geojson_data['features']):,}")
+    logger.info(f"   Tamaño: {map_path.stat().st_size / 1024:.1f} KB")
+
+    return map_path
+
+
 def create_top10_chart():
     """Crea gráfico de top 10 municipios"""
     logger.info("")
@@ -295,33 +395,63 @@ def create_regional_chart():
 
 def main():
     """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Mapas y gráficos del Deliverable 4')
+    parser.add_argument(
+        '--only',
+        choices=['maps', 'charts'],
+        default=None,
+        help='Generar solo mapas o solo gráficos (default: ambos; run_pipeline.py los corre en paralelo)'
+    )
+    args = parser.parse_args()
+
     logger.info("=" * 70)
     logger.info("GENERACIÓN DE VISUALIZACIONES - DELIVERABLE 4")
     logger.info("=" * 70)
     logger.info("")
 
     try:
-        # Crear mapas
-        map1 = create_choropleth_map()
-        map2 = create_density_map()
-
-        # Crear gráficos
-        chart1 = create_top10_chart()
-        chart2 = create_regional_chart()
+        maps = []
+        charts = []
+
+        if args.only in (None, 'maps'):
+            # Crear mapas
+            maps.append(create_choropleth_map())
+            maps.append(create_density_map())
+
+            # Mapa de calor desde MongoDB (opcional si no hay conexión)
+            try:
+                maps.append(create_building_heatmap())
+            except Exception as e:
+                logger.warning(f"Mapa de calor omitido: {str(e)}")
+
+            # Mapa por celdas (requiere el GeoJSON de cell_aggregation.py)
+            try:
+                maps.append(create_cell_map())
+            except Exception as e:
+                logger.warning(f"Mapa de celdas omitido: {str(e)}")
+
+        if args.only in (None, 'charts'):
+            # Crear gráficos
+            charts.append(create_top10_chart())
+            charts.append(create_regional_chart())
 
         # Resumen
         logger.info("")
         logger.info("=" * 70)
         logger.info("RESUMEN DE VISUALIZACIONES GENERADAS")
         logger.info("=" * 70)
-        logger.info("")
-        logger.info("Mapas interactivos (HTML):")
-        logger.info(f"  1. {map1}")
-        logger.info(f"  2. {map2}")
-        logger.info("")
-        logger.info("Gráficos estadísticos (PNG):")
-        logger.info(f"  3. {chart1}")
-        logger.info(f"  4. {chart2}")
+        if maps:
+            logger.info("")
+            logger.info("Mapas interactivos (HTML):")
+            for i, path in enumerate(maps, 1):
+                logger.info(f"  {i}. {path}")
+        if charts:
+            logger.info("")
+            logger.info("Gráficos estadísticos (PNG):")
+            for i, path in enumerate(charts, len(maps) + 1):
+                logger.info(f"  {i}. {path}")
         logger.info("")
         logger.info("=" * 70)
         logger.info("TODAS LAS VISUALIZACIONES GENERADAS EXITOSAMENTE")
@@ -331,6 +461,7 @@ def main():
         logger.error(f"ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
+        sys.exit(1)
 
 
 if __name__ == '__main__':
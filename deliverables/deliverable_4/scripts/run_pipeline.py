@@ -0,0 +1,438 @@
+"""
+Orquestador del Deliverable 4 con caché por huella de entradas
+
+Corre 01-05 y validate_deliverable.py como un DAG. Cada paso declara sus
+entradas y salidas (colecciones MongoDB y archivos de outputs/); las
+dependencias se deducen de ellas: un paso depende de los pasos anteriores
+que escriben alguna de sus entradas.
+
+Huella de un paso:
+- Colecciones: número de documentos, último _id (marca de inserción,
+  indexado) y máximo de los campos de marca de tiempo declarados
+  (created_at / updated_at)
+- Archivos: SHA-256 del contenido (None si no existe)
+- El propio script del paso (SHA-256), para que un cambio de código
+  vuelva a ejecutarlo
+
+Un paso se omite si su huella es igual a la registrada tras su última
+ejecución exitosa y sus archivos de salida siguen intactos. La huella se
+registra después de correr, así un paso que actualiza su propia entrada
+(01 escribe buildings_by_municipality) no se repite en la siguiente
+corrida. Si un paso regenera una salida idéntica byte a byte, los pasos
+siguientes se omiten.
+
+Los pasos independientes corren en paralelo (mapas y gráficos de 05,
+02/03/04 tras 01). Cada corrida deja un log JSON con estado y tiempos
+por paso en results/deliverable_4/pipeline/.
+
+Uso:
+    python deliverables/deliverable_4/scripts/run_pipeline.py
+    python deliverables/deliverable_4/scripts/run_pipeline.py --dry-run
+    python deliverables/deliverable_4/scripts/run_pipeline.py --force --steps 02_generate_statistics
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+Deliverable: 4
+"""
+
+import sys
+import os
+import json
+import time
+import hashlib
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import logging
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.utils.collection_import import file_sha256
+from src.utils.geometry_simplify import MAP_RESOLUTION
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SCRIPTS_DIR = Path(__file__).parent
+OUTPUTS = 'deliverables/deliverable_4/outputs'
+PIPELINE_DIR = PROJECT_ROOT / 'results' / 'deliverable_4' / 'pipeline'
+STATE_PATH = PIPELINE_DIR / 'pipeline_state.json'
+
+# Campos de marca de tiempo por colección (se consulta el máximo). Las
+# colecciones de edificaciones solo usan conteo y último _id: ordenar por
+# un campo sin índice recorrería millones de documentos.
+COLLECTION_WATERMARKS = {
+    'buildings_by_municipality': ('updated_at', 'created_at'),
+    'pdet_municipalities': ('updated_at', 'created_at')
+}
+
+# Entradas: 'mongo:<colección>' o 'file:<ruta relativa a PROJECT_ROOT>'
+STEPS = [
+    {
+        'name': '01_calculate_solar_area',
+        'script': '01_calculate_solar_area.py',
+        'inputs': ['mongo:buildings_by_municipality'],
+        'outputs': ['mongo:buildings_by_municipality']
+    },
+    {
+        'name': '02_generate_statistics',
+        'script': '02_generate_statistics.py',
+        'inputs': ['mongo:buildings_by_municipality'],
+        'outputs': [f'file:{OUTPUTS}/tables/municipalities_stats.csv']
+    },
+    {
+        'name': '03_regional_summary',
+        'script': '03_regional_summary.py',
+        'inputs': ['mongo:buildings_by_municipality'],
+        'outputs': [f'file:{OUTPUTS}/tables/regional_summary.csv']
+    },
+    {
+        'name': '04_export_geojson',
+        'script': '04_export_geojson.py',
+        'inputs': ['mongo:pdet_municipalities', 'mongo:buildings_by_municipality'],
+        'outputs': [
+            f'file:{OUTPUTS}/geojson/municipalities_with_stats.geojson',
+            f'file:{OUTPUTS}/geojson/municipalities_with_stats_{MAP_RESOLUTION}.geojson'
+        ]
+    },
+    {
+        'name': '05_maps',
+        'script': '05_generate_visualizations.py',
+        'args': ['--only', 'maps'],
+        'inputs': [
+            # Versión simplificada que lee load_map_geojson (04 la escribe)
+            f'file:{OUTPUTS}/geojson/municipalities_with_stats_{MAP_RESOLUTION}.geojson',
+            f'file:{OUTPUTS}/geojson/buildings_by_cell_microsoft.geojson',
+            'mongo:microsoft_buildings',
+            'mongo:pdet_municipalities'
+        ],
+        'outputs': [
+            f'file:{OUTPUTS}/maps/area_util_choropleth.html',
+            f'file:{OUTPUTS}/maps/density_choropleth.html'
+        ]
+    },
+    {
+        'name': '05_charts',
+        'script': '05_generate_visualizations.py',
+        'args': ['--only', 'charts'],
+        'inputs': [
+            f'file:{OUTPUTS}/tables/municipalities_stats.csv',
+            f'file:{OUTPUTS}/tables/regional_summary.csv'
+        ],
+        'outputs': [
+            f'file:{OUTPUTS}/charts/top10_municipalities.png',
+            f'file:{OUTPUTS}/charts/regional_distribution.png'
+        ]
+    },
+    {
+        'name': 'validate_deliverable',
+        'script': 'validate_deliverable.py',
+        'inputs': [
+            'mongo:buildings_by_municipality',
+            f'file:{OUTPUTS}/tables/municipalities_stats.csv',
+            f'file:{OUTPUTS}/tables/regional_summary.csv',
+            f'file:{OUTPUTS}/geojson/municipalities_with_stats.geojson'
+        ],
+        'outputs': []
+    }
+]
+
+
+def dependencies(steps):
+    """
+    Dependencias deducidas de entradas y salidas
+
+    Un paso depende de los pasos anteriores (en el orden de STEPS) que
+    escriben alguna de sus entradas; así 01 no depende de sí mismo.
+
+    Returns:
+        dict: nombre -> set de nombres de pasos previos
+    """
+    deps = {}
+    for i, step in enumerate(steps):
+        inputs = set(step['inputs'])
+        deps[step['name']] = {
+            other['name'] for other in steps[:i]
+            if inputs & set(other['outputs'])
+        }
+    return deps
+
+
+def collection_fingerprint(db, name):
+    """Conteo, último _id y máximos de marca de tiempo de una colección"""
+    collection = db[name]
+    fingerprint = {'count': collection.estimated_document_count()}
+
+    last = list(collection.find({}, {'_id': 1}).sort('_id', -1).limit(1))
+    fingerprint['last_id'] = str(last[0]['_id']) if last else None
+
+    for field in COLLECTION_WATERMARKS.get(name, ()):
+        top = list(collection.find({field: {'$exists': True}}, {field: 1}).sort(field, -1).limit(1))
+        fingerprint[field] = str(top[0].get(field)) if top else None
+    return fingerprint
+
+
+def resource_fingerprint(db, resource):
+    """Huella de una entrada/salida declarada"""
+    kind, name = resource.split(':', 1)
+    if kind == 'mongo':
+        return collection_fingerprint(db, name)
+    path = PROJECT_ROOT / name
+    return file_sha256(path) if path.exists() else None
+
+
+def step_fingerprint(db, step):
+    """
+    Huella de las entradas de un paso
+
+    Returns:
+        tuple: (hash SHA-256 de la huella, detalle por entrada)
+    """
+    detail = {resource: resource_fingerprint(db, resource) for resource in step['inputs']}
+    detail['script'] = file_sha256(SCRIPTS_DIR / step['script'])
+    detail['args'] = step.get('args', [])
+    digest = hashlib.sha256(json.dumps(detail, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return digest, detail
+
+
+def output_hashes(step):
+    """SHA-256 de los archivos de salida de un paso (None si falta)"""
+    hashes = {}
+    for resource in step['outputs']:
+        kind, name = resource.split(':', 1)
+        if kind == 'file':
+            path = PROJECT_ROOT / name
+            hashes[resource] = file_sha256(path) if path.exists() else None
+    return hashes
+
+
+def run_reason(step, fingerprint, previous, force=False):
+    """
+    Motivo para ejecutar un paso, o None si puede omitirse
+
+    Returns:
+        str o None
+    """
+    if force:
+        return 'forzado'
+    if not previous:
+        return 'sin ejecución previa'
+    if previous.get('status') != 'ok':
+        return 'la ejecución previa falló'
+    if previous.get('fingerprint') != fingerprint:
+        return 'entradas cambiaron'
+    current = output_hashes(step)
+    if any(value is None for value in current.values()):
+        return 'salida faltante'
+    if current != previous.get('outputs', {}):
+        return 'salida modificada'
+    return None
+
+
+def load_state(path=None):
+    """Estado de la última ejecución exitosa de cada paso"""
+    path = Path(path or STATE_PATH)
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, path=None):
+    """Guarda el estado (escritura atómica)"""
+    path = Path(path or STATE_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def run_step(step, log_dir):
+    """
+    Ejecuta el script de un paso en un subproceso
+
+    stdout/stderr van a <log_dir>/<paso>.log. Un paso falla si el código
+    de salida no es 0 o si falta alguno de sus archivos de salida.
+
+    Returns:
+        dict: returncode, elapsed_seconds, log, missing_outputs
+    """
+    log_path = log_dir / f"{step['name']}.log"
+    command = [sys.executable, str(SCRIPTS_DIR / step['script']), *step.get('args', [])]
+
+    start = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        result = subprocess.run(command, cwd=PROJECT_ROOT, stdout=log, stderr=subprocess.STDOUT)
+    elapsed = time.perf_counter() - start
+
+    missing = [resource for resource, value in output_hashes(step).items() if value is None]
+    return {
+        'returncode': result.returncode,
+        'elapsed_seconds': round(elapsed, 2),
+        'log': str(log_path.relative_to(PROJECT_ROOT)),
+        'missing_outputs': missing
+    }
+
+
+def run_pipeline(steps=STEPS, selected=None, force=False, dry_run=False, max_parallel=None):
+    """
+    Ejecuta el DAG de pasos
+
+    Args:
+        steps (list): Definición de pasos
+        selected (list, optional): Nombres de pasos a considerar (el resto
+            se trata como satisfecho y no bloquea a sus dependientes)
+        force (bool): Ejecutar aunque las entradas no hayan cambiado
+        dry_run (bool): Solo informar qué pasos correrían
+        max_parallel (int, optional): Pasos simultáneos
+
+    Returns:
+        dict: Log de la corrida (también escrito en PIPELINE_DIR)
+    """
+    db = get_database()
+    deps = dependencies(steps)
+    by_name = {step['name']: step for step in steps}
+    selected = set(selected or by_name)
+    unknown = selected - set(by_name)
+    if unknown:
+        raise ValueError(f"Pasos desconocidos: {', '.join(sorted(unknown))}")
+
+    state = load_state()
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    log_dir = PIPELINE_DIR / f'run_{run_id}'
+    if not dry_run:
+        log_dir.mkdir(parents=True, exist_ok=True)
+
+    logger.info("=" * 70)
+    logger.info(f"PIPELINE DELIVERABLE 4 - corrida {run_id}")
+    logger.info("=" * 70)
+
+    status = {name: 'not_selected' for name in by_name if name not in selected}
+    records = {}
+    pending = [name for name in by_name if name in selected]
+    running = {}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_parallel or len(steps)) as executor:
+        while pending or running:
+            # Lanzar todo paso cuyas dependencias ya terminaron
+            for name in list(pending):
+                step_deps = deps[name]
+                if any(status.get(d) in ('failed', 'blocked') for d in step_deps):
+                    status[name] = 'blocked'
+                    records[name] = {'status': 'blocked', 'reason': 'dependencia falló'}
+                    pending.remove(name)
+                    logger.warning(f"[{name}] bloqueado (dependencia falló)")
+                    continue
+                if not all(d in status for d in step_deps):
+                    continue
+
+                pending.remove(name)
+                step = by_name[name]
+                fingerprint, _ = step_fingerprint(db, step)
+                reason = run_reason(step, fingerprint, state.get(name), force)
+
+                if reason is None:
+                    status[name] = 'skipped'
+                    records[name] = {'status': 'skipped', 'reason': 'entradas sin cambios'}
+                    logger.info(f"[{name}] omitido (entradas sin cambios)")
+                elif dry_run:
+                    status[name] = 'would_run'
+                    records[name] = {'status': 'would_run', 'reason': reason}
+                    logger.info(f"[{name}] se ejecutaría: {reason}")
+                else:
+                    logger.info(f"[{name}] ejecutando: {reason}")
+                    records[name] = {'status': 'running', 'reason': reason,
+                                     'started_at': datetime.now().isoformat()}
+                    running[executor.submit(run_step, step, log_dir)] = name
+
+            if not running:
+                # Las dependencias siempre son pasos previos: sin pasos en
+                # curso, la pasada anterior tuvo que resolver todo
+                if pending:
+                    raise RuntimeError(f"Dependencias sin resolver: {', '.join(pending)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                step = by_name[name]
+                result = future.result()
+                ok = result['returncode'] == 0 and not result['missing_outputs']
+                status[name] = 'ok' if ok else 'failed'
+                records[name].update(result, status=status[name])
+
+                if ok:
+                    # Huella posterior: cubre pasos que modifican su propia entrada
+                    fingerprint, _ = step_fingerprint(db, step)
+                    state[name] = {
+                        'status': 'ok',
+                        'fingerprint': fingerprint,
+                        'outputs': output_hashes(step),
+                        'finished_at': datetime.now().isoformat()
+                    }
+                    logger.info(f"[{name}] ok en {result['elapsed_seconds']} s")
+                else:
+                    state[name] = {'status': 'failed', 'finished_at': datetime.now().isoformat()}
+                    logger.error(
+                        f"[{name}] falló (código {result['returncode']}, "
+                        f"salidas faltantes: {result['missing_outputs']}); ver {result['log']}"
+                    )
+                if not dry_run:
+                    save_state(state)
+
+    run_log = {
+        'run_id': run_id,
+        'dry_run': dry_run,
+        'force': force,
+        'elapsed_seconds': round(time.perf_counter() - start, 2),
+        'steps': [
+            {'name': name, 'depends_on': sorted(deps[name]), **records.get(name, {'status': status[name]})}
+            for name in by_name
+        ]
+    }
+    run_log_path = PIPELINE_DIR / f'run_{run_id}.json'
+    run_log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(run_log_path, 'w', encoding='utf-8') as f:
+        json.dump(run_log, f, indent=2, ensure_ascii=False)
+
+    logger.info("=" * 70)
+    for entry in run_log['steps']:
+        elapsed = f" ({entry['elapsed_seconds']} s)" if 'elapsed_seconds' in entry else ''
+        logger.info(f"  {entry['name']}: {entry['status']}{elapsed}")
+    logger.info(f"Tiempo total: {run_log['elapsed_seconds']} s")
+    logger.info(f"Log de la corrida: {run_log_path}")
+    return run_log
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Ejecuta los pasos del Deliverable 4 con caché')
+    parser.add_argument('--steps', nargs='+', default=None,
+                        help=f"Pasos a considerar (default: todos: {' '.join(s['name'] for s in STEPS)})")
+    parser.add_argument('--force', action='store_true', help='Ejecutar aunque las entradas no cambien')
+    parser.add_argument('--dry-run', action='store_true', help='Solo mostrar qué pasos correrían')
+    parser.add_argument('--parallel', type=int, default=None, help='Pasos simultáneos (default: sin límite)')
+    args = parser.parse_args()
+
+    run_log = run_pipeline(
+        selected=args.steps,
+        force=args.force,
+        dry_run=args.dry_run,
+        max_parallel=args.parallel
+    )
+    failed = [s['name'] for s in run_log['steps'] if s['status'] in ('failed', 'blocked')]
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
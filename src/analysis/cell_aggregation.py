@@ -0,0 +1,323 @@
+"""
+Agregación de edificaciones en una grilla regular recortada a municipios PDET
+
+Los totales municipales esconden dónde se concentran los techos. Esta
+etapa reparte conteo, área de techo y área útil en celdas cuadradas de
+DEFAULT_RESOLUTION grados (~1 km) recortadas al polígono de cada
+municipio PDET:
+
+1. Un solo recorrido por municipio: $geoWithin sobre el centroide y
+   $group por el identificador de celda (coordenadas del centroide
+   divididas por la resolución y truncadas), con el mismo pipeline de
+   density_grid.py. No hay una consulta por celda
+2. Las celdas resultantes se construyen y recortan al municipio en bloque
+   con Shapely (box + intersection vectorizados); el área de la celda
+   recortada (EPSG:3116) da la densidad por km²
+3. Los documentos se guardan en la colección buildings_by_cell con índices
+   (dataset, resolution, muni_code) y 2dsphere sobre el centro de la celda
+
+Exporta GeoJSON (GeoJSONWriter) y, si pyarrow está instalado, GeoParquet
+para 05_generate_visualizations.py y análisis externos.
+
+Uso:
+    python src/analysis/cell_aggregation.py --dataset microsoft --resolution 0.01
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import json
+from pathlib import Path
+from datetime import datetime
+import logging
+
+import numpy as np
+import shapely
+from shapely.geometry import shape, mapping
+from tqdm import tqdm
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.analysis.density_grid import grid_pipeline, DEFAULT_RESOLUTION
+from src.utils.geometry_arrays import project_geometries, get_transformer
+from src.utils.geojson_writer import GeoJSONWriter, DEFAULT_PRECISION
+
+logger = logging.getLogger(__name__)
+
+CELLS_COLLECTION = 'buildings_by_cell'
+OUTPUT_DIR = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'geojson'
+GEOPARQUET_VERSION = '1.1.0'
+
+POLYGON_TYPES = (3, 6)       # shapely: Polygon, MultiPolygon
+
+# Propiedades exportadas por celda (GeoJSON y GeoParquet)
+EXPORT_FIELDS = (
+    'cell_id', 'muni_code', 'muni_name', 'building_count', 'roof_area_m2',
+    'useful_area_m2', 'cell_area_km2', 'buildings_per_km2', 'useful_area_pct'
+)
+
+
+def cell_id(x, y, resolution):
+    """Identificador estable de celda: resolución y coordenadas enteras"""
+    return f'{resolution:g}:{int(x)}:{int(y)}'
+
+
+def polygonal_part(geom):
+    """
+    Parte poligonal de un recorte
+
+    La intersección de una celda con el borde municipal puede devolver
+    GeometryCollection con líneas o puntos (celdas que solo tocan el borde).
+
+    Returns:
+        Polygon/MultiPolygon o None si no queda área
+    """
+    if geom is None or shapely.is_empty(geom):
+        return None
+    type_id = shapely.get_type_id(geom)
+    if type_id in POLYGON_TYPES:
+        return geom
+    parts = [p for p in shapely.get_parts(geom) if shapely.get_type_id(p) in POLYGON_TYPES]
+    if not parts:
+        return None
+    return parts[0] if len(parts) == 1 else shapely.union_all(parts)
+
+
+def clip_cells(cells, resolution, muni_geom):
+    """
+    Construye las celdas y las recorta al polígono del municipio
+
+    Args:
+        cells (list): Salida de grid_pipeline (x, y, count, area_m2, useful_area_m2)
+        resolution (float): Tamaño de celda en grados
+        muni_geom: Geometría Shapely del municipio
+
+    Returns:
+        np.ndarray: Geometrías recortadas (None donde no queda área)
+    """
+    x = np.array([c['x'] for c in cells], dtype=np.float64)
+    y = np.array([c['y'] for c in cells], dtype=np.float64)
+    boxes = shapely.box(x * resolution, y * resolution, (x + 1) * resolution, (y + 1) * resolution)
+
+    shapely.prepare(muni_geom)
+    inside = shapely.contains_properly(muni_geom, boxes)
+    clipped = boxes.copy()
+    border = ~inside
+    if border.any():
+        clipped[border] = shapely.intersection(boxes[border], muni_geom)
+    return np.array([polygonal_part(g) for g in clipped], dtype=object)
+
+
+def municipality_cells(collection, dataset, muni, resolution, transformer):
+    """
+    Celdas con edificaciones de un municipio (un $geoWithin + $group)
+
+    Returns:
+        list: Documentos para buildings_by_cell
+    """
+    cells = list(collection.aggregate(
+        grid_pipeline(dataset, resolution, bbox=None, geometry=muni['geom']),
+        allowDiskUse=True
+    ))
+    if not cells:
+        return []
+
+    geoms = clip_cells(cells, resolution, shape(muni['geom']))
+    has_area = np.array([g is not None for g in geoms])
+    area_km2 = np.zeros(len(cells))
+    if has_area.any():
+        area_km2[has_area] = shapely.area(project_geometries(geoms[has_area], transformer)) / 1e6
+
+    now = datetime.utcnow()
+    docs = []
+    for cell, geom, cell_area in zip(cells, geoms, area_km2):
+        # Edificaciones con centroide en el municipio pero celda recortada a
+        # una línea: se conserva la celda completa para no perder el conteo
+        if geom is None:
+            x, y = cell['x'], cell['y']
+            geom = shapely.box(x * resolution, y * resolution, (x + 1) * resolution, (y + 1) * resolution)
+            cell_area = 0.0
+
+        roof = cell.get('area_m2') or 0.0
+        useful = cell.get('useful_area_m2') or 0.0
+        docs.append({
+            'dataset': dataset,
+            'resolution': resolution,
+            'cell_id': cell_id(cell['x'], cell['y'], resolution),
+            'muni_code': muni.get('muni_code'),
+            'muni_name': muni.get('muni_name'),
+            'geometry': mapping(geom),
+            'center': {
+                'type': 'Point',
+                'coordinates': [(cell['x'] + 0.5) * resolution, (cell['y'] + 0.5) * resolution]
+            },
+            'building_count': cell['count'],
+            'roof_area_m2': round(roof, 2),
+            'useful_area_m2': round(useful, 2),
+            'cell_area_km2': round(float(cell_area), 4),
+            'buildings_per_km2': round(cell['count'] / cell_area, 2) if cell_area > 0 else None,
+            'useful_area_pct': round(100 * useful / (cell_area * 1e6), 4) if cell_area > 0 else None,
+            'created_at': now
+        })
+    return docs
+
+
+def aggregate_cells(dataset='microsoft', resolution=DEFAULT_RESOLUTION):
+    """
+    Recalcula buildings_by_cell para un dataset y una resolución
+
+    Returns:
+        dict: municipalities, cells, buildings
+    """
+    db = get_database()
+    collection = db[f'{dataset}_buildings']
+    target = db[CELLS_COLLECTION]
+    transformer = get_transformer()
+
+    logger.info("=" * 70)
+    logger.info(f"AGREGACIÓN POR CELDA: {dataset} @ {resolution}°")
+    logger.info("=" * 70)
+
+    municipalities = list(db.pdet_municipalities.find({}, {'muni_code': 1, 'muni_name': 1, 'geom': 1}))
+    target.delete_many({'dataset': dataset, 'resolution': resolution})
+
+    summary = {'municipalities': 0, 'cells': 0, 'buildings': 0}
+    for muni in tqdm(municipalities, desc=f"Celdas {dataset}"):
+        if not muni.get('geom'):
+            continue
+        try:
+            docs = municipality_cells(collection, dataset, muni, resolution, transformer)
+        except Exception as e:
+            logger.warning(f"Error en {muni.get('muni_name', 'Unknown')}: {str(e)}")
+            continue
+        if docs:
+            target.insert_many(docs, ordered=False)
+        summary['municipalities'] += 1
+        summary['cells'] += len(docs)
+        summary['buildings'] += sum(d['building_count'] for d in docs)
+
+    target.create_index([('dataset', 1), ('resolution', 1), ('muni_code', 1)])
+    target.create_index([('dataset', 1), ('resolution', 1), ('cell_id', 1)])
+    target.create_index([('center', '2dsphere')])
+
+    logger.info(f"Municipios: {summary['municipalities']} | celdas: {summary['cells']:,}")
+    logger.info(f"Edificaciones asignadas: {summary['buildings']:,}")
+    return summary
+
+
+def cell_features(db, dataset, resolution):
+    """Itera las celdas de buildings_by_cell como features GeoJSON"""
+    cursor = db[CELLS_COLLECTION].find(
+        {'dataset': dataset, 'resolution': resolution},
+        {'_id': 0, 'geometry': 1, **{field: 1 for field in EXPORT_FIELDS}}
+    ).sort([('muni_code', 1), ('cell_id', 1)])
+    for doc in cursor:
+        yield {
+            'type': 'Feature',
+            'geometry': doc['geometry'],
+            'properties': {field: doc.get(field) for field in EXPORT_FIELDS}
+        }
+
+
+def export_geojson(db, dataset, resolution=DEFAULT_RESOLUTION, output_dir=None, precision=DEFAULT_PRECISION):
+    """
+    Exporta las celdas a buildings_by_cell_<dataset>.geojson
+
+    Returns:
+        Path: Archivo escrito
+    """
+    output_dir = Path(output_dir or OUTPUT_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f'{CELLS_COLLECTION}_{dataset}.geojson'
+
+    with GeoJSONWriter(output_path, precision=precision, name=f'{CELLS_COLLECTION}_{dataset}') as writer:
+        for feature in cell_features(db, dataset, resolution):
+            writer.write(feature)
+
+    logger.info(f"GeoJSON exportado: {output_path} ({writer.count:,} celdas)")
+    return output_path
+
+
+def export_geoparquet(db, dataset, resolution=DEFAULT_RESOLUTION, output_dir=None):
+    """
+    Exporta las celdas a buildings_by_cell_<dataset>.parquet (GeoParquet, WKB)
+
+    Returns:
+        Path: Archivo escrito
+    """
+    if pa is None:
+        raise ImportError("La exportación GeoParquet requiere el paquete 'pyarrow' (pip install pyarrow)")
+
+    output_dir = Path(output_dir or OUTPUT_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f'{CELLS_COLLECTION}_{dataset}.parquet'
+
+    features = list(cell_features(db, dataset, resolution))
+    geoms = np.array([shape(f['geometry']) for f in features], dtype=object)
+    columns = {
+        field: pa.array([f['properties'][field] for f in features], from_pandas=True)
+        for field in EXPORT_FIELDS
+    }
+    columns['geometry'] = pa.array(shapely.to_wkb(geoms) if len(geoms) else [], type=pa.binary())
+
+    geo = {
+        'version': GEOPARQUET_VERSION,
+        'primary_column': 'geometry',
+        'columns': {
+            'geometry': {
+                'encoding': 'WKB',
+                'geometry_types': ['Polygon', 'MultiPolygon'],
+                'bbox': list(shapely.total_bounds(geoms)) if len(geoms) else []
+            }
+        }
+    }
+    table = pa.table(columns).replace_schema_metadata({b'geo': json.dumps(geo).encode('utf-8')})
+    pq.write_table(table, output_path, compression='zstd')
+
+    logger.info(f"GeoParquet exportado: {output_path} ({len(features):,} celdas)")
+    return output_path
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Conteo y área de edificaciones por celda de grilla')
+    parser.add_argument(
+        '--dataset',
+        nargs='+',
+        default=['microsoft', 'google'],
+        help='Datasets a procesar (default: microsoft google)'
+    )
+    parser.add_argument('--resolution', type=float, default=DEFAULT_RESOLUTION,
+                        help=f'Tamaño de celda en grados (default: {DEFAULT_RESOLUTION})')
+    parser.add_argument('--skip-compute', action='store_true', help='Solo exportar celdas ya calculadas')
+    parser.add_argument('--no-parquet', action='store_true', help='No exportar GeoParquet')
+    args = parser.parse_args()
+
+    db = get_database()
+    for dataset in args.dataset:
+        if not args.skip_compute:
+            aggregate_cells(dataset, args.resolution)
+        export_geojson(db, dataset, args.resolution)
+        if not args.no_parquet:
+            try:
+                export_geoparquet(db, dataset, args.resolution)
+            except ImportError as e:
+                logger.warning(f"GeoParquet omitido: {str(e)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Histogramas acumulados de confianza para Google Open Buildings
+
+Permite que el join espacial emita, en la misma pasada, conteos y áreas
+acumuladas por umbral de confianza (0.65 - 1.00 en pasos de 0.01).
+Con esto cualquier pregunta del tipo "¿cuántas edificaciones con
+confianza >= X?" se responde desde buildings_by_municipality sin
+repetir el join.
+
+Estructura guardada en buildings_by_municipality.google.confidence_hist:
+
+    {
+        'thresholds': [0.65, 0.66, ..., 1.0],
+        'count_ge': [...],      # edificaciones con confianza >= umbral
+        'area_ge_m2': [...],    # área de techos con confianza >= umbral
+        'useful_area_ge_m2': [...]  # área útil por edificación (si existe)
+    }
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+from itertools import accumulate
+
+# Rango de confianza de Google Open Buildings v3 (el cargador descarta < 0.65)
+CONFIDENCE_MIN = 0.65
+CONFIDENCE_MAX = 1.00
+CONFIDENCE_STEP = 0.01
+
+NUM_THRESHOLDS = int(round((CONFIDENCE_MAX - CONFIDENCE_MIN) / CONFIDENCE_STEP)) + 1
+
+# Umbrales redondeados para que coincidan exactamente con los valores del CSV
+THRESHOLDS = [round(CONFIDENCE_MIN + i * CONFIDENCE_STEP, 2) for i in range(NUM_THRESHOLDS)]
+
+# $bucket usa límites [a, b); se agrega un límite extra para incluir confianza == 1.0
+BUCKET_BOUNDARIES = THRESHOLDS + [round(CONFIDENCE_MAX + CONFIDENCE_STEP, 2)]
+
+
+def confidence_histogram_facet(area_field='$properties.area_in_meters'):
+    """
+    Rama de $facet que agrupa edificaciones por bin de confianza
+
+    Args:
+        area_field (str): Expresión del campo de área a sumar
+
+    Returns:
+        list: Stages de agregación para usar dentro de un $facet
+    """
+    return [
+        {
+            '$bucket': {
+                'groupBy': '$properties.confidence',
+                'boundaries': BUCKET_BOUNDARIES,
+                'default': 'fuera_de_rango',
+                'output': {
+                    'count': {'$sum': 1},
+                    'area_m2': {'$sum': area_field},
+                    'useful_area_m2': {'$sum': '$properties.useful_area_m2'}
+                }
+            }
+        }
+    ]
+
+
+def cumulative_histogram(buckets):
+    """
+    Convierte la salida de $bucket en histogramas acumulados (>= umbral)
+
+    Args:
+        buckets (list): Documentos {'_id': límite_inferior, 'count', 'area_m2'}
+
+    Returns:
+        dict: thresholds, count_ge y area_ge_m2 alineados por índice
+    """
+    counts = [0] * NUM_THRESHOLDS
+    areas = [0.0] * NUM_THRESHOLDS
+    useful = [0.0] * NUM_THRESHOLDS
+
+    for bucket in buckets:
+        lower = bucket.get('_id')
+        if not isinstance(lower, (int, float)):
+            # Bucket 'fuera_de_rango' (confianza < 0.65 o faltante)
+            continue
+        idx = threshold_index(lower)
+        counts[idx] += bucket.get('count', 0)
+        areas[idx] += bucket.get('area_m2', 0) or 0
+        useful[idx] += bucket.get('useful_area_m2', 0) or 0
+
+    # Suma acumulada desde el umbral más alto hacia el más bajo
+    def cumulative(values):
+        return list(accumulate(reversed(values)))[::-1]
+
+    hist = {
+        'thresholds': THRESHOLDS,
+        'count_ge': cumulative(counts),
+        'area_ge_m2': [round(a, 2) for a in cumulative(areas)]
+    }
+
+    # Área útil por edificación (usable_roof_area.py), si ya fue calculada
+    if any(useful):
+        hist['useful_area_ge_m2'] = [round(a, 2) for a in cumulative(useful)]
+
+    return hist
+
+
+def threshold_index(threshold):
+    """
+    Índice del umbral dentro de los arreglos del histograma
+
+    Args:
+        threshold (float): Umbral de confianza (0.65 - 1.00, múltiplo de 0.01)
+
+    Returns:
+        int: Posición en thresholds / count_ge / area_ge_m2
+
+    Raises:
+        ValueError: Si el umbral está fuera de rango o no cae en un bin
+    """
+    idx = int(round((threshold - CONFIDENCE_MIN) / CONFIDENCE_STEP))
+    if not 0 <= idx < NUM_THRESHOLDS or abs(THRESHOLDS[idx] - threshold) > 1e-9:
+        raise ValueError(
+            f"Umbral de confianza inválido: {threshold} "
+            f"(debe estar entre {CONFIDENCE_MIN} y {CONFIDENCE_MAX} en pasos de {CONFIDENCE_STEP})"
+        )
+    return idx
+
+
+def value_at_threshold(hist, threshold, key='count_ge'):
+    """
+    Consulta un histograma acumulado para un umbral dado
+
+    Args:
+        hist (dict): Histograma guardado en buildings_by_municipality
+        threshold (float): Umbral de confianza
+        key (str): 'count_ge', 'area_ge_m2', 'useful_area_ge_m2' o 'area_util_ge_m2'
+
+    Returns:
+        float: Valor acumulado para confianza >= threshold (0 si no hay datos)
+    """
+    if not hist or key not in hist:
+        return 0
+    return hist[key][threshold_index(threshold)]
@@ -0,0 +1,331 @@
+"""
+Capa raster de cobertura de techos y estadísticas zonales por municipio
+
+Quema las huellas de edificaciones en un GeoTIFF de cobertura fraccional
+(fracción de cada píxel cubierta por techos, 0-1) en EPSG:3116:
+
+1. La extensión de los municipios PDET se divide en ventanas de
+   TILE_SIZE píxeles; solo se procesan las ventanas que tocan algún
+   municipio
+2. Cada proceso lee las edificaciones de su ventana ($geoWithin sobre el
+   índice 2dsphere de centroid, con halo para huellas que cruzan el
+   borde), las proyecta y las rasteriza con rasterio a SUPERSAMPLE veces
+   la resolución; el promedio de cada bloque SUPERSAMPLE×SUPERSAMPLE es
+   la fracción cubierta del píxel
+3. El proceso principal escribe cada ventana en el GeoTIFF (teselado,
+   comprimido); la memoria está acotada por el tamaño de la ventana
+
+Las estadísticas zonales leen el raster por franjas dentro del bbox de
+cada municipio y enmascaran con su polígono: la cobertura queda en
+buildings_by_municipality.<dataset>.raster_coverage y
+02_generate_statistics.py puede usarla con --coverage-source raster.
+
+Uso:
+    python src/analysis/coverage_raster.py --dataset microsoft --pixel-size 30
+    python src/analysis/coverage_raster.py --dataset microsoft --zonal-only
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import os
+import math
+import time
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import logging
+
+import numpy as np
+import shapely
+from shapely.geometry import shape
+import rasterio
+from rasterio.features import rasterize, geometry_mask
+from rasterio.transform import from_origin
+from rasterio.windows import Window, from_bounds
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.analysis.density_grid import bbox_polygon
+from src.utils.geometry_arrays import polygons_from_docs, project_geometries, get_transformer, WGS84, COLOMBIA_CRS
+
+logger = logging.getLogger(__name__)
+
+RASTER_DIR = PROJECT_ROOT / 'data' / 'processed' / 'rasters'
+PIXEL_SIZE_M = 30.0
+SUPERSAMPLE = 5              # Subpíxeles por lado (30 m -> 6 m)
+TILE_SIZE = 1024             # Píxeles por lado de cada ventana de trabajo
+BLOCK_SIZE = 512             # Bloque interno del GeoTIFF
+HALO_DEG = 0.003             # ~330 m: huellas con centroide fuera de la ventana
+
+
+def raster_path(dataset, pixel_size=PIXEL_SIZE_M):
+    """Ruta del GeoTIFF de cobertura de un dataset"""
+    return RASTER_DIR / f'{dataset}_roof_coverage_{int(pixel_size)}m.tif'
+
+
+def load_municipalities(db):
+    """
+    Municipios PDET con geometría proyectada a EPSG:3116
+
+    Returns:
+        tuple: (documentos, arreglo de geometrías proyectadas)
+    """
+    munis = [m for m in db.pdet_municipalities.find({}, {'muni_code': 1, 'muni_name': 1, 'geom': 1}) if m.get('geom')]
+    geoms = np.array([shape(m['geom']) for m in munis], dtype=object)
+    return munis, project_geometries(geoms, get_transformer())
+
+
+def raster_grid(muni_geoms, pixel_size=PIXEL_SIZE_M, tile_size=TILE_SIZE):
+    """
+    Transformación, tamaño y ventanas de trabajo del raster
+
+    La extensión se alinea a múltiplos del tamaño de píxel para que
+    rasters de distintos datasets sean comparables celda a celda.
+
+    Returns:
+        tuple: (transform, width, height, lista de Window que tocan municipios)
+    """
+    minx, miny, maxx, maxy = shapely.total_bounds(muni_geoms)
+    minx = math.floor(minx / pixel_size) * pixel_size
+    miny = math.floor(miny / pixel_size) * pixel_size
+    maxx = math.ceil(maxx / pixel_size) * pixel_size
+    maxy = math.ceil(maxy / pixel_size) * pixel_size
+
+    width = int(round((maxx - minx) / pixel_size))
+    height = int(round((maxy - miny) / pixel_size))
+    transform = from_origin(minx, maxy, pixel_size, pixel_size)
+
+    windows = [
+        Window(col, row, min(tile_size, width - col), min(tile_size, height - row))
+        for row in range(0, height, tile_size)
+        for col in range(0, width, tile_size)
+    ]
+    boxes = np.array([
+        shapely.box(*rasterio.windows.bounds(w, transform)) for w in windows
+    ], dtype=object)
+    hits = np.unique(shapely.STRtree(muni_geoms).query(boxes, predicate='intersects')[0])
+    return transform, width, height, [windows[i] for i in hits]
+
+
+def window_lonlat_bbox(bounds, halo=HALO_DEG):
+    """bbox lon/lat (con halo) de una ventana en EPSG:3116"""
+    left, bottom, right, top = bounds
+    to_wgs84 = get_transformer(COLOMBIA_CRS, WGS84)
+    xs, ys = to_wgs84.transform([left, right, right, left], [bottom, bottom, top, top])
+    return (min(xs) - halo, min(ys) - halo, max(xs) + halo, max(ys) + halo)
+
+
+def burn_window(dataset, window, transform, supersample=SUPERSAMPLE):
+    """
+    Worker: cobertura fraccional de una ventana
+
+    Returns:
+        tuple: (window, arreglo float32 (alto, ancho), edificaciones quemadas)
+    """
+    height, width = int(window.height), int(window.width)
+    coverage = np.zeros((height, width), dtype=np.float32)
+
+    bounds = rasterio.windows.bounds(window, transform)
+    docs = list(get_database()[f'{dataset}_buildings'].find(
+        {'centroid': {'$geoWithin': {'$geometry': bbox_polygon(window_lonlat_bbox(bounds))}}},
+        {'geometry': 1}
+    ))
+    if not docs:
+        return window, coverage, 0
+
+    geoms = project_geometries(polygons_from_docs(docs), get_transformer())
+    geoms = geoms[~shapely.is_missing(geoms) & ~shapely.is_empty(geoms)]
+    if len(geoms) == 0:
+        return window, coverage, 0
+
+    pixel_size = transform.a
+    fine_transform = from_origin(bounds[0], bounds[3], pixel_size / supersample, pixel_size / supersample)
+    fine = rasterize(
+        ((g, 1) for g in geoms),
+        out_shape=(height * supersample, width * supersample),
+        transform=fine_transform,
+        fill=0,
+        dtype='uint8'
+    )
+    coverage = fine.reshape(height, supersample, width, supersample).mean(axis=(1, 3), dtype=np.float32)
+    return window, coverage, len(geoms)
+
+
+def build_coverage_raster(dataset='microsoft', pixel_size=PIXEL_SIZE_M, num_workers=None, output_path=None):
+    """
+    Genera el GeoTIFF de cobertura fraccional de un dataset
+
+    Args:
+        dataset (str): 'microsoft' o 'google'
+        pixel_size (float): Tamaño de píxel en metros
+        num_workers (int, optional): Procesos paralelos
+        output_path (Path, optional): GeoTIFF de salida
+
+    Returns:
+        dict: path, windows, buildings, elapsed_seconds
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    output_path = Path(output_path or raster_path(dataset, pixel_size))
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    _, muni_geoms = load_municipalities(get_database())
+    transform, width, height, windows = raster_grid(muni_geoms, pixel_size)
+
+    logger.info("=" * 70)
+    logger.info(f"RASTER DE COBERTURA: {dataset} @ {pixel_size} m")
+    logger.info("=" * 70)
+    logger.info(f"Raster: {width:,} x {height:,} píxeles | ventanas con municipios: {len(windows):,}")
+    start = time.perf_counter()
+
+    profile = {
+        'driver': 'GTiff',
+        'dtype': 'float32',
+        'count': 1,
+        'width': width,
+        'height': height,
+        'crs': COLOMBIA_CRS,
+        'transform': transform,
+        'tiled': True,
+        'blockxsize': BLOCK_SIZE,
+        'blockysize': BLOCK_SIZE,
+        'compress': 'deflate',
+        'predictor': 3,
+        'BIGTIFF': 'IF_SAFER'
+    }
+
+    buildings = 0
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    # Un solo escritor: los procesos devuelven arreglos, el principal escribe
+    with rasterio.open(tmp_path, 'w', **profile) as dst:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = executor.map(
+                burn_window,
+                [dataset] * len(windows), windows, [transform] * len(windows),
+                chunksize=2
+            )
+            for window, coverage, burned in tqdm(results, total=len(windows), desc="Ventanas"):
+                dst.write(coverage, 1, window=window)
+                buildings += burned
+        dst.update_tags(dataset=dataset, pixel_size_m=pixel_size, supersample=SUPERSAMPLE,
+                        created_at=datetime.utcnow().isoformat())
+    os.replace(tmp_path, output_path)
+
+    summary = {
+        'path': output_path,
+        'windows': len(windows),
+        'buildings': buildings,
+        'elapsed_seconds': round(time.perf_counter() - start, 1)
+    }
+    logger.info(f"GeoTIFF escrito: {output_path} ({output_path.stat().st_size / 1024 ** 2:.1f} MB)")
+    logger.info(f"Huellas quemadas: {buildings:,} (las que cruzan ventanas cuentan en cada una)")
+    logger.info(f"Tiempo: {summary['elapsed_seconds']} s")
+    return summary
+
+
+def zonal_coverage(src, geom, strip_rows=TILE_SIZE):
+    """
+    Cobertura de techos dentro de un polígono (EPSG:3116), leyendo por franjas
+
+    Args:
+        src: Dataset rasterio abierto
+        geom: Polígono proyectado del municipio
+        strip_rows (int): Filas por lectura (memoria acotada)
+
+    Returns:
+        dict: pixels, roof_area_km2, coverage_pct
+    """
+    pixel_area = abs(src.transform.a * src.transform.e)
+    full = Window(0, 0, src.width, src.height)
+    window = from_bounds(*shapely.bounds(geom), transform=src.transform)
+    window = window.round_offsets().round_lengths().intersection(full)
+
+    pixels = 0
+    covered = 0.0
+    row_end = int(window.row_off + window.height)
+    for row in range(int(window.row_off), row_end, strip_rows):
+        strip = Window(window.col_off, row, window.width, min(strip_rows, row_end - row))
+        data = src.read(1, window=strip)
+        inside = geometry_mask(
+            [geom], out_shape=data.shape, transform=src.window_transform(strip), invert=True
+        )
+        pixels += int(inside.sum())
+        covered += float(data[inside].sum(dtype=np.float64))
+
+    roof_area_m2 = covered * pixel_area
+    zone_area_m2 = pixels * pixel_area
+    return {
+        'pixels': pixels,
+        'roof_area_km2': round(roof_area_m2 / 1e6, 6),
+        'coverage_pct': round(100 * roof_area_m2 / zone_area_m2, 4) if zone_area_m2 else 0.0
+    }
+
+
+def zonal_statistics(dataset='microsoft', pixel_size=PIXEL_SIZE_M, path=None):
+    """
+    Cobertura por municipio desde el raster
+
+    Guarda buildings_by_municipality.<dataset>.raster_coverage.
+
+    Returns:
+        int: Municipios actualizados
+    """
+    path = Path(path or raster_path(dataset, pixel_size))
+    if not path.exists():
+        raise FileNotFoundError(f"{path} no existe (generar primero el raster de cobertura)")
+
+    db = get_database()
+    munis, muni_geoms = load_municipalities(db)
+    stats_collection = db.buildings_by_municipality
+    updated = 0
+
+    with rasterio.open(path) as src:
+        for muni, geom in tqdm(list(zip(munis, muni_geoms)), desc=f"Estadísticas zonales ({dataset})"):
+            try:
+                stats = zonal_coverage(src, geom)
+            except Exception as e:
+                logger.warning(f"Error en {muni.get('muni_name', 'Unknown')}: {str(e)}")
+                continue
+            stats.update({'pixel_size_m': pixel_size, 'raster': path.name})
+            stats_collection.update_one(
+                {'muni_code': muni.get('muni_code')},
+                {'$set': {f'{dataset}.raster_coverage': stats, 'updated_at': datetime.utcnow()}}
+            )
+            updated += 1
+
+    logger.info(f"Cobertura raster guardada para {updated} municipios")
+    return updated
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Raster de cobertura de techos y estadísticas zonales')
+    parser.add_argument(
+        '--dataset',
+        nargs='+',
+        default=['microsoft', 'google'],
+        help='Datasets a procesar (default: microsoft google)'
+    )
+    parser.add_argument('--pixel-size', type=float, default=PIXEL_SIZE_M,
+                        help=f'Tamaño de píxel en metros (default: {PIXEL_SIZE_M})')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos')
+    parser.add_argument('--zonal-only', action='store_true',
+                        help='Solo estadísticas zonales sobre un raster existente')
+    args = parser.parse_args()
+
+    for dataset in args.dataset:
+        if not args.zonal_only:
+            build_coverage_raster(dataset, args.pixel_size, num_workers=args.workers)
+        zonal_statistics(dataset, args.pixel_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Grillas de densidad de edificaciones calculadas en el servidor
+
+Para un mapa de calor a nivel de edificación no hace falta descargar
+millones de centroides: MongoDB agrupa los centroides en celdas de
+tamaño fijo ($group sobre coordenadas truncadas a la resolución) y
+devuelve solo conteos y sumas de área por celda. El número de filas
+depende de la resolución y del bbox: a 0.01° sobre todo el país pueden
+ser decenas de miles de celdas pobladas, así que los mapas de todo el
+territorio usan MAP_GRID_RESOLUTION y el bbox de los municipios PDET
+(pdet_bbox): del orden de miles de celdas.
+
+Los resultados se guardan en la colección density_grid_cache con clave
+(dataset, resolución, bbox). La caché se invalida sola cuando cambia la
+marca de la colección de edificaciones: número de documentos, último _id
+y máximo de updated_at (lo escriben las etapas que modifican áreas, p. ej.
+src/preprocessing/usable_roof_area.py, que también crea su índice). Sin
+ese índice no se consulta updated_at: ordenar por un campo sin índice
+recorrería millones de documentos en cada consulta de caché.
+
+Uso:
+    from src.analysis.density_grid import density_grid
+    cells = density_grid(db, 'microsoft', resolution=0.01, bbox=(-76, 1, -74, 3))
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import math
+from pathlib import Path
+from datetime import datetime
+import logging
+
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.partitioning import bbox_polygon
+from src.analysis.size_distribution import AREA_FIELDS
+
+logger = logging.getLogger(__name__)
+
+CACHE_COLLECTION = 'density_grid_cache'
+DEFAULT_RESOLUTION = 0.01          # Grados (~1.1 km)
+MAP_GRID_RESOLUTION = 0.05         # Grados (~5.5 km): mapas de todo el territorio PDET
+MAX_CACHED_CELLS = 150000          # ~83 bytes BSON por celda: ~12 MB, bajo el límite de 16 MB
+WATERMARK_FIELD = 'updated_at'
+
+# Extensión de Colombia (se usa si no se pide bbox)
+COLOMBIA_BBOX = (-79.0, -4.3, -66.8, 12.5)
+
+
+def snap_bbox(bbox, resolution):
+    """Ajusta el bbox a múltiplos de la resolución (claves de caché estables)"""
+    minx, miny, maxx, maxy = bbox
+    eps = 1e-9    # Evita que 4.1 / 0.01 = 409.999... baje una celda
+    return (
+        round(math.floor(minx / resolution + eps) * resolution, 6),
+        round(math.floor(miny / resolution + eps) * resolution, 6),
+        round(math.ceil(maxx / resolution - eps) * resolution, 6),
+        round(math.ceil(maxy / resolution - eps) * resolution, 6)
+    )
+
+
+def pdet_bbox(db):
+    """Bbox (minx, miny, maxx, maxy) de los municipios PDET; Colombia si no hay geometrías"""
+    geoms = [shape(m['geom']) for m in db.pdet_municipalities.find({}, {'geom': 1}) if m.get('geom')]
+    if not geoms:
+        return COLOMBIA_BBOX
+    return tuple(float(v) for v in shapely.total_bounds(geoms))
+
+
+def grid_pipeline(dataset, resolution, bbox, geometry=None):
+    """
+    Pipeline que agrupa centroides en celdas de la resolución dada
+
+    Args:
+        dataset (str): 'microsoft' o 'google'
+        resolution (float): Tamaño de celda en grados
+        bbox (tuple): (minx, miny, maxx, maxy)
+        geometry (dict, optional): Geometría GeoJSON que reemplaza al bbox
+            en el $geoWithin (p. ej. el polígono de un municipio)
+
+    Returns:
+        list: Stages de agregación
+    """
+    area_field = f'${AREA_FIELDS[dataset]}'
+    return [
+        {'$match': {'centroid': {'$geoWithin': {'$geometry': geometry or bbox_polygon(bbox)}}}},
+        {
+            '$group': {
+                '_id': {
+                    'x': {'$floor': {'$divide': [{'$arrayElemAt': ['$centroid.coordinates', 0]}, resolution]}},
+                    'y': {'$floor': {'$divide': [{'$arrayElemAt': ['$centroid.coordinates', 1]}, resolution]}}
+                },
+                'count': {'$sum': 1},
+                'area_m2': {'$sum': area_field},
+                'useful_area_m2': {'$sum': '$properties.useful_area_m2'}
+            }
+        },
+        {
+            '$project': {
+                '_id': 0,
+                'x': '$_id.x',
+                'y': '$_id.y',
+                'count': 1,
+                'area_m2': {'$round': ['$area_m2', 2]},
+                'useful_area_m2': {'$round': ['$useful_area_m2', 2]}
+            }
+        }
+    ]
+
+
+def watermark_indexed(collection):
+    """True si algún índice empieza por WATERMARK_FIELD"""
+    return any(
+        info['key'][0][0] == WATERMARK_FIELD
+        for info in collection.index_information().values()
+    )
+
+
+def source_watermark(collection):
+    """
+    Marca de cambios de una colección de edificaciones
+
+    Conteo (inserciones/borrados), último _id (recargas con el mismo
+    conteo) y máximo de updated_at (actualizaciones de área sin cambio
+    de conteo). updated_at solo se consulta si tiene índice; quien lo
+    escribe crea el índice, así que sin índice no hay nada que leer.
+
+    Returns:
+        dict: count, last_id, updated_at
+    """
+    last = list(collection.find({}, {'_id': 1}).sort('_id', -1).limit(1))
+    latest = []
+    if watermark_indexed(collection):
+        latest = list(
+            collection.find({WATERMARK_FIELD: {'$exists': True}}, {WATERMARK_FIELD: 1})
+            .sort(WATERMARK_FIELD, -1).limit(1)
+        )
+    return {
+        'count': collection.estimated_document_count(),
+        'last_id': str(last[0]['_id']) if last else None,
+        'updated_at': latest[0].get(WATERMARK_FIELD) if latest else None
+    }
+
+
+def density_grid(db, dataset, resolution=DEFAULT_RESOLUTION, bbox=None, use_cache=True):
+    """
+    Conteo y área de edificaciones por celda, calculados en MongoDB
+
+    Args:
+        db: Conexión a MongoDB
+        dataset (str): 'microsoft' o 'google'
+        resolution (float): Tamaño de celda en grados
+        bbox (tuple, optional): (minx, miny, maxx, maxy); default Colombia
+        use_cache (bool): Leer/escribir density_grid_cache
+
+    Returns:
+        pd.DataFrame: lon, lat (centro de celda), count, area_m2, useful_area_m2
+    """
+    bbox = snap_bbox(bbox or COLOMBIA_BBOX, resolution)
+    collection = db[f'{dataset}_buildings']
+    cache = db[CACHE_COLLECTION]
+    key = {'dataset': dataset, 'resolution': resolution, 'bbox': list(bbox)}
+    source = source_watermark(collection)
+
+    cells = None
+    if use_cache:
+        cached = cache.find_one(key)
+        if cached and cached.get('source') == source:
+            cells = cached['cells']
+            logger.info(f"Grilla {dataset} @ {resolution}° desde caché ({len(cells):,} celdas)")
+
+    if cells is None:
+        cells = list(collection.aggregate(grid_pipeline(dataset, resolution, bbox), allowDiskUse=True))
+        logger.info(f"Grilla {dataset} @ {resolution}° calculada en MongoDB ({len(cells):,} celdas)")
+
+        if use_cache:
+            if len(cells) <= MAX_CACHED_CELLS:
+                cache.create_index([('dataset', 1), ('resolution', 1), ('bbox', 1)])
+                cache.replace_one(
+                    key,
+                    {**key, 'source': source, 'cells': cells, 'created_at': datetime.utcnow()},
+                    upsert=True
+                )
+            else:
+                logger.warning(f"{len(cells):,} celdas: demasiadas para la caché, no se guardan")
+
+    df = pd.DataFrame(cells, columns=['x', 'y', 'count', 'area_m2', 'useful_area_m2'])
+    df['lon'] = (df['x'] + 0.5) * resolution
+    df['lat'] = (df['y'] + 0.5) * resolution
+    return df[['lon', 'lat', 'count', 'area_m2', 'useful_area_m2']]
+
+
+def heatmap_points(df, weight='count'):
+    """
+    Puntos [lat, lon, peso normalizado] para folium.plugins.HeatMap
+
+    Args:
+        df (pd.DataFrame): Salida de density_grid
+        weight (str): Columna de peso ('count', 'area_m2' o 'useful_area_m2')
+    """
+    values = df[weight].astype(float)
+    top = values.max() if len(values) else 0
+    if top > 0:
+        values = values / top
+    return df[['lat', 'lon']].assign(w=values).values.tolist()
@@ -0,0 +1,320 @@
+"""
+Emparejamiento de huellas entre Microsoft y Google a nivel de edificación
+
+El análisis comparaba los datasets solo por conteos municipales
+(diff_count, agreement_score). Aquí cada huella de Microsoft se empareja
+con las huellas de Google que la solapan:
+
+1. El país se divide en celdas de CELL_SIZE grados; cada celda se procesa
+   en un proceso aparte
+2. Se leen las huellas de ambos datasets cuyo centroide cae en la celda
+   más un halo de HALO_DEG (las huellas que cruzan el borde también se ven)
+3. STRtree sobre las huellas de Google; los pares candidatos salen de
+   query(predicate='intersects') y se calcula IoU vectorizado
+4. Un par es coincidencia si IoU >= IOU_THRESHOLD
+
+Cada celda solo escribe las edificaciones cuyo centroide le pertenece,
+así el resultado no depende de la partición. En cada documento queda:
+
+    properties.match_status   'matched' | 'ms_only' | 'google_only'
+    properties.match_iou      mejor IoU con el otro dataset (0 si no hay)
+    properties.match_id       _id de la mejor pareja (None si no hay)
+
+El inventario fusionado (sin duplicados entre fuentes) es
+microsoft_buildings completo + google_buildings con match_status
+'google_only'. Por municipio se guarda buildings_by_municipality.
+footprint_matching con coincidencias, exclusivos y acuerdo.
+
+Uso:
+    python src/analysis/footprint_matching.py --workers 8
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import os
+import time
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import logging
+
+import numpy as np
+import shapely
+from pymongo import UpdateOne
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.database.partitioning import cell_query, cell_owned
+from src.analysis.density_grid import COLOMBIA_BBOX
+from src.analysis.municipality_rollup import rollup_by_municipality
+from src.utils.geometry_arrays import polygons_from_docs, points_from_docs
+
+logger = logging.getLogger(__name__)
+
+CELL_SIZE = 0.25          # Grados por celda de trabajo
+HALO_DEG = 0.002          # ~220 m: huellas vecinas que cruzan el borde de la celda
+IOU_THRESHOLD = 0.3
+MATCH_STATUSES = ('matched', 'ms_only', 'google_only')
+
+
+def grid_cells(bbox=COLOMBIA_BBOX, cell_size=CELL_SIZE):
+    """Celdas (cx, cy) que cubren el bbox"""
+    minx, miny, maxx, maxy = bbox
+    return [
+        (cx, cy)
+        for cy in range(int(np.floor(miny / cell_size)), int(np.ceil(maxy / cell_size)))
+        for cx in range(int(np.floor(minx / cell_size)), int(np.ceil(maxx / cell_size)))
+    ]
+
+
+def load_cell(collection, cell, cell_size=CELL_SIZE, halo=HALO_DEG):
+    """
+    Huellas con centroide en la celda + halo
+
+    Returns:
+        tuple: (ids, geometrías, máscara de pertenencia a la celda)
+    """
+    docs = list(collection.find(cell_query(cell, cell_size, halo), {'geometry': 1, 'centroid': 1}))
+    if not docs:
+        return np.array([], dtype=object), np.array([], dtype=object), np.array([], dtype=bool)
+
+    owned = cell_owned(points_from_docs(docs), cell, cell_size)
+    ids = np.empty(len(docs), dtype=object)
+    ids[:] = [d['_id'] for d in docs]
+
+    geoms = polygons_from_docs(docs)
+    # Huellas inválidas: make_valid para poder calcular intersecciones
+    invalid = ~shapely.is_valid(geoms) & ~shapely.is_missing(geoms)
+    if invalid.any():
+        geoms[invalid] = shapely.make_valid(geoms[invalid])
+
+    return ids, geoms, owned
+
+
+def match_footprints(ms_geoms, gg_geoms, iou_threshold=IOU_THRESHOLD):
+    """
+    Pares (i_ms, i_google, iou) con IoU >= umbral
+
+    Args:
+        ms_geoms (np.ndarray): Huellas Microsoft
+        gg_geoms (np.ndarray): Huellas Google
+        iou_threshold (float): IoU mínimo
+
+    Returns:
+        tuple: (ms_idx, gg_idx, iou)
+    """
+    empty = (np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([]))
+    if len(ms_geoms) == 0 or len(gg_geoms) == 0:
+        return empty
+
+    tree = shapely.STRtree(gg_geoms)
+    ms_idx, gg_idx = tree.query(ms_geoms, predicate='intersects')
+    if len(ms_idx) == 0:
+        return empty
+
+    a, b = ms_geoms[ms_idx], gg_geoms[gg_idx]
+    inter = shapely.area(shapely.intersection(a, b))
+    union = shapely.area(a) + shapely.area(b) - inter
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iou = np.where(union > 0, inter / union, 0.0)
+
+    keep = iou >= iou_threshold
+    return ms_idx[keep], gg_idx[keep], iou[keep]
+
+
+def best_partner(n, idx, partner_idx, iou):
+    """
+    Mejor pareja (mayor IoU) de cada elemento
+
+    Returns:
+        tuple: (índice de la pareja o -1, IoU)
+    """
+    best = np.full(n, -1, dtype=np.int64)
+    best_iou = np.zeros(n)
+    if len(idx):
+        # Orden por elemento y IoU descendente: el primer par de cada
+        # elemento es el de mayor IoU (empates: el primero en la consulta)
+        order = np.lexsort((-iou, idx))
+        elements, first = np.unique(idx[order], return_index=True)
+        best[elements] = partner_idx[order[first]]
+        best_iou[elements] = iou[order[first]]
+    return best, best_iou
+
+
+def _status_updates(ids, owned, best, best_iou, partner_ids, unmatched_status):
+    operations = []
+    for i in np.flatnonzero(owned):
+        matched = best[i] >= 0
+        operations.append(UpdateOne(
+            {'_id': ids[i]},
+            {'$set': {
+                'properties.match_status': 'matched' if matched else unmatched_status,
+                'properties.match_iou': round(float(best_iou[i]), 4),
+                'properties.match_id': partner_ids[best[i]] if matched else None
+            }}
+        ))
+    return operations
+
+
+def process_cell(cell, cell_size=CELL_SIZE, iou_threshold=IOU_THRESHOLD, write=True):
+    """
+    Worker: empareja las huellas de una celda y guarda el estado
+
+    Returns:
+        dict: Conteos de la celda (solo edificaciones con centroide propio)
+    """
+    db = get_database()
+    ms_ids, ms_geoms, ms_owned = load_cell(db.microsoft_buildings, cell, cell_size)
+    gg_ids, gg_geoms, gg_owned = load_cell(db.google_buildings, cell, cell_size)
+
+    stats = {'ms_matched': 0, 'ms_only': 0, 'gg_matched': 0, 'gg_only': 0, 'pairs': 0}
+    if not ms_owned.any() and not gg_owned.any():
+        return stats
+
+    ms_idx, gg_idx, iou = match_footprints(ms_geoms, gg_geoms, iou_threshold)
+    ms_best, ms_best_iou = best_partner(len(ms_ids), ms_idx, gg_idx, iou)
+    gg_best, gg_best_iou = best_partner(len(gg_ids), gg_idx, ms_idx, iou)
+
+    ms_matched = ms_best >= 0
+    gg_matched = gg_best >= 0
+    stats['ms_matched'] = int((ms_matched & ms_owned).sum())
+    stats['ms_only'] = int((~ms_matched & ms_owned).sum())
+    stats['gg_matched'] = int((gg_matched & gg_owned).sum())
+    stats['gg_only'] = int((~gg_matched & gg_owned).sum())
+    stats['pairs'] = int(ms_owned[ms_idx].sum()) if len(ms_idx) else 0
+
+    if write:
+        ms_ops = _status_updates(ms_ids, ms_owned, ms_best, ms_best_iou, gg_ids, 'ms_only')
+        gg_ops = _status_updates(gg_ids, gg_owned, gg_best, gg_best_iou, ms_ids, 'google_only')
+        if ms_ops:
+            db.microsoft_buildings.bulk_write(ms_ops, ordered=False)
+        if gg_ops:
+            db.google_buildings.bulk_write(gg_ops, ordered=False)
+
+    return stats
+
+
+def match_datasets(num_workers=None, cell_size=CELL_SIZE, iou_threshold=IOU_THRESHOLD, bbox=COLOMBIA_BBOX):
+    """
+    Empareja Microsoft y Google en todo el país, en paralelo por celdas
+
+    Returns:
+        dict: Totales de coincidencias y exclusivos
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    cells = grid_cells(bbox, cell_size)
+
+    logger.info("=" * 70)
+    logger.info("EMPAREJAMIENTO DE HUELLAS MICROSOFT ↔ GOOGLE")
+    logger.info("=" * 70)
+    logger.info(f"Celdas: {len(cells):,} de {cell_size}° (halo {HALO_DEG}°), IoU >= {iou_threshold}")
+    start = time.perf_counter()
+
+    totals = {'ms_matched': 0, 'ms_only': 0, 'gg_matched': 0, 'gg_only': 0, 'pairs': 0}
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        results = executor.map(
+            process_cell, cells,
+            [cell_size] * len(cells), [iou_threshold] * len(cells),
+            chunksize=4
+        )
+        for stats in tqdm(results, total=len(cells), desc="Celdas"):
+            for key in totals:
+                totals[key] += stats[key]
+
+    ms_total = totals['ms_matched'] + totals['ms_only']
+    gg_total = totals['gg_matched'] + totals['gg_only']
+    logger.info(f"Microsoft emparejadas: {totals['ms_matched']:,} de {ms_total:,}")
+    logger.info(f"Google emparejadas: {totals['gg_matched']:,} de {gg_total:,}")
+    logger.info(f"Inventario fusionado: {ms_total + totals['gg_only']:,} edificaciones")
+    logger.info(f"Tiempo: {time.perf_counter() - start:.1f} s")
+    return totals
+
+
+def status_facet():
+    """Rama de $facet con conteos por match_status"""
+    return [
+        {'$match': {'properties.match_status': {'$in': list(MATCH_STATUSES)}}},
+        {'$group': {'_id': '$properties.match_status', 'count': {'$sum': 1}}}
+    ]
+
+
+def summarize_status(facet_result):
+    """Conteos por estado de emparejamiento"""
+    counts = {status: 0 for status in MATCH_STATUSES}
+    for row in facet_result.get('status', []):
+        counts[row['_id']] = row['count']
+    return counts
+
+
+def aggregate_agreement(db):
+    """
+    Resume el emparejamiento por municipio
+
+    Guarda <dataset>.match_status por dataset y footprint_matching con
+    matched (pares Microsoft), ms_only, google_only, fused_count y
+    agreement = matched / fused_count.
+
+    Returns:
+        int: Municipios con resumen combinado
+    """
+    for dataset in ('microsoft', 'google'):
+        rollup_by_municipality(db, dataset, {'status': status_facet()}, summarize_status, 'match_status')
+
+    updated = 0
+    for doc in db.buildings_by_municipality.find(
+        {}, {'muni_code': 1, 'microsoft.match_status': 1, 'google.match_status': 1}
+    ):
+        ms = (doc.get('microsoft') or {}).get('match_status')
+        gg = (doc.get('google') or {}).get('match_status')
+        if ms is None or gg is None:
+            continue
+
+        matched = ms['matched']
+        fused = matched + ms['ms_only'] + gg['google_only']
+        db.buildings_by_municipality.update_one(
+            {'_id': doc['_id']},
+            {'$set': {
+                'footprint_matching': {
+                    'matched': matched,
+                    'ms_only': ms['ms_only'],
+                    'google_only': gg['google_only'],
+                    'fused_count': fused,
+                    'agreement': round(matched / fused, 4) if fused else 0.0
+                },
+                'updated_at': datetime.utcnow()
+            }}
+        )
+        updated += 1
+
+    logger.info(f"Acuerdo por municipio guardado en {updated} municipios")
+    return updated
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Emparejamiento de huellas Microsoft ↔ Google')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos')
+    parser.add_argument('--cell-size', type=float, default=CELL_SIZE, help='Grados por celda')
+    parser.add_argument('--iou', type=float, default=IOU_THRESHOLD, help='IoU mínimo para coincidencia')
+    parser.add_argument('--skip-rollup', action='store_true', help='No actualizar el resumen municipal')
+    args = parser.parse_args()
+
+    match_datasets(num_workers=args.workers, cell_size=args.cell_size, iou_threshold=args.iou)
+
+    if not args.skip_rollup:
+        aggregate_agreement(get_database())
+
+    logger.info("Siguiente paso: 02_generate_statistics.py incluye el acuerdo a nivel de edificación")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""
+Muestreo de irradiancia por edificación desde un GeoTIFF local
+
+Muestrea un raster de GHI (kWh/m²) o de producción fotovoltaica PVOUT
+(kWh/kWp), por ejemplo los de Global Solar Atlas, en el centroide de
+cada edificación y estima la energía anual:
+
+- GHI:   kWh/año = área útil × GHI × eficiencia de módulo × performance ratio
+- PVOUT: kWh/año = área útil × potencia por m² (kWp/m²) × PVOUT
+
+El raster nunca se carga completo: los puntos de cada lote se ordenan
+por bloque interno del GeoTIFF y se leen con ventanas (windowed reads)
+a través de un caché LRU de bloques, de modo que la lectura es
+secuencial y cada bloque se lee una sola vez mientras está en caché.
+
+Resultados:
+- properties.irradiance y properties.annual_kwh en cada edificación
+- buildings_by_municipality.<dataset>.solar_yield por municipio
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+from pathlib import Path
+from functools import lru_cache
+import logging
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from pymongo import UpdateOne
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.database.partitioning import id_range_query, iter_batches, run_partitioned
+from src.utils.geometry_arrays import points_from_docs, get_transformer, WGS84
+from src.analysis.municipality_rollup import rollup_by_municipality
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Parámetros del modelo de energía
+MODULE_EFFICIENCY = 0.20       # Eficiencia de módulo (GHI -> DC)
+PERFORMANCE_RATIO = 0.80       # Pérdidas del sistema (inversor, temperatura, cableado)
+KWP_PER_M2 = 0.20              # 200 Wp por m² de panel
+FALLBACK_EFFICIENCY = 0.476    # Mismo factor de 01_calculate_solar_area.py
+
+DEFAULT_BATCH_SIZE = 50000
+DEFAULT_CACHE_BLOCKS = 512
+
+AREA_FIELDS = {
+    'microsoft': 'area_m2',
+    'google': 'area_in_meters'
+}
+
+
+class BlockSampler:
+    """Muestreador de un GeoTIFF por bloques con caché LRU"""
+
+    def __init__(self, raster_path, band=1, cache_blocks=DEFAULT_CACHE_BLOCKS):
+        """
+        Args:
+            raster_path (str): Ruta al GeoTIFF
+            band (int): Banda a muestrear
+            cache_blocks (int): Número máximo de bloques en memoria
+        """
+        self.dataset = rasterio.open(raster_path)
+        self.band = band
+        self.block_height, self.block_width = self.dataset.block_shapes[band - 1]
+        self.nodata = self.dataset.nodatavals[band - 1]
+        self.inverse_transform = ~self.dataset.transform
+
+        crs = self.dataset.crs
+        self.transformer = None
+        if crs is not None and crs.to_string() != WGS84:
+            self.transformer = get_transformer(WGS84, crs.to_wkt())
+
+        self.stats = {'blocks_read': 0}
+        self._read_block = lru_cache(maxsize=cache_blocks)(self._read_block_uncached)
+
+    def _read_block_uncached(self, block_row, block_col):
+        """Lee un bloque completo con una ventana (recortada al borde del raster)"""
+        row_off = block_row * self.block_height
+        col_off = block_col * self.block_width
+        window = Window(
+            col_off,
+            row_off,
+            min(self.block_width, self.dataset.width - col_off),
+            min(self.block_height, self.dataset.height - row_off)
+        )
+        data = self.dataset.read(self.band, window=window).astype(np.float64)
+        if self.nodata is not None:
+            data[data == self.nodata] = np.nan
+        self.stats['blocks_read'] += 1
+        return data
+
+    def sample(self, lonlat):
+        """
+        Muestrea el raster en un arreglo de puntos lon/lat
+
+        Args:
+            lonlat (np.ndarray): Coordenadas (n, 2) en WGS84
+
+        Returns:
+            np.ndarray: Valor del píxel por punto (NaN fuera del raster o nodata)
+        """
+        values = np.full(len(lonlat), np.nan)
+        if len(lonlat) == 0:
+            return values
+
+        xs, ys = lonlat[:, 0], lonlat[:, 1]
+        if self.transformer is not None:
+            xs, ys = self.transformer.transform(xs, ys)
+
+        cols, rows = self.inverse_transform * (np.asarray(xs), np.asarray(ys))
+        with np.errstate(invalid='ignore'):
+            cols = np.floor(cols)
+            rows = np.floor(rows)
+
+        inside = (
+            np.isfinite(cols) & np.isfinite(rows)
+            & (cols >= 0) & (cols < self.dataset.width)
+            & (rows >= 0) & (rows < self.dataset.height)
+        )
+        if not inside.any():
+            return values
+
+        idx = np.flatnonzero(inside)
+        rows = rows[inside].astype(np.int64)
+        cols = cols[inside].astype(np.int64)
+        block_rows = rows // self.block_height
+        block_cols = cols // self.block_width
+
+        # Orden por bloque (fila, columna) -> lectura secuencial del archivo
+        order = np.lexsort((block_cols, block_rows))
+        idx, rows, cols = idx[order], rows[order], cols[order]
+        block_rows, block_cols = block_rows[order], block_cols[order]
+
+        block_keys = block_rows * (self.dataset.width // self.block_width + 1) + block_cols
+        starts = np.flatnonzero(np.r_[True, block_keys[1:] != block_keys[:-1]])
+        ends = np.r_[starts[1:], len(block_keys)]
+
+        for start, end in zip(starts, ends):
+            block = self._read_block(int(block_rows[start]), int(block_cols[start]))
+            local_rows = rows[start:end] - block_rows[start] * self.block_height
+            local_cols = cols[start:end] - block_cols[start] * self.block_width
+            values[idx[start:end]] = block[local_rows, local_cols]
+
+        return values
+
+    def close(self):
+        """Cierra el raster"""
+        self.dataset.close()
+
+
+def estimate_annual_kwh(useful_area_m2, raster_values, raster_type='ghi'):
+    """
+    Energía anual estimada a partir del área útil y el valor del raster
+
+    Args:
+        useful_area_m2 (np.ndarray): Área útil por edificación
+        raster_values (np.ndarray): GHI (kWh/m²/año) o PVOUT (kWh/kWp/año)
+        raster_type (str): 'ghi' o 'pvout'
+
+    Returns:
+        np.ndarray: kWh/año por edificación
+    """
+    if raster_type == 'ghi':
+        return useful_area_m2 * raster_values * MODULE_EFFICIENCY * PERFORMANCE_RATIO
+    if raster_type == 'pvout':
+        return useful_area_m2 * KWP_PER_M2 * raster_values
+    raise ValueError(f"Tipo de raster no soportado: {raster_type} (usar 'ghi' o 'pvout')")
+
+
+def useful_area_from_docs(docs, area_field):
+    """Área útil por edificación: useful_area_m2 si existe, si no área × factor"""
+    areas = np.zeros(len(docs))
+    for i, doc in enumerate(docs):
+        props = doc.get('properties', {})
+        useful = props.get('useful_area_m2')
+        if useful is None:
+            useful = (props.get(area_field) or 0) * FALLBACK_EFFICIENCY
+        areas[i] = useful
+    return areas
+
+
+def process_id_range(collection_name, id_range, raster_path, raster_type='ghi',
+                     value_scale=1.0, batch_size=DEFAULT_BATCH_SIZE,
+                     cache_blocks=DEFAULT_CACHE_BLOCKS):
+    """
+    Muestrea el raster y guarda la energía anual para un rango de _id
+
+    Args:
+        collection_name (str): Colección de edificaciones
+        id_range (tuple): Rango (lower, upper) de _id
+        raster_path (str): Ruta al GeoTIFF
+        raster_type (str): 'ghi' o 'pvout'
+        value_scale (float): Factor para llevar el raster a valores anuales (365 si es diario)
+        batch_size (int): Edificaciones por lote
+        cache_blocks (int): Tamaño del caché de bloques
+
+    Returns:
+        dict: Estadísticas del rango
+    """
+    db = get_database()
+    collection = db[collection_name]
+    dataset = collection_name.replace('_buildings', '')
+    area_field = AREA_FIELDS.get(dataset, 'area_m2')
+
+    sampler = BlockSampler(raster_path, cache_blocks=cache_blocks)
+    stats = {'processed': 0, 'sampled': 0, 'annual_kwh': 0.0}
+
+    cursor = collection.find(
+        id_range_query(id_range, {'centroid': {'$exists': True}}),
+        {'centroid': 1, f'properties.{area_field}': 1, 'properties.useful_area_m2': 1}
+    ).sort('_id', 1).batch_size(10000)
+
+    try:
+        for batch in iter_batches(cursor, batch_size):
+            irradiance = sampler.sample(points_from_docs(batch)) * value_scale
+            annual_kwh = estimate_annual_kwh(
+                useful_area_from_docs(batch, area_field), irradiance, raster_type
+            )
+
+            operations = [
+                UpdateOne(
+                    {'_id': doc['_id']},
+                    {'$set': {
+                        'properties.irradiance': round(float(irradiance[i]), 2),
+                        'properties.annual_kwh': round(float(annual_kwh[i]), 1)
+                    }}
+                )
+                for i, doc in enumerate(batch)
+                if np.isfinite(annual_kwh[i])
+            ]
+            if operations:
+                collection.bulk_write(operations, ordered=False)
+
+            stats['processed'] += len(batch)
+            stats['sampled'] += len(operations)
+            stats['annual_kwh'] += float(np.nansum(annual_kwh))
+    finally:
+        stats['blocks_read'] = sampler.stats['blocks_read']
+        sampler.close()
+
+    return stats
+
+
+def summarize_yield(facet_result):
+    """Totales de energía por municipio a partir del $facet"""
+    totals = facet_result.get('totals') or [{}]
+    totals = totals[0]
+    total_kwh = totals.get('total_kwh', 0) or 0
+    return {
+        'annual_kwh': round(total_kwh, 1),
+        'annual_gwh': round(total_kwh / 1_000_000, 4),
+        'buildings_sampled': totals.get('buildings', 0),
+        'mean_irradiance': round(totals.get('mean_irradiance') or 0, 2)
+    }
+
+
+def aggregate_by_municipality(db, dataset):
+    """
+    Guarda totales de energía anual por municipio en buildings_by_municipality
+
+    Args:
+        db: Conexión a MongoDB
+        dataset (str): 'microsoft' o 'google'
+
+    Returns:
+        int: Municipios actualizados
+    """
+    facets = {
+        'totals': [
+            {'$match': {'properties.annual_kwh': {'$exists': True}}},
+            {'$group': {
+                '_id': None,
+                'total_kwh': {'$sum': '$properties.annual_kwh'},
+                'buildings': {'$sum': 1},
+                'mean_irradiance': {'$avg': '$properties.irradiance'}
+            }}
+        ]
+    }
+    return rollup_by_municipality(db, dataset, facets, summarize_yield, 'solar_yield')
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Muestreo de irradiancia por edificación')
+    parser.add_argument('raster', type=str, help='GeoTIFF de GHI o PVOUT')
+    parser.add_argument('--type', choices=['ghi', 'pvout'], default='ghi',
+                        help='Tipo de raster (default: ghi)')
+    parser.add_argument('--daily', action='store_true',
+                        help='El raster está en valores diarios (se multiplica por 365)')
+    parser.add_argument('--dataset', nargs='+', default=['microsoft', 'google'],
+                        help='Datasets a procesar (default: microsoft google)')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Edificaciones por lote')
+    parser.add_argument('--cache-blocks', type=int, default=DEFAULT_CACHE_BLOCKS,
+                        help='Bloques del raster en caché LRU por proceso')
+
+    args = parser.parse_args()
+
+    raster_path = str(Path(args.raster).resolve())
+    value_scale = 365.0 if args.daily else 1.0
+    db = get_database()
+
+    for dataset in args.dataset:
+        collection_name = f'{dataset}_buildings'
+        logger.info("=" * 70)
+        logger.info(f"MUESTREO DE IRRADIANCIA: {collection_name}")
+        logger.info("=" * 70)
+        logger.info(f"Raster: {raster_path} ({args.type})")
+
+        results = run_partitioned(
+            process_id_range,
+            collection_name,
+            num_workers=args.workers,
+            raster_path=raster_path,
+            raster_type=args.type,
+            value_scale=value_scale,
+            batch_size=args.batch_size,
+            cache_blocks=args.cache_blocks
+        )
+
+        sampled = sum(r['sampled'] for r in results)
+        total_kwh = sum(r['annual_kwh'] for r in results)
+        blocks = sum(r['blocks_read'] for r in results)
+        logger.info(f"Edificaciones muestreadas: {sampled:,}")
+        logger.info(f"Bloques leídos: {blocks:,}")
+        logger.info(f"Energía anual estimada: {total_kwh / 1_000_000:.2f} GWh")
+
+        munis = aggregate_by_municipality(db, dataset)
+        logger.info(f"Totales guardados para {munis} municipios")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Agregación por municipio de métricas calculadas por edificación
+
+Las etapas por edificación (descriptores de forma, irradiancia, vecinos,
+etc.) guardan sus resultados en cada documento. Este módulo los resume
+por municipio PDET con el mismo patrón del join espacial: $geoWithin
+sobre el centroide + $facet, y guarda el resultado en
+buildings_by_municipality.<dataset>.<campo>.
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+from pathlib import Path
+from datetime import datetime
+import logging
+
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+logger = logging.getLogger(__name__)
+
+
+def bucket_facet(field, boundaries):
+    """
+    Rama de $facet con histograma de un campo numérico
+
+    Args:
+        field (str): Campo del documento (sin '$')
+        boundaries (list): Límites crecientes del histograma
+
+    Returns:
+        list: Stages para usar dentro de un $facet
+    """
+    return [
+        {'$match': {field: {'$type': 'number'}}},
+        {
+            '$bucket': {
+                'groupBy': f'${field}',
+                'boundaries': boundaries,
+                'default': 'fuera_de_rango',
+                'output': {'count': {'$sum': 1}}
+            }
+        }
+    ]
+
+
+def bucket_counts(buckets, boundaries):
+    """
+    Convierte la salida de $bucket en conteos alineados con los límites
+
+    Args:
+        buckets (list): Salida de $bucket
+        boundaries (list): Límites usados en bucket_facet
+
+    Returns:
+        dict: {'edges': boundaries, 'counts': [...], 'out_of_range': n}
+    """
+    index = {edge: i for i, edge in enumerate(boundaries[:-1])}
+    counts = [0] * (len(boundaries) - 1)
+    out_of_range = 0
+
+    for bucket in buckets:
+        i = index.get(bucket['_id'])
+        if i is None:
+            out_of_range += bucket['count']
+        else:
+            counts[i] += bucket['count']
+
+    return {'edges': boundaries, 'counts': counts, 'out_of_range': out_of_range}
+
+
+def rollup_by_municipality(db, dataset, facets, summarize, target_field, point_field='centroid'):
+    """
+    Ejecuta un $facet por municipio y guarda el resumen en buildings_by_municipality
+
+    Args:
+        db: Conexión a MongoDB
+        dataset (str): 'microsoft' o 'google'
+        facets (dict): Ramas de $facet a calcular sobre las edificaciones del municipio
+        summarize (callable): Convierte el resultado del $facet en el documento a guardar
+        target_field (str): Subcampo de buildings_by_municipality.<dataset> a escribir
+        point_field (str): Campo Point de las edificaciones para $geoWithin
+
+    Returns:
+        int: Municipios actualizados
+    """
+    collection = db[f'{dataset}_buildings']
+    stats_collection = db.buildings_by_municipality
+
+    municipalities = list(db.pdet_municipalities.find({}, {'muni_code': 1, 'muni_name': 1, 'geom': 1}))
+    updated = 0
+
+    for muni in tqdm(municipalities, desc=f"Resumen {target_field} ({dataset})"):
+        geom = muni.get('geom')
+        if not geom:
+            continue
+
+        pipeline = [
+            {'$match': {point_field: {'$geoWithin': {'$geometry': geom}}}},
+            {'$facet': facets}
+        ]
+
+        try:
+            result = list(collection.aggregate(pipeline, allowDiskUse=True))
+        except Exception as e:
+            logger.warning(f"Error en {muni.get('muni_name', 'Unknown')}: {str(e)}")
+            continue
+
+        summary = summarize(result[0] if result else {})
+
+        stats_collection.update_one(
+            {'muni_code': muni.get('muni_code')},
+            {'$set': {f'{dataset}.{target_field}': summary, 'updated_at': datetime.utcnow()}}
+        )
+        updated += 1
+
+    return updated
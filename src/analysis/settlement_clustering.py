@@ -0,0 +1,319 @@
+"""
+Agrupación de edificaciones en asentamientos (planeación de minirredes)
+
+En las regiones PDET rurales la energía solar se planea por asentamiento,
+no por municipio. Un asentamiento es una componente conexa del grafo
+"centroides a menos de RADIUS_M metros" (equivalente a DBSCAN con
+min_samples=1, enlace simple):
+
+1. El país se divide en celdas; cada proceso lee los centroides de su
+   celda más un halo (> radio), los proyecta a EPSG:3116 y obtiene los
+   pares cercanos con STRtree.query(predicate='dwithin')
+2. Componentes conexas locales con propagación de etiquetas en NumPy
+3. Costura de bordes: cada celda reporta la etiqueta de sus puntos de
+   borde y a qué componente local pertenecen sus puntos de halo; un
+   union-find sobre (celda, etiqueta) une las componentes que cruzan celdas
+4. Los agregados por componente (conteo, área, área útil, vértices del
+   casco convexo) se combinan y se guardan en la colección settlements,
+   enlazada a pdet_municipalities por muni_code
+
+Uso:
+    python src/analysis/settlement_clustering.py --dataset microsoft --radius 50
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import os
+import time
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import logging
+
+import numpy as np
+import shapely
+from shapely.geometry import mapping
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.analysis.size_distribution import AREA_FIELDS
+from src.database.partitioning import cell_query, cell_owned, halo_degrees
+from src.analysis.footprint_matching import grid_cells
+from src.utils.geometry_arrays import points_from_docs, get_transformer, WGS84, COLOMBIA_CRS
+
+logger = logging.getLogger(__name__)
+
+SETTLEMENTS_COLLECTION = 'settlements'
+RADIUS_M = 50.0              # Distancia máxima entre vecinos del mismo asentamiento
+MIN_BUILDINGS = 5            # Componentes más pequeñas = viviendas dispersas
+CELL_SIZE = 0.25
+
+
+def connected_components(n, a, b):
+    """
+    Componentes conexas de un grafo con aristas (a[k], b[k])
+
+    Propagación de la etiqueta mínima con np.minimum.at más salto de
+    punteros, hasta punto fijo.
+
+    Returns:
+        np.ndarray: Etiqueta por nodo (índice del menor nodo de su componente)
+    """
+    labels = np.arange(n)
+    if len(a) == 0:
+        return labels
+    while True:
+        new = labels.copy()
+        np.minimum.at(new, a, labels[b])
+        np.minimum.at(new, b, labels[a])
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def cluster_cell(dataset, cell, cell_size=CELL_SIZE, radius_m=RADIUS_M):
+    """
+    Worker: componentes locales de una celda y datos para la costura
+
+    Returns:
+        dict: cell, components {etiqueta: agregados}, border {id: etiqueta},
+        halo [(id, etiqueta)]
+    """
+    cx, cy = cell
+    x0, y0 = cx * cell_size, cy * cell_size
+    halo = halo_degrees(radius_m)
+    result = {'cell': cell, 'components': {}, 'border': {}, 'halo': []}
+
+    area_field = AREA_FIELDS[dataset]
+    docs = list(get_database()[f'{dataset}_buildings'].find(
+        cell_query(cell, cell_size, halo),
+        {'centroid': 1, area_field: 1, 'properties.useful_area_m2': 1}
+    ))
+    if not docs:
+        return result
+
+    lonlat = points_from_docs(docs)
+    owned = cell_owned(lonlat, cell, cell_size)
+    if not owned.any():
+        return result
+
+    # Puntos propios cerca del borde: son el halo de las celdas vecinas
+    near_edge = (
+        (lonlat[:, 0] - x0 < halo) | (x0 + cell_size - lonlat[:, 0] < halo) |
+        (lonlat[:, 1] - y0 < halo) | (y0 + cell_size - lonlat[:, 1] < halo)
+    )
+
+    x, y = get_transformer().transform(lonlat[:, 0], lonlat[:, 1])
+    xy = np.column_stack([x, y])
+    points = shapely.points(xy)
+    a, b = shapely.STRtree(points).query(points, predicate='dwithin', distance=radius_m)
+    labels = connected_components(len(docs), a, b)
+
+    props = [d.get('properties') or {} for d in docs]
+    area_key = area_field.split('.')[-1]
+    area = np.array([p.get(area_key) or 0.0 for p in props], dtype=np.float64)
+    useful = np.array([p.get('useful_area_m2') or 0.0 for p in props], dtype=np.float64)
+    ids = [str(d['_id']) for d in docs]
+
+    owned_idx = np.flatnonzero(owned)
+    owned_labels = labels[owned_idx]
+    for label in np.unique(owned_labels):
+        members = owned_idx[owned_labels == label]
+        hull = shapely.convex_hull(shapely.multipoints(xy[members]))
+        result['components'][int(label)] = {
+            'count': len(members),
+            'area_m2': float(area[members].sum()),
+            'useful_area_m2': float(useful[members].sum()),
+            'hull_xy': shapely.get_coordinates(hull)
+        }
+
+    for i in np.flatnonzero(owned & near_edge):
+        result['border'][ids[i]] = int(labels[i])
+
+    has_owned = set(result['components'])
+    for i in np.flatnonzero(~owned):
+        if int(labels[i]) in has_owned:
+            result['halo'].append((ids[i], int(labels[i])))
+
+    return result
+
+
+class UnionFind:
+    """Union-find sobre claves (celda, etiqueta)"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, key):
+        parent = self.parent.setdefault(key, key)
+        if parent != key:
+            parent = self.parent[key] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def stitch(cell_results):
+    """
+    Une las componentes locales que cruzan bordes de celda
+
+    Returns:
+        dict: raíz -> agregados combinados (count, area_m2, useful_area_m2, hulls)
+    """
+    uf = UnionFind()
+    border = {}
+    for r in cell_results:
+        for point_id, label in r['border'].items():
+            border[point_id] = (r['cell'], label)
+        for label in r['components']:
+            uf.find((r['cell'], label))
+
+    for r in cell_results:
+        for point_id, label in r['halo']:
+            other = border.get(point_id)
+            if other is not None:
+                uf.union((r['cell'], label), other)
+
+    merged = {}
+    for r in cell_results:
+        for label, comp in r['components'].items():
+            root = uf.find((r['cell'], label))
+            target = merged.setdefault(root, {'count': 0, 'area_m2': 0.0, 'useful_area_m2': 0.0, 'hulls': []})
+            target['count'] += comp['count']
+            target['area_m2'] += comp['area_m2']
+            target['useful_area_m2'] += comp['useful_area_m2']
+            target['hulls'].append(comp['hull_xy'])
+
+    return merged
+
+
+def settlement_documents(merged, dataset, radius_m=RADIUS_M, min_buildings=MIN_BUILDINGS):
+    """
+    Documentos de la colección settlements (casco convexo con buffer de radio/2)
+
+    Returns:
+        list: Documentos listos para insert_many
+    """
+    to_wgs84 = get_transformer(COLOMBIA_CRS, WGS84)
+    docs = []
+    for comp in merged.values():
+        if comp['count'] < min_buildings:
+            continue
+        hull_m = shapely.convex_hull(shapely.multipoints(np.vstack(comp['hulls']))).buffer(radius_m / 2)
+        hull = shapely.transform(hull_m, lambda c: np.column_stack(to_wgs84.transform(c[:, 0], c[:, 1])))
+        centroid = shapely.centroid(hull)
+        docs.append({
+            'dataset': dataset,
+            'geometry': mapping(hull),
+            'centroid': {'type': 'Point', 'coordinates': [centroid.x, centroid.y]},
+            'building_count': comp['count'],
+            'roof_area_m2': round(comp['area_m2'], 2),
+            'useful_area_m2': round(comp['useful_area_m2'], 2),
+            'hull_area_m2': round(hull_m.area, 2),
+            'radius_m': radius_m,
+            'muni_code': None,
+            'created_at': datetime.utcnow()
+        })
+    return docs
+
+
+def link_municipalities(db, dataset):
+    """Asigna muni_code a cada asentamiento según su centroide"""
+    settlements = db[SETTLEMENTS_COLLECTION]
+    linked = 0
+    for muni in db.pdet_municipalities.find({}, {'muni_code': 1, 'geom': 1}):
+        if not muni.get('geom'):
+            continue
+        result = settlements.update_many(
+            {'dataset': dataset, 'centroid': {'$geoWithin': {'$geometry': muni['geom']}}},
+            {'$set': {'muni_code': muni.get('muni_code')}}
+        )
+        linked += result.modified_count
+    return linked
+
+
+def build_settlements(dataset='microsoft', radius_m=RADIUS_M, min_buildings=MIN_BUILDINGS,
+                      cell_size=CELL_SIZE, num_workers=None):
+    """
+    Calcula los asentamientos de un dataset y reemplaza sus documentos en settlements
+
+    Returns:
+        dict: Resumen (asentamientos, edificaciones agrupadas, dispersas)
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    cells = grid_cells(cell_size=cell_size)
+
+    logger.info("=" * 70)
+    logger.info(f"ASENTAMIENTOS: {dataset} (radio {radius_m} m, mínimo {min_buildings} edificaciones)")
+    logger.info("=" * 70)
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        results = list(tqdm(
+            executor.map(
+                cluster_cell,
+                [dataset] * len(cells), cells,
+                [cell_size] * len(cells), [radius_m] * len(cells),
+                chunksize=4
+            ),
+            total=len(cells),
+            desc="Celdas"
+        ))
+    results = [r for r in results if r['components']]
+
+    merged = stitch(results)
+    docs = settlement_documents(merged, dataset, radius_m, min_buildings)
+
+    db = get_database()
+    settlements = db[SETTLEMENTS_COLLECTION]
+    settlements.delete_many({'dataset': dataset})
+    if docs:
+        settlements.insert_many(docs, ordered=False)
+    settlements.create_index([('centroid', '2dsphere')])
+    settlements.create_index([('dataset', 1), ('muni_code', 1)])
+    linked = link_municipalities(db, dataset)
+
+    clustered = sum(d['building_count'] for d in docs)
+    total = sum(c['count'] for c in merged.values())
+    summary = {
+        'settlements': len(docs),
+        'buildings_in_settlements': clustered,
+        'scattered_buildings': total - clustered,
+        'linked_to_pdet': linked,
+        'elapsed_seconds': round(time.perf_counter() - start, 1)
+    }
+
+    logger.info(f"Asentamientos: {summary['settlements']:,} ({linked:,} en municipios PDET)")
+    logger.info(f"Edificaciones agrupadas: {clustered:,} | dispersas: {summary['scattered_buildings']:,}")
+    logger.info(f"Tiempo: {summary['elapsed_seconds']} s")
+    return summary
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Asentamientos a partir de centroides de edificaciones')
+    parser.add_argument('--dataset', choices=['microsoft', 'google'], default='microsoft')
+    parser.add_argument('--radius', type=float, default=RADIUS_M, help='Distancia de vecindad en metros')
+    parser.add_argument('--min-buildings', type=int, default=MIN_BUILDINGS,
+                        help='Edificaciones mínimas por asentamiento')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos')
+    args = parser.parse_args()
+
+    build_settlements(args.dataset, args.radius, args.min_buildings, num_workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""
+Histogramas de tamaño de techo por municipio
+
+El join espacial agrupa las edificaciones de cada municipio por rango de
+área en la misma pasada ($bucket dentro del $facet). Con esto los
+escenarios de dimensionamiento (tamaño mínimo de techo) se evalúan desde
+buildings_by_municipality sin volver a recorrer edificaciones.
+
+Estructura guardada en buildings_by_municipality.<dataset>.size_hist:
+
+    {
+        'edges': [0, 10, 20, ...],   # límites inferiores de cada rango (m²)
+        'count': [...],              # edificaciones por rango
+        'area_m2': [...],            # área de techos por rango
+        'useful_area_m2': [...]      # área útil por edificación (si existe)
+    }
+
+Además, para cuantiles de área (p10/p50/p90/p99) se guarda un "sketch"
+de rangos logarítmicos fijos (SKETCH_BINS_PER_DECADE por década): es
+mergeable sumando conteos, así que workers paralelos o corridas
+incrementales se combinan sin volver a leer edificaciones, con error
+relativo acotado por el ancho del rango (~6%). Las clases de tamaño
+(<20, 20-50, 50-100, 100-250, >250 m²) se derivan de size_hist, cuyos
+límites las contienen.
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import bisect
+import math
+
+# Límites de los rangos de tamaño (m²); el último cierra el rango abierto > 1000 m²
+SIZE_BINS_M2 = [0, 10, 20, 30, 50, 75, 100, 150, 250, 500, 1000, 1e12]
+NUM_SIZE_BINS = len(SIZE_BINS_M2) - 1
+
+# Sketch logarítmico para cuantiles: 0.1 m² a 10^6 m², 20 rangos por década
+SKETCH_MIN_M2 = 0.1
+SKETCH_BINS_PER_DECADE = 20
+SKETCH_DECADES = 7
+SKETCH_EDGES = [
+    round(SKETCH_MIN_M2 * 10 ** (k / SKETCH_BINS_PER_DECADE), 6)
+    for k in range(SKETCH_BINS_PER_DECADE * SKETCH_DECADES + 1)
+]
+QUANTILES = (10, 50, 90, 99)
+
+# Clases de tamaño (m²): cada límite es también un límite de SIZE_BINS_M2
+SIZE_CLASSES_M2 = [0, 20, 50, 100, 250, 1e12]
+SIZE_CLASS_LABELS = ['<20', '20-50', '50-100', '100-250', '>250']
+
+# Campo de área de cada dataset
+AREA_FIELDS = {
+    'microsoft': 'properties.area_m2',
+    'google': 'properties.area_in_meters'
+}
+
+
+def size_histogram_facet(area_field):
+    """
+    Rama de $facet que agrupa edificaciones por rango de área
+
+    Args:
+        area_field (str): Campo de área (sin '$')
+
+    Returns:
+        list: Stages de agregación para usar dentro de un $facet
+    """
+    return [
+        {'$match': {area_field: {'$gt': 0}}},
+        {
+            '$bucket': {
+                'groupBy': f'${area_field}',
+                'boundaries': SIZE_BINS_M2,
+                'default': 'fuera_de_rango',
+                'output': {
+                    'count': {'$sum': 1},
+                    'area_m2': {'$sum': f'${area_field}'},
+                    'useful_area_m2': {'$sum': '$properties.useful_area_m2'}
+                }
+            }
+        }
+    ]
+
+
+def size_histogram(buckets):
+    """
+    Convierte la salida de $bucket en arreglos alineados con SIZE_BINS_M2
+
+    Args:
+        buckets (list): Documentos {'_id': límite_inferior, 'count', 'area_m2', ...}
+
+    Returns:
+        dict: edges, count, area_m2 y useful_area_m2 alineados por índice
+    """
+    index = {edge: i for i, edge in enumerate(SIZE_BINS_M2[:-1])}
+    counts = [0] * NUM_SIZE_BINS
+    areas = [0.0] * NUM_SIZE_BINS
+    useful = [0.0] * NUM_SIZE_BINS
+
+    for bucket in buckets:
+        i = index.get(bucket.get('_id'))
+        if i is None:
+            continue
+        counts[i] += bucket.get('count', 0)
+        areas[i] += bucket.get('area_m2', 0) or 0
+        useful[i] += bucket.get('useful_area_m2', 0) or 0
+
+    hist = {
+        'edges': SIZE_BINS_M2[:-1],
+        'count': counts,
+        'area_m2': [round(a, 2) for a in areas]
+    }
+    if any(useful):
+        hist['useful_area_m2'] = [round(a, 2) for a in useful]
+
+    return hist
+
+
+def size_bin_index(min_size_m2):
+    """
+    Índice del rango que empieza en un tamaño mínimo dado
+
+    Raises:
+        ValueError: Si el tamaño no coincide con un límite de SIZE_BINS_M2
+    """
+    try:
+        return SIZE_BINS_M2[:-1].index(min_size_m2)
+    except ValueError:
+        raise ValueError(
+            f"Tamaño mínimo inválido: {min_size_m2} m² "
+            f"(opciones: {', '.join(str(e) for e in SIZE_BINS_M2[:-1])})"
+        ) from None
+
+
+def area_sketch_facet(area_field):
+    """
+    Rama de $facet con conteos por rango logarítmico de área
+
+    Args:
+        area_field (str): Campo de área (sin '$')
+
+    Returns:
+        list: Stages de agregación para usar dentro de un $facet
+    """
+    return [
+        {'$match': {area_field: {'$gt': 0}}},
+        {
+            '$bucket': {
+                'groupBy': f'${area_field}',
+                'boundaries': SKETCH_EDGES,
+                'default': 'fuera_de_rango',
+                'output': {'count': {'$sum': 1}}
+            }
+        }
+    ]
+
+
+def area_sketch(buckets):
+    """
+    Convierte la salida de $bucket en un sketch de conteos
+
+    Returns:
+        dict: {'min_m2', 'bins_per_decade', 'counts', 'out_of_range'}
+    """
+    index = {edge: i for i, edge in enumerate(SKETCH_EDGES[:-1])}
+    counts = [0] * (len(SKETCH_EDGES) - 1)
+    out_of_range = 0
+
+    for bucket in buckets:
+        i = index.get(bucket.get('_id'))
+        if i is None:
+            out_of_range += bucket.get('count', 0)
+        else:
+            counts[i] += bucket.get('count', 0)
+
+    return {
+        'min_m2': SKETCH_MIN_M2,
+        'bins_per_decade': SKETCH_BINS_PER_DECADE,
+        'counts': counts,
+        'out_of_range': out_of_range
+    }
+
+
+def merge_sketches(*sketches):
+    """Suma varios sketches (workers paralelos, corridas incrementales o municipios)"""
+    sketches = [sk for sk in sketches if sk]
+    if not sketches:
+        return None
+    counts = [sum(values) for values in zip(*(sk['counts'] for sk in sketches))]
+    return {
+        'min_m2': SKETCH_MIN_M2,
+        'bins_per_decade': SKETCH_BINS_PER_DECADE,
+        'counts': counts,
+        'out_of_range': sum(sk.get('out_of_range', 0) for sk in sketches)
+    }
+
+
+def sketch_quantiles(sketch, quantiles=QUANTILES):
+    """
+    Cuantiles de área a partir de un sketch
+
+    Dentro de cada rango se interpola en escala logarítmica.
+
+    Returns:
+        dict: {'p10': m², ...} (None si no hay edificaciones)
+    """
+    counts = sketch['counts'] if sketch else []
+    total = sum(counts)
+    if total == 0:
+        return {f'p{q}': None for q in quantiles}
+
+    result = {}
+    cumulative = 0
+    bins = iter(enumerate(counts))
+    i, count = next(bins)
+    for q in sorted(quantiles):
+        target = total * q / 100
+        while cumulative + count < target:
+            cumulative += count
+            i, count = next(bins)
+        fraction = (target - cumulative) / count if count else 0.0
+        log_value = math.log10(SKETCH_MIN_M2) + (i + fraction) / SKETCH_BINS_PER_DECADE
+        result[f'p{q}'] = round(10 ** log_value, 2)
+    return result
+
+
+def size_classes(hist):
+    """
+    Clases de tamaño (<20, 20-50, 50-100, 100-250, >250 m²) desde size_hist
+
+    Returns:
+        dict: {'labels', 'count', 'area_m2'}
+    """
+    counts = [0] * len(SIZE_CLASS_LABELS)
+    areas = [0.0] * len(SIZE_CLASS_LABELS)
+    for edge, count, area in zip(hist['edges'], hist['count'], hist['area_m2']):
+        k = bisect.bisect_right(SIZE_CLASSES_M2, edge) - 1
+        counts[k] += count
+        areas[k] += area
+    return {
+        'labels': SIZE_CLASS_LABELS,
+        'count': counts,
+        'area_m2': [round(a, 2) for a in areas]
+    }
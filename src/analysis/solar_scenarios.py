@@ -0,0 +1,308 @@
+"""
+Motor vectorizado de escenarios de dimensionamiento solar
+
+Carga una sola vez los agregados por municipio de
+buildings_by_municipality en arreglos NumPy y evalúa todas las
+combinaciones de parámetros en un único cálculo con broadcasting:
+
+- eficiencia (fracción del techo utilizable)
+- densidad de potencia (Wp/m²)
+- performance ratio
+- tamaño mínimo de techo (rangos de size_hist del join)
+- confianza mínima Google (histograma acumulado del join)
+
+Cambiar un supuesto ya no requiere volver a ejecutar 01 - 03 contra
+MongoDB: miles de escenarios se evalúan en segundos y se escriben en una
+tabla compacta (outputs/tables/solar_scenarios.csv).
+
+Tamaño mínimo y confianza se combinan suponiendo independencia entre
+ambos dentro de cada municipio (el join guarda histogramas marginales).
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import time
+from pathlib import Path
+import logging
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.analysis.confidence_histogram import THRESHOLDS, threshold_index
+from src.analysis.size_distribution import SIZE_BINS_M2, NUM_SIZE_BINS, size_bin_index
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DATASETS = ['microsoft', 'google']
+
+# Irradiación global horizontal promedio (~4.5 kWh/m²/día en zonas PDET)
+DEFAULT_GHI_KWH_M2 = 4.5 * 365
+
+# Rejilla por defecto: 9 × 4 × 4 × 5 × 4 = 2,880 escenarios para Google
+DEFAULT_EFFICIENCY = [round(e, 3) for e in np.linspace(0.30, 0.70, 9)]
+DEFAULT_WP_PER_M2 = [150, 175, 200, 225]
+DEFAULT_PERFORMANCE_RATIO = [0.70, 0.75, 0.80, 0.85]
+DEFAULT_MIN_ROOF_M2 = [0, 10, 20, 50, 100]
+DEFAULT_MIN_CONFIDENCE = [0.65, 0.70, 0.80, 0.90]
+
+OUTPUT_DIR = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'tables'
+
+
+def _cumulative_ge(values):
+    """Suma acumulada por fila desde la última columna (valor para >= límite)"""
+    return np.cumsum(values[:, ::-1], axis=1)[:, ::-1]
+
+
+def load_aggregates(db):
+    """
+    Lee buildings_by_municipality una vez y lo convierte en arreglos NumPy
+
+    Args:
+        db: Conexión a MongoDB
+
+    Returns:
+        dict: Arreglos por municipio (M filas):
+            - muni_code, pdet_region
+            - <dataset>_count_ge, <dataset>_area_ge_m2: (M, rangos de tamaño)
+              edificaciones / área de techos con tamaño >= límite
+            - <dataset>_area_sampled: área estimada con el promedio muestral del
+              join (sin size_hist)
+            - google_conf_count_share, google_conf_area_share: (M, umbrales)
+              fracción con confianza >= umbral
+    """
+    projection = {'_id': 0, 'muni_code': 1, 'pdet_region': 1}
+    for dataset in DATASETS:
+        for field in ('count', 'total_area_m2', 'size_hist'):
+            projection[f'{dataset}.{field}'] = 1
+    projection['google.confidence_hist'] = 1
+
+    docs = list(db.buildings_by_municipality.find({}, projection).sort('muni_code', 1))
+    m = len(docs)
+
+    agg = {
+        'muni_code': np.array([str(d.get('muni_code')) for d in docs]),
+        'pdet_region': np.array([str(d.get('pdet_region', 'Unknown')) for d in docs])
+    }
+
+    for dataset in DATASETS:
+        counts = np.zeros((m, NUM_SIZE_BINS))
+        areas = np.zeros((m, NUM_SIZE_BINS))
+        sampled = np.zeros(m, dtype=bool)
+
+        for i, doc in enumerate(docs):
+            sub = doc.get(dataset) or {}
+            hist = sub.get('size_hist')
+            if hist:
+                counts[i] = hist['count']
+                areas[i] = hist['area_m2']
+            else:
+                # Sin histograma: todo en el primer rango (no se filtra por tamaño)
+                counts[i, 0] = sub.get('count', 0) or 0
+                areas[i, 0] = sub.get('total_area_m2', 0) or 0
+                if not areas[i, 0] and sub.get('confidence_hist'):
+                    areas[i, 0] = sub['confidence_hist']['area_ge_m2'][0]
+                sampled[i] = True
+
+        if sampled.any():
+            logger.warning(f"{dataset}: {sampled.sum()} municipios sin size_hist (re-ejecutar el join)")
+
+        agg[f'{dataset}_count_ge'] = _cumulative_ge(counts)
+        agg[f'{dataset}_area_ge_m2'] = _cumulative_ge(areas)
+        agg[f'{dataset}_area_sampled'] = sampled
+
+    count_share = np.ones((m, len(THRESHOLDS)))
+    area_share = np.ones((m, len(THRESHOLDS)))
+    for i, doc in enumerate(docs):
+        hist = (doc.get('google') or {}).get('confidence_hist')
+        if not hist:
+            continue
+        count_ge = np.asarray(hist['count_ge'], dtype=float)
+        area_ge = np.asarray(hist['area_ge_m2'], dtype=float)
+        if count_ge[0] > 0:
+            count_share[i] = count_ge / count_ge[0]
+        if area_ge[0] > 0:
+            area_share[i] = area_ge / area_ge[0]
+
+    agg['google_conf_count_share'] = count_share
+    agg['google_conf_area_share'] = area_share
+
+    return agg
+
+
+def save_aggregates(agg, path):
+    """Guarda los agregados en un .npz para evaluar escenarios sin MongoDB"""
+    np.savez_compressed(path, **agg)
+
+
+def read_aggregates(path):
+    """Lee agregados guardados con save_aggregates"""
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+def group_matrix(labels):
+    """
+    Matriz indicadora (grupos × municipios) para sumar por grupo con un producto
+
+    Returns:
+        tuple: (nombres de grupo, matriz G × M)
+    """
+    names, inverse = np.unique(labels, return_inverse=True)
+    matrix = np.zeros((len(names), len(labels)))
+    matrix[inverse, np.arange(len(labels))] = 1.0
+    return names, matrix
+
+
+def evaluate_scenarios(agg, efficiency=None, wp_per_m2=None, performance_ratio=None,
+                       min_roof_m2=None, min_confidence=None,
+                       ghi_kwh_m2=DEFAULT_GHI_KWH_M2, by_region=False, datasets=None):
+    """
+    Evalúa todas las combinaciones de parámetros con broadcasting
+
+    Args:
+        agg (dict): Salida de load_aggregates / read_aggregates
+        efficiency (list): Fracciones de techo utilizable
+        wp_per_m2 (list): Densidades de potencia (Wp/m²)
+        performance_ratio (list): Performance ratios
+        min_roof_m2 (list): Tamaños mínimos de techo (límites de SIZE_BINS_M2)
+        min_confidence (list): Confianzas mínimas Google (múltiplos de 0.01)
+        ghi_kwh_m2 (float): Irradiación anual (kWh/m²/año)
+        by_region (bool): Desagregar por región PDET (si no, total PDET)
+        datasets (list): Datasets a evaluar
+
+    Returns:
+        pd.DataFrame: Una fila por escenario (y región)
+    """
+    eff = np.asarray(efficiency or DEFAULT_EFFICIENCY, dtype=float)
+    wp = np.asarray(wp_per_m2 or DEFAULT_WP_PER_M2, dtype=float)
+    pr = np.asarray(performance_ratio or DEFAULT_PERFORMANCE_RATIO, dtype=float)
+    sizes = list(min_roof_m2 or DEFAULT_MIN_ROOF_M2)
+    size_idx = [size_bin_index(s) for s in sizes]
+
+    if by_region:
+        groups, gmat = group_matrix(agg['pdet_region'])
+    else:
+        groups, gmat = np.array(['TOTAL PDET']), np.ones((1, len(agg['muni_code'])))
+
+    frames = []
+    for dataset in datasets or DATASETS:
+        area_ge = agg[f'{dataset}_area_ge_m2'][:, size_idx]     # (M, S)
+        count_ge = agg[f'{dataset}_count_ge'][:, size_idx]
+
+        if dataset == 'google':
+            conf = list(min_confidence or DEFAULT_MIN_CONFIDENCE)
+            conf_idx = [threshold_index(c) for c in conf]
+            area_share = agg['google_conf_area_share'][:, conf_idx]     # (M, C)
+            count_share = agg['google_conf_count_share'][:, conf_idx]
+        else:
+            conf = [np.nan]
+            area_share = np.ones((len(area_ge), 1))
+            count_share = np.ones((len(area_ge), 1))
+
+        # Suma por grupo: (G, S, C)
+        area = np.einsum('gm,ms,mc->gsc', gmat, area_ge, area_share)
+        count = np.einsum('gm,ms,mc->gsc', gmat, count_ge, count_share)
+
+        # Ejes: eficiencia, Wp/m², PR, grupo, tamaño, confianza
+        e = eff[:, None, None, None, None, None]
+        w = wp[None, :, None, None, None, None]
+        p = pr[None, None, :, None, None, None]
+
+        useful_m2 = e * area[None, None, None]
+        capacity_kw = useful_m2 * w / 1000
+        energy_kwh = capacity_kw * p * ghi_kwh_m2
+
+        shape = (len(eff), len(wp), len(pr), len(groups), len(sizes), len(conf))
+        axes = np.meshgrid(
+            eff, wp, pr, np.arange(len(groups)), np.asarray(sizes, dtype=float),
+            np.asarray(conf, dtype=float), indexing='ij'
+        )
+
+        frame = pd.DataFrame({
+            'dataset': dataset,
+            'pdet_region': groups[axes[3].ravel()],
+            'efficiency': axes[0].ravel(),
+            'wp_per_m2': axes[1].ravel(),
+            'performance_ratio': axes[2].ravel(),
+            'min_roof_m2': axes[4].ravel(),
+            'min_confidence': axes[5].ravel(),
+            'buildings': np.rint(np.broadcast_to(count[None, None, None], shape)).ravel().astype(np.int64),
+            'useful_area_km2': np.broadcast_to(useful_m2, shape).ravel() / 1_000_000,
+            'capacity_mw': np.broadcast_to(capacity_kw, shape).ravel() / 1000,
+            'energy_gwh_yr': energy_kwh.ravel() / 1_000_000
+        })
+        frames.append(frame)
+
+    df = pd.concat(frames, ignore_index=True)
+    if not by_region:
+        df = df.drop(columns='pdet_region')
+    return df
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Escenarios de dimensionamiento solar')
+    parser.add_argument('--efficiency', type=float, nargs='+', default=DEFAULT_EFFICIENCY)
+    parser.add_argument('--wp-per-m2', type=float, nargs='+', default=DEFAULT_WP_PER_M2)
+    parser.add_argument('--performance-ratio', type=float, nargs='+', default=DEFAULT_PERFORMANCE_RATIO)
+    parser.add_argument('--min-roof-m2', type=float, nargs='+', default=DEFAULT_MIN_ROOF_M2,
+                        help=f"Límites de SIZE_BINS_M2: {SIZE_BINS_M2[:-1]}")
+    parser.add_argument('--min-confidence', type=float, nargs='+', default=DEFAULT_MIN_CONFIDENCE)
+    parser.add_argument('--ghi', type=float, default=DEFAULT_GHI_KWH_M2,
+                        help='Irradiación anual en kWh/m² (default: 4.5 × 365)')
+    parser.add_argument('--by-region', action='store_true', help='Desagregar por región PDET')
+    parser.add_argument('--aggregates', type=str, default=None,
+                        help='Archivo .npz de agregados (se crea desde MongoDB si no existe)')
+    parser.add_argument('--output', type=str, default=str(OUTPUT_DIR / 'solar_scenarios.csv'))
+
+    args = parser.parse_args()
+
+    logger.info("=" * 70)
+    logger.info("ESCENARIOS DE DIMENSIONAMIENTO SOLAR")
+    logger.info("=" * 70)
+
+    if args.aggregates and Path(args.aggregates).exists():
+        agg = read_aggregates(args.aggregates)
+        logger.info(f"Agregados leídos de {args.aggregates}")
+    else:
+        agg = load_aggregates(get_database())
+        logger.info(f"Agregados leídos de MongoDB: {len(agg['muni_code'])} municipios")
+        if args.aggregates:
+            save_aggregates(agg, args.aggregates)
+            logger.info(f"Agregados guardados en {args.aggregates}")
+
+    start = time.perf_counter()
+    df = evaluate_scenarios(
+        agg,
+        efficiency=args.efficiency,
+        wp_per_m2=args.wp_per_m2,
+        performance_ratio=args.performance_ratio,
+        min_roof_m2=args.min_roof_m2,
+        min_confidence=args.min_confidence,
+        ghi_kwh_m2=args.ghi,
+        by_region=args.by_region
+    )
+    elapsed = time.perf_counter() - start
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(output_path, index=False, float_format='%.4f')
+
+    logger.info(f"Escenarios evaluados: {len(df):,} filas en {elapsed:.3f} s")
+    logger.info(f"Tabla exportada: {output_path}")
+
+
+if __name__ == '__main__':
+    main()
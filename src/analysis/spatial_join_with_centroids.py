@@ -21,6 +21,11 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.database.connection import get_database
+from src.analysis.confidence_histogram import confidence_histogram_facet, cumulative_histogram
+from src.analysis.size_distribution import (
+    AREA_FIELDS, size_histogram_facet, size_histogram,
+    area_sketch_facet, area_sketch, sketch_quantiles, size_classes
+)
 
 def count_buildings_with_geowithin(db, muni, dataset='microsoft'):
     """
@@ -35,6 +40,36 @@ def count_buildings_with_geowithin(db, muni, dataset='microsoft'):
     if not geom:
         return {'count': 0, 'avg_area': 0}
 
+    facets = {
+        'count': [{'$count': 'total'}],
+        'avg_area': [
+            {'$limit': 1000},
+            {'$match': {'properties.area_m2': {'$gt': 0}}},
+            {'$group': {
+                '_id': None,
+                'avg': {'$avg': '$properties.area_m2'}
+            }}
+        ],
+        # Área útil por edificación (usable_roof_area.py) sumada en la misma pasada
+        'useful_area': [
+            {'$match': {'properties.useful_area_m2': {'$exists': True}}},
+            {'$group': {
+                '_id': None,
+                'total': {'$sum': '$properties.useful_area_m2'},
+                'buildings': {'$sum': 1}
+            }}
+        ],
+        # Edificaciones y área por rango de tamaño (escenarios de tamaño mínimo)
+        'size_hist': size_histogram_facet(AREA_FIELDS[dataset]),
+        # Sketch logarítmico mergeable para cuantiles de área
+        'area_sketch': area_sketch_facet(AREA_FIELDS[dataset])
+    }
+
+    # Google: histograma de confianza en la misma pasada (cualquier umbral
+    # se responde luego desde buildings_by_municipality sin repetir el join)
+    if dataset == 'google':
+        facets['confidence_hist'] = confidence_histogram_facet('$properties.area_in_meters')
+
     try:
         # Query usando $geoWithin - MongoDB hace todo el trabajo
         # Con índice 2dsphere en centroid, esto es MUY rápido
@@ -49,17 +84,7 @@ def count_buildings_with_geowithin(db, muni, dataset='microsoft'):
                 }
             },
             {
-                '$facet': {
-                    'count': [{'$count': 'total'}],
-                    'avg_area': [
-                        {'$limit': 1000},
-                        {'$match': {'properties.area_m2': {'$gt': 0}}},
-                        {'$group': {
-                            '_id': None,
-                            'avg': {'$avg': '$properties.area_m2'}
-                        }}
-                    ]
-                }
+                '$facet': facets
             }
         ]
 
@@ -68,7 +93,15 @@ def count_buildings_with_geowithin(db, muni, dataset='microsoft'):
         if result and len(result) > 0:
             count = result[0]['count'][0]['total'] if result[0]['count'] else 0
             avg_area = result[0]['avg_area'][0]['avg'] if result[0]['avg_area'] else 0
-            return {'count': count, 'avg_area': avg_area}
+            stats = {'count': count, 'avg_area': avg_area}
+            if result[0]['useful_area']:
+                stats['useful_area'] = result[0]['useful_area'][0]['total']
+                stats['useful_area_buildings'] = result[0]['useful_area'][0]['buildings']
+            stats['size_hist'] = size_histogram(result[0]['size_hist'])
+            stats['area_sketch'] = area_sketch(result[0]['area_sketch'])
+            if 'confidence_hist' in result[0]:
+                stats['confidence_hist'] = cumulative_histogram(result[0]['confidence_hist'])
+            return stats
 
     except Exception as e:
         print(f"\nError en $geoWithin: {str(e)}")
@@ -167,6 +200,21 @@ def main():
                 doc['google']['total_area_m2'] = round(gg_stats['avg_area'] * gg_stats['count'], 2)
                 doc['google']['total_area_km2'] = round(doc['google']['total_area_m2'] / 1_000_000, 4)
 
+            # Suma de área útil por edificación (solo si el motor ya corrió)
+            for key, ds_stats in (('microsoft', ms_stats), ('google', gg_stats)):
+                if 'useful_area' in ds_stats:
+                    doc[key]['useful_area_m2'] = round(ds_stats['useful_area'], 2)
+                    doc[key]['useful_area_buildings'] = ds_stats['useful_area_buildings']
+                if 'size_hist' in ds_stats:
+                    doc[key]['size_hist'] = ds_stats['size_hist']
+                    doc[key]['size_classes'] = size_classes(ds_stats['size_hist'])
+                if 'area_sketch' in ds_stats:
+                    doc[key]['area_sketch'] = ds_stats['area_sketch']
+                    doc[key]['area_quantiles'] = sketch_quantiles(ds_stats['area_sketch'])
+
+            if 'confidence_hist' in gg_stats:
+                doc['google']['confidence_hist'] = gg_stats['confidence_hist']
+
             # Insertar en MongoDB
             stats_collection.insert_one(doc)
             results.append(doc)
@@ -0,0 +1,156 @@
+"""
+Propagación de incertidumbre (Monte Carlo) sobre los agregados municipales
+
+Los entregables reportan un único valor de área útil derivado de
+EFFICIENCY_FACTOR y de promedios muestrales del join. Este módulo toma N
+muestras de los supuestos inciertos y las propaga, con operaciones
+vectorizadas de NumPy, sobre los agregados por municipio que ya cargó
+solar_scenarios.load_aggregates:
+
+- eficiencia (triangular alrededor de 0.476)
+- sesgo de detección por dataset (omisiones / falsos positivos)
+- umbral de confianza Google (uniforme entre umbrales del histograma)
+- error del promedio muestral del join (solo municipios sin size_hist)
+
+Las muestras se procesan por bloques y, para N grande, en paralelo con
+un pool de procesos. El resultado son columnas P10/P50/P90 por municipio
+para 02_generate_statistics.py.
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import os
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import logging
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.analysis.confidence_histogram import threshold_index
+
+logger = logging.getLogger(__name__)
+
+# Supuestos inciertos
+EFFICIENCY_TRIANGULAR = (0.35, 0.476, 0.60)             # (mínimo, moda, máximo)
+DETECTION_BIAS_SD = {'microsoft': 0.05, 'google': 0.10}  # desviación del factor (media 1.0)
+CONFIDENCE_RANGE = (0.70, 0.85)                          # umbral Google (uniforme)
+SAMPLE_AREA_CV = 1.0         # Coeficiente de variación del área por edificación
+JOIN_AVG_SAMPLE = 1000       # Edificaciones usadas por el join para el promedio ($limit)
+
+PERCENTILES = (10, 50, 90)
+DEFAULT_CHUNK_SIZE = 10000
+PARALLEL_MIN_SAMPLES = 200000    # Por debajo, un solo proceso es más rápido
+
+DATASET_PREFIX = {'microsoft': 'ms', 'google': 'gg'}
+
+
+def simulate_chunk(agg, dataset, n_samples, seed):
+    """
+    Simula área útil (m²) por municipio para un bloque de muestras
+
+    Args:
+        agg (dict): Agregados de solar_scenarios.load_aggregates
+        dataset (str): 'microsoft' o 'google'
+        n_samples (int): Muestras del bloque
+        seed: Semilla (int o np.random.SeedSequence)
+
+    Returns:
+        np.ndarray: (n_samples, M) en float32
+    """
+    rng = np.random.default_rng(seed)
+    roof_area = agg[f'{dataset}_area_ge_m2'][:, 0]
+    m = len(roof_area)
+
+    efficiency = rng.triangular(*EFFICIENCY_TRIANGULAR, size=(n_samples, 1))
+    bias = np.clip(rng.normal(1.0, DETECTION_BIAS_SD[dataset], size=(n_samples, 1)), 0.0, None)
+    useful = roof_area[None, :] * (efficiency * bias)
+
+    if dataset == 'google':
+        low, high = threshold_index(CONFIDENCE_RANGE[0]), threshold_index(CONFIDENCE_RANGE[1])
+        conf_idx = rng.integers(low, high + 1, size=n_samples)
+        useful *= agg['google_conf_area_share'][:, conf_idx].T
+
+    # Error del promedio muestral: área = promedio de min(n, 1000) techos × n
+    sampled = agg[f'{dataset}_area_sampled']
+    if sampled.any():
+        counts = agg[f'{dataset}_count_ge'][sampled, 0]
+        se = SAMPLE_AREA_CV / np.sqrt(np.clip(np.minimum(counts, JOIN_AVG_SAMPLE), 1, None))
+        noise = np.ones((n_samples, m))
+        noise[:, sampled] = np.clip(rng.normal(1.0, se, size=(n_samples, len(counts))), 0.0, None)
+        useful *= noise
+
+    return useful.astype(np.float32)
+
+
+def _simulate_job(args):
+    """Envoltura para ProcessPoolExecutor.map"""
+    return simulate_chunk(*args)
+
+
+def simulate(agg, dataset, n_samples, num_workers=None, seed=42, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Simula N muestras de área útil por municipio
+
+    Args:
+        agg (dict): Agregados de solar_scenarios.load_aggregates
+        dataset (str): 'microsoft' o 'google'
+        n_samples (int): Número de muestras
+        num_workers (int, optional): Procesos paralelos (default: automático)
+        seed (int): Semilla reproducible
+        chunk_size (int): Muestras por bloque
+
+    Returns:
+        np.ndarray: (n_samples, M) en float32
+    """
+    sizes = [chunk_size] * (n_samples // chunk_size)
+    if n_samples % chunk_size:
+        sizes.append(n_samples % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(agg, dataset, size, s) for size, s in zip(sizes, seeds)]
+
+    if num_workers is None:
+        num_workers = os.cpu_count() if n_samples >= PARALLEL_MIN_SAMPLES else 1
+
+    if num_workers <= 1 or len(jobs) == 1:
+        chunks = [_simulate_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            chunks = list(executor.map(_simulate_job, jobs))
+
+    return np.concatenate(chunks, axis=0)
+
+
+def uncertainty_columns(agg, n_samples, num_workers=None, seed=42):
+    """
+    Percentiles de área útil por municipio (columnas para 02_generate_statistics.py)
+
+    Args:
+        agg (dict): Agregados de solar_scenarios.load_aggregates
+        n_samples (int): Número de muestras Monte Carlo
+        num_workers (int, optional): Procesos paralelos
+        seed (int): Semilla reproducible
+
+    Returns:
+        pd.DataFrame: muni_code + <ms|gg>_useful_area_km2_p10/p50/p90
+    """
+    columns = {'muni_code': agg['muni_code']}
+
+    for dataset, prefix in DATASET_PREFIX.items():
+        samples = simulate(agg, dataset, n_samples, num_workers=num_workers, seed=seed)
+        per_muni = np.percentile(samples, PERCENTILES, axis=0) / 1_000_000
+        for p, values in zip(PERCENTILES, per_muni):
+            columns[f'{prefix}_useful_area_km2_p{p}'] = np.round(values, 4)
+
+        total = np.percentile(samples.sum(axis=1, dtype=np.float64), PERCENTILES) / 1_000_000
+        logger.info(
+            f"Área útil total {dataset} (km²): "
+            + ", ".join(f"P{p}={v:.2f}" for p, v in zip(PERCENTILES, total))
+        )
+
+    return pd.DataFrame(columns)
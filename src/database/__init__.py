@@ -4,10 +4,20 @@ from .connection import (
     get_database,
     test_connection
 )
+from .partitioning import (
+    split_id_ranges,
+    id_range_query,
+    iter_batches,
+    run_partitioned
+)
 
 __all__ = [
     'get_connection_string',
     'create_mongo_client',
     'get_database',
-    'test_connection'
+    'test_connection',
+    'split_id_ranges',
+    'id_range_query',
+    'iter_batches',
+    'run_partitioned'
 ]
@@ -0,0 +1,195 @@
+"""
+Particionamiento de colecciones por rangos de _id
+
+Divide una colección grande (p. ej. 6M+ edificaciones) en rangos
+contiguos de _id para que varios procesos la recorran en paralelo,
+cada uno con su propio cursor ordenado por el índice _id (sin skip).
+
+También define el particionamiento espacial por celdas de grilla que
+usan los workers por celda: consulta $geoWithin de la celda más un halo
+y máscara de las edificaciones cuyo centroide pertenece a la celda.
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+
+import numpy as np
+
+from .connection import get_database
+
+METERS_PER_DEGREE = 111320.0
+
+
+def split_id_ranges(collection, num_parts, sample_size=None):
+    """
+    Calcula límites de _id que dividen la colección en partes similares
+
+    Usa $sample para estimar cuantiles de _id, así no se recorre
+    la colección completa para calcular los límites.
+
+    Args:
+        collection: Colección pymongo
+        num_parts (int): Número de rangos deseados
+        sample_size (int, optional): Tamaño de muestra (default: 100 por parte)
+
+    Returns:
+        list: Tuplas (lower, upper) con lower inclusivo y upper exclusivo;
+              None representa un extremo abierto
+    """
+    if num_parts <= 1:
+        return [(None, None)]
+
+    sample_size = sample_size or num_parts * 100
+    sample = collection.aggregate([
+        {'$sample': {'size': sample_size}},
+        {'$project': {'_id': 1}}
+    ])
+    ids = sorted({doc['_id'] for doc in sample})
+
+    if len(ids) < num_parts:
+        return [(None, None)]
+
+    step = len(ids) / num_parts
+    bounds = [ids[int(i * step)] for i in range(1, num_parts)]
+    bounds = sorted(set(bounds))
+
+    edges = [None] + bounds + [None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def id_range_query(id_range, base_query=None):
+    """
+    Construye el filtro de MongoDB para un rango de _id
+
+    Args:
+        id_range (tuple): (lower, upper) de split_id_ranges
+        base_query (dict, optional): Filtro adicional a combinar
+
+    Returns:
+        dict: Filtro para find()/aggregate()
+    """
+    lower, upper = id_range
+    query = dict(base_query or {})
+
+    id_filter = {}
+    if lower is not None:
+        id_filter['$gte'] = lower
+    if upper is not None:
+        id_filter['$lt'] = upper
+    if id_filter:
+        query['_id'] = id_filter
+
+    return query
+
+
+def iter_batches(cursor, batch_size):
+    """
+    Agrupa un cursor en listas de tamaño batch_size
+
+    Args:
+        cursor: Cursor pymongo (o cualquier iterable)
+        batch_size (int): Documentos por lote
+
+    Yields:
+        list: Lote de documentos
+    """
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_partitioned(worker, collection_name, num_workers=None, **kwargs):
+    """
+    Ejecuta worker(collection_name, id_range, **kwargs) en paralelo
+
+    Cada proceso abre su propia conexión a MongoDB dentro del worker.
+    El worker debe ser una función de nivel de módulo (picklable).
+
+    Args:
+        worker (callable): Función a ejecutar por rango
+        collection_name (str): Colección a particionar
+        num_workers (int, optional): Procesos (default: núcleos disponibles)
+        **kwargs: Parámetros adicionales para el worker
+
+    Returns:
+        list: Resultados de cada rango, en orden de finalización
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+
+    db = get_database()
+    # Más rangos que procesos para balancear carga entre workers
+    ranges = split_id_ranges(db[collection_name], num_workers * 4)
+
+    if num_workers == 1:
+        return [worker(collection_name, id_range, **kwargs) for id_range in ranges]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [
+            executor.submit(worker, collection_name, id_range, **kwargs)
+            for id_range in ranges
+        ]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    return results
+
+
+def bbox_polygon(bbox):
+    """Polígono GeoJSON de un bbox (para $geoWithin con índice 2dsphere)"""
+    minx, miny, maxx, maxy = bbox
+    return {
+        'type': 'Polygon',
+        'coordinates': [[[minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]]]
+    }
+
+
+def halo_degrees(radius_m):
+    """Halo en grados que cubre el radio con margen (cos(lat) >= 0.97 en Colombia)"""
+    return 2 * radius_m / METERS_PER_DEGREE
+
+
+def cell_query(cell, cell_size, halo=0.0, field='centroid'):
+    """
+    Filtro de las edificaciones con centroide en una celda más un halo
+
+    Args:
+        cell (tuple): (cx, cy), índices de la celda
+        cell_size (float): Tamaño de celda en grados
+        halo (float): Margen en grados alrededor de la celda
+        field (str): Campo Point con índice 2dsphere
+
+    Returns:
+        dict: Filtro $geoWithin para find()
+    """
+    cx, cy = cell
+    x0, y0 = cx * cell_size, cy * cell_size
+    bbox = (x0 - halo, y0 - halo, x0 + cell_size + halo, y0 + cell_size + halo)
+    return {field: {'$geoWithin': {'$geometry': bbox_polygon(bbox)}}}
+
+
+def cell_owned(lonlat, cell, cell_size):
+    """
+    Máscara de los puntos cuya celda es exactamente (cx, cy)
+
+    Cada edificación pertenece a una sola celda aunque aparezca en el halo
+    de sus vecinas. Puntos con NaN quedan fuera.
+
+    Args:
+        lonlat (np.ndarray): Coordenadas (n, 2)
+        cell (tuple): (cx, cy)
+        cell_size (float): Tamaño de celda en grados
+
+    Returns:
+        np.ndarray: Máscara booleana
+    """
+    cx, cy = cell
+    return (np.floor(lonlat[:, 0] / cell_size) == cx) & (np.floor(lonlat[:, 1] / cell_size) == cy)
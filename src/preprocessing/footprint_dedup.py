@@ -0,0 +1,294 @@
+"""
+Detección de huellas duplicadas exactas y casi duplicadas
+
+Recargas, teselas de origen solapadas y las distintas rutas de
+importación (load_*, import_microsoft_buildings.py) pueden dejar la
+misma huella dos veces. Etapas:
+
+1. Hash canónico por edificación (paralelo por rangos de _id): la
+   geometría se cuantiza a GRID_SIZE grados (set_precision), se normaliza
+   (orden de anillos y vértice inicial) y se hashea su WKB. Se guarda en
+   properties.geom_hash con índice
+2. Duplicados exactos: un $group sobre el hash indexado (un solo recorrido);
+   se reportan o se eliminan dejando el menor _id de cada grupo
+3. Casi duplicados: comparación por celdas con halo (mismo esquema que
+   footprint_matching.py), pares del mismo dataset con IoU >= NEAR_IOU
+
+Reportes en results/validation/.
+
+Uso:
+    python src/preprocessing/footprint_dedup.py --collection microsoft_buildings --hash --report
+    python src/preprocessing/footprint_dedup.py --collection microsoft_buildings --remove
+    python src/preprocessing/footprint_dedup.py --collection google_buildings --near
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import os
+import csv
+import json
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import logging
+
+import numpy as np
+import shapely
+from pymongo import UpdateOne, DeleteMany
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.database.partitioning import id_range_query, iter_batches, run_partitioned
+from src.analysis.footprint_matching import grid_cells, load_cell, match_footprints, CELL_SIZE
+from src.utils.geometry_arrays import polygons_from_docs
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = PROJECT_ROOT / 'results' / 'validation'
+HASH_FIELD = 'properties.geom_hash'
+GRID_SIZE = 1e-7           # Grados (~1 cm): diferencias de redondeo no cambian el hash
+NEAR_IOU = 0.9
+DEFAULT_BATCH_SIZE = 5000
+
+
+def geometry_hashes(geoms, grid_size=GRID_SIZE):
+    """
+    Hash canónico de un arreglo de geometrías
+
+    set_precision y normalize son vectorizados; solo el hash del WKB
+    se calcula por elemento. La cuantización es punto a punto
+    (mode='pointwise'): el modo por defecto reconstruye la topología y
+    lanza TopologyException con huellas auto-intersectadas.
+
+    Returns:
+        list: Hash hexadecimal (32 caracteres) o None si no hay geometría
+    """
+    canonical = shapely.normalize(shapely.set_precision(geoms, grid_size, mode='pointwise'))
+    wkbs = shapely.to_wkb(canonical, output_dimension=2)
+    return [
+        hashlib.blake2b(wkb, digest_size=16).hexdigest() if wkb is not None else None
+        for wkb in wkbs
+    ]
+
+
+def hash_id_range(collection_name, id_range, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Worker: calcula y guarda properties.geom_hash para un rango de _id
+
+    Returns:
+        dict: processed, hashed
+    """
+    db = get_database()
+    collection = db[collection_name]
+    stats = {'processed': 0, 'hashed': 0}
+
+    cursor = collection.find(
+        id_range_query(id_range),
+        {'geometry': 1}
+    ).sort('_id', 1).batch_size(batch_size)
+
+    for batch in iter_batches(cursor, batch_size):
+        geoms = polygons_from_docs(batch)
+        hashes = geometry_hashes(geoms)
+
+        operations = [
+            UpdateOne({'_id': doc['_id']}, {'$set': {HASH_FIELD: geom_hash}})
+            for doc, geom_hash in zip(batch, hashes)
+        ]
+        collection.bulk_write(operations, ordered=False)
+
+        stats['processed'] += len(batch)
+        stats['hashed'] += sum(h is not None for h in hashes)
+
+    return stats
+
+
+def compute_hashes(collection_name, num_workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Calcula el hash de toda la colección en paralelo y crea el índice"""
+    logger.info(f"Hash de geometrías: {collection_name} (precisión {GRID_SIZE}°)")
+    results = run_partitioned(hash_id_range, collection_name, num_workers=num_workers, batch_size=batch_size)
+
+    db = get_database()
+    db[collection_name].create_index(HASH_FIELD)
+
+    totals = {key: sum(r[key] for r in results) for key in ('processed', 'hashed')}
+    logger.info(f"Procesadas: {totals['processed']:,} | con hash: {totals['hashed']:,}")
+    return totals
+
+
+def exact_duplicate_groups(collection):
+    """
+    Grupos de _id con el mismo hash (un solo $group sobre el índice)
+
+    Returns:
+        list: [{'hash', 'count', 'ids' (ordenados)}]
+    """
+    pipeline = [
+        {'$match': {HASH_FIELD: {'$type': 'string'}}},
+        {'$group': {'_id': f'${HASH_FIELD}', 'count': {'$sum': 1}, 'ids': {'$push': '$_id'}}},
+        {'$match': {'count': {'$gt': 1}}}
+    ]
+    groups = []
+    for row in collection.aggregate(pipeline, allowDiskUse=True):
+        groups.append({'hash': row['_id'], 'count': row['count'], 'ids': sorted(row['ids'])})
+    return groups
+
+
+def report_exact_duplicates(collection_name, remove=False, output_dir=None):
+    """
+    Reporta (y opcionalmente elimina) duplicados exactos
+
+    Se conserva el menor _id de cada grupo.
+
+    Returns:
+        dict: Resumen escrito en duplicates_<colección>.json
+    """
+    db = get_database()
+    collection = db[collection_name]
+    output_dir = Path(output_dir or RESULTS_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    groups = exact_duplicate_groups(collection)
+    extra = [_id for group in groups for _id in group['ids'][1:]]
+
+    summary = {
+        'collection': collection_name,
+        'duplicate_groups': len(groups),
+        'redundant_documents': len(extra),
+        'removed': 0,
+        'grid_size_deg': GRID_SIZE,
+        'timestamp': datetime.now().isoformat()
+    }
+
+    with open(output_dir / f'duplicates_{collection_name}.csv', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['geom_hash', 'kept_id', 'duplicate_id'])
+        for group in groups:
+            for _id in group['ids'][1:]:
+                writer.writerow([group['hash'], str(group['ids'][0]), str(_id)])
+
+    if remove and extra:
+        chunk = 10000
+        for start in tqdm(range(0, len(extra), chunk), desc="Eliminando duplicados"):
+            result = collection.bulk_write(
+                [DeleteMany({'_id': {'$in': extra[start:start + chunk]}})],
+                ordered=False
+            )
+            summary['removed'] += result.deleted_count
+
+    with open(output_dir / f'duplicates_{collection_name}.json', 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    logger.info(f"Grupos duplicados: {len(groups):,} | documentos redundantes: {len(extra):,}")
+    if remove:
+        logger.info(f"Eliminados: {summary['removed']:,}")
+    return summary
+
+
+def near_duplicates_in_cell(collection_name, cell, cell_size=CELL_SIZE, iou_threshold=NEAR_IOU):
+    """
+    Worker: pares casi duplicados dentro de una celda (con halo)
+
+    Cada par se reporta una vez: en la celda del centroide del menor índice
+    y solo si los _id son distintos y no tienen el mismo hash (esos ya son
+    duplicados exactos).
+
+    Returns:
+        list: Tuplas (_id_a, _id_b, iou)
+    """
+    db = get_database()
+    ids, geoms, owned = load_cell(db[collection_name], cell, cell_size)
+    if not owned.any():
+        return []
+
+    # Orden por _id: el par (a, b) con a < b tiene un solo dueño
+    order = np.argsort(ids.astype(str))
+    ids, geoms, owned = ids[order], geoms[order], owned[order]
+
+    a, b, iou = match_footprints(geoms, geoms, iou_threshold)
+    keep = (a < b) & owned[a]
+    a, b, iou = a[keep], b[keep], iou[keep]
+    if len(a) == 0:
+        return []
+
+    hashes = geometry_hashes(geoms)
+    return [
+        (str(ids[i]), str(ids[j]), round(float(v), 4))
+        for i, j, v in zip(a, b, iou)
+        if hashes[i] != hashes[j]
+    ]
+
+
+def report_near_duplicates(collection_name, num_workers=None, cell_size=CELL_SIZE,
+                           iou_threshold=NEAR_IOU, output_dir=None):
+    """
+    Busca casi duplicados en todo el país, en paralelo por celdas
+
+    Returns:
+        int: Pares encontrados (escritos en near_duplicates_<colección>.csv)
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    output_dir = Path(output_dir or RESULTS_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cells = grid_cells(cell_size=cell_size)
+
+    logger.info(f"Casi duplicados en {collection_name}: {len(cells):,} celdas, IoU >= {iou_threshold}")
+    pairs = 0
+    with open(output_dir / f'near_duplicates_{collection_name}.csv', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id_a', 'id_b', 'iou'])
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = executor.map(
+                near_duplicates_in_cell,
+                [collection_name] * len(cells), cells,
+                [cell_size] * len(cells), [iou_threshold] * len(cells),
+                chunksize=4
+            )
+            for rows in tqdm(results, total=len(cells), desc="Celdas"):
+                writer.writerows(rows)
+                pairs += len(rows)
+
+    logger.info(f"Pares casi duplicados: {pairs:,}")
+    return pairs
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Duplicados exactos y casi duplicados de huellas')
+    parser.add_argument('--collection', default='microsoft_buildings',
+                        help='Colección (default: microsoft_buildings)')
+    parser.add_argument('--hash', action='store_true', help='Calcular properties.geom_hash')
+    parser.add_argument('--report', action='store_true', help='Reportar duplicados exactos')
+    parser.add_argument('--remove', action='store_true', help='Eliminar duplicados exactos (deja el menor _id)')
+    parser.add_argument('--near', action='store_true', help='Buscar casi duplicados por celdas')
+    parser.add_argument('--iou', type=float, default=NEAR_IOU, help='IoU mínimo para casi duplicados')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos')
+    args = parser.parse_args()
+
+    if not (args.hash or args.report or args.remove or args.near):
+        args.hash = args.report = True
+
+    logger.info("=" * 70)
+    logger.info(f"DEDUPLICACIÓN DE HUELLAS: {args.collection}")
+    logger.info("=" * 70)
+
+    if args.hash:
+        compute_hashes(args.collection, num_workers=args.workers)
+    if args.report or args.remove:
+        report_exact_duplicates(args.collection, remove=args.remove)
+    if args.near:
+        report_near_duplicates(args.collection, num_workers=args.workers, iou_threshold=args.iou)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Densidad de vecinos y proxy de sombreado por edificación
+
+En zonas densas el área útil del techo se reduce por estructuras
+vecinas. Para cada edificación se calcula:
+
+- neighbours_<r>m: número de centroides vecinos a menos de r metros
+  (un valor por radio de NEIGHBOUR_RADII_M)
+- nn_distance_m: distancia al centroide vecino más cercano
+
+Cada celda de la grilla se procesa en un proceso aparte, con un halo
+igual al radio máximo para que los vecinos al otro lado del borde
+cuenten. Los centroides se proyectan a EPSG:3116 y se consulta un
+STRtree en lotes vectorizados: una sola query 'dwithin' al radio máximo
+sirve para todos los radios, y el mínimo de las distancias de esos
+mismos pares da el vecino más cercano (sin vecino dentro del radio
+máximo queda en None).
+
+Los valores se guardan en properties y se resumen por municipio en
+buildings_by_municipality.<dataset>.neighbour_density.
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import os
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import logging
+
+import numpy as np
+import shapely
+from pymongo import UpdateOne
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.database.partitioning import cell_query, cell_owned, halo_degrees
+from src.analysis.footprint_matching import grid_cells
+from src.analysis.municipality_rollup import bucket_facet, bucket_counts, rollup_by_municipality
+from src.utils.geometry_arrays import points_from_docs, get_transformer
+
+logger = logging.getLogger(__name__)
+
+NEIGHBOUR_RADII_M = (25.0, 50.0, 100.0)
+CELL_SIZE = 0.25
+QUERY_BATCH = 200000         # Centroides por llamada al STRtree
+
+# Límites de los histogramas por municipio
+NN_DISTANCE_BINS = [0.0, 5.0, 10.0, 20.0, 50.0, 100.0, 1e9]
+
+
+def neighbour_field(radius_m):
+    """Nombre del campo de conteo para un radio"""
+    return f'neighbours_{int(radius_m)}m'
+
+
+def neighbour_metrics(xy, targets, radii_m=NEIGHBOUR_RADII_M, batch_size=QUERY_BATCH):
+    """
+    Conteo de vecinos por radio y distancia al vecino más cercano
+
+    Args:
+        xy (np.ndarray): Centroides proyectados (n, 2) de la celda + halo
+        targets (np.ndarray): Índices de los centroides a evaluar
+        radii_m (tuple): Radios en metros
+        batch_size (int): Centroides por consulta al STRtree
+
+    Returns:
+        tuple: (conteos (len(targets), len(radii)), distancias al más cercano)
+    """
+    points = shapely.points(xy)
+    tree = shapely.STRtree(points)
+    max_radius = max(radii_m)
+
+    counts = np.zeros((len(targets), len(radii_m)), dtype=np.int64)
+    nearest = np.full(len(targets), np.nan)
+
+    for start in range(0, len(targets), batch_size):
+        chunk = targets[start:start + batch_size]
+
+        src, dst = tree.query(points[chunk], predicate='dwithin', distance=max_radius)
+        other = chunk[src] != dst
+        src, dst = src[other], dst[other]
+        dist = np.hypot(*(xy[chunk[src]] - xy[dst]).T)
+        for k, radius in enumerate(radii_m):
+            counts[start:start + len(chunk), k] = np.bincount(src[dist <= radius], minlength=len(chunk))
+
+        # Vecino más cercano: mínimo de los mismos pares (un centroide
+        # coincidente cuenta a 0 m, igual que en los conteos)
+        chunk_nearest = np.full(len(chunk), np.inf)
+        np.minimum.at(chunk_nearest, src, dist)
+        chunk_nearest[np.isinf(chunk_nearest)] = np.nan
+        nearest[start:start + len(chunk)] = chunk_nearest
+
+    return counts, nearest
+
+
+def process_cell(dataset, cell, cell_size=CELL_SIZE, radii_m=NEIGHBOUR_RADII_M):
+    """
+    Worker: métricas de vecindad de las edificaciones de una celda
+
+    Returns:
+        dict: processed, with_neighbour
+    """
+    db = get_database()
+    collection = db[f'{dataset}_buildings']
+    docs = list(collection.find(cell_query(cell, cell_size, halo_degrees(max(radii_m))), {'centroid': 1}))
+    stats = {'processed': 0, 'with_neighbour': 0}
+    if not docs:
+        return stats
+
+    lonlat = points_from_docs(docs)
+    targets = np.flatnonzero(cell_owned(lonlat, cell, cell_size))
+    if len(targets) == 0:
+        return stats
+
+    x, y = get_transformer().transform(lonlat[:, 0], lonlat[:, 1])
+    counts, nearest = neighbour_metrics(np.column_stack([x, y]), targets, radii_m)
+
+    fields = [f'properties.{neighbour_field(r)}' for r in radii_m]
+    operations = []
+    for k, i in enumerate(targets):
+        update = {field: int(counts[k, j]) for j, field in enumerate(fields)}
+        update['properties.nn_distance_m'] = None if np.isnan(nearest[k]) else round(float(nearest[k]), 2)
+        operations.append(UpdateOne({'_id': docs[i]['_id']}, {'$set': update}))
+    collection.bulk_write(operations, ordered=False)
+
+    stats['processed'] = len(targets)
+    stats['with_neighbour'] = int((~np.isnan(nearest)).sum())
+    return stats
+
+
+def summarize_neighbours(facet_result):
+    """Histograma de distancia al vecino y promedios de conteo por municipio"""
+    means = (facet_result.get('means') or [{}])[0]
+    return {
+        'nn_distance': bucket_counts(facet_result.get('nn_distance', []), NN_DISTANCE_BINS),
+        'mean_neighbours': {
+            neighbour_field(r): round(means.get(neighbour_field(r)) or 0.0, 3)
+            for r in NEIGHBOUR_RADII_M
+        }
+    }
+
+
+def aggregate_by_municipality(db, dataset):
+    """
+    Resume la densidad de vecinos por municipio PDET
+
+    Returns:
+        int: Municipios actualizados
+    """
+    facets = {
+        'nn_distance': bucket_facet('properties.nn_distance_m', NN_DISTANCE_BINS),
+        'means': [
+            {'$group': {
+                '_id': None,
+                **{neighbour_field(r): {'$avg': f'$properties.{neighbour_field(r)}'} for r in NEIGHBOUR_RADII_M}
+            }}
+        ]
+    }
+    return rollup_by_municipality(db, dataset, facets, summarize_neighbours, 'neighbour_density')
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Densidad de vecinos y distancia al vecino más cercano')
+    parser.add_argument(
+        '--dataset',
+        nargs='+',
+        default=['microsoft', 'google'],
+        help='Datasets a procesar (default: microsoft google)'
+    )
+    parser.add_argument('--radii', type=float, nargs='+', default=list(NEIGHBOUR_RADII_M),
+                        help=f'Radios en metros (default: {" ".join(str(r) for r in NEIGHBOUR_RADII_M)})')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos')
+    parser.add_argument('--skip-compute', action='store_true',
+                        help='Solo recalcular resúmenes por municipio')
+
+    args = parser.parse_args()
+    db = get_database()
+    radii = tuple(sorted(args.radii))
+    num_workers = args.workers or os.cpu_count() or 1
+    cells = grid_cells(cell_size=CELL_SIZE)
+
+    for dataset in args.dataset:
+        logger.info("=" * 70)
+        logger.info(f"DENSIDAD DE VECINOS: {dataset}_buildings (radios {radii} m)")
+        logger.info("=" * 70)
+
+        if not args.skip_compute:
+            processed = with_neighbour = 0
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                results = executor.map(
+                    process_cell,
+                    [dataset] * len(cells), cells,
+                    [CELL_SIZE] * len(cells), [radii] * len(cells),
+                    chunksize=4
+                )
+                for stats in tqdm(results, total=len(cells), desc="Celdas"):
+                    processed += stats['processed']
+                    with_neighbour += stats['with_neighbour']
+            logger.info(f"Edificaciones procesadas: {processed:,}")
+            logger.info(f"Con vecino a menos de {max(radii)} m: {with_neighbour:,}")
+
+        if radii == NEIGHBOUR_RADII_M:
+            munis = aggregate_by_municipality(db, dataset)
+            logger.info(f"Resúmenes guardados para {munis} municipios")
+        else:
+            logger.info("Radios no estándar: se omite el resumen municipal")
+
+
+if __name__ == '__main__':
+    main()
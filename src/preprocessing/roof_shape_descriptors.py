@@ -0,0 +1,222 @@
+"""
+Descriptores de orientación y forma de techos por edificación
+
+Calcula, para cada huella, los descriptores que necesita el diseño de
+la disposición de paneles:
+
+- azimuth_deg: orientación del eje largo (0-180°, desde el norte en
+  sentido horario) a partir del rectángulo mínimo rotado
+- elongation: lado largo / lado corto del rectángulo mínimo rotado
+- compactness: índice de Polsby-Popper 4πA/P² (1 = círculo)
+
+El cálculo es vectorizado (shapely 2.0 + NumPy) sobre lotes de
+polígonos, en paralelo por rangos de _id, y se escribe con bulk_write.
+Luego se resume por municipio como distribuciones (histogramas) en
+buildings_by_municipality.<dataset>.shape_distribution.
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+from pathlib import Path
+import logging
+
+import numpy as np
+import shapely
+from pymongo import UpdateOne
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.database.partitioning import id_range_query, iter_batches, run_partitioned
+from src.utils.geometry_arrays import polygons_from_docs, project_geometries, get_transformer
+from src.analysis.municipality_rollup import bucket_facet, bucket_counts, rollup_by_municipality
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Límites de los histogramas por municipio
+AZIMUTH_BINS = [float(a) for a in range(0, 181, 15)]
+ELONGATION_BINS = [1.0, 1.25, 1.5, 2.0, 3.0, 5.0, 1e9]
+COMPACTNESS_BINS = [0.0, 0.3, 0.5, 0.6, 0.7, 0.785, 0.9, 1.0001]
+
+DESCRIPTOR_FIELDS = {
+    'azimuth_deg': AZIMUTH_BINS,
+    'elongation': ELONGATION_BINS,
+    'compactness': COMPACTNESS_BINS
+}
+
+
+def compute_shape_descriptors(geoms_m):
+    """
+    Calcula azimut, elongación y compacidad para un arreglo de polígonos
+
+    Args:
+        geoms_m (np.ndarray): Polígonos en un CRS métrico
+
+    Returns:
+        dict: Arreglos 'azimuth_deg', 'elongation', 'compactness' (NaN si no aplica)
+    """
+    geoms_m = np.asarray(geoms_m, dtype=object)
+    n = len(geoms_m)
+
+    azimuth = np.full(n, np.nan)
+    elongation = np.full(n, np.nan)
+
+    area = np.nan_to_num(shapely.area(geoms_m), nan=0.0)
+    perimeter = np.nan_to_num(shapely.length(geoms_m), nan=0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        compactness = np.where(perimeter > 0, 4 * np.pi * area / perimeter ** 2, np.nan)
+
+    valid = area > 0
+    if valid.any():
+        rects = shapely.oriented_envelope(geoms_m[valid])
+        is_rect = shapely.get_num_coordinates(rects) == 5
+        idx = np.flatnonzero(valid)[is_rect]
+
+        if len(idx):
+            corners = shapely.get_coordinates(rects[is_rect]).reshape(-1, 5, 2)
+            edges = np.diff(corners[:, :3, :], axis=1)          # dos lados consecutivos
+            lengths = np.hypot(edges[..., 0], edges[..., 1])
+
+            long_idx = lengths.argmax(axis=1)
+            long_vec = edges[np.arange(len(idx)), long_idx]
+            long_len = lengths.max(axis=1)
+            short_len = lengths.min(axis=1)
+
+            # Ángulo desde el norte (eje y) en sentido horario, eje sin sentido (mod 180)
+            azimuth[idx] = np.degrees(np.arctan2(long_vec[:, 0], long_vec[:, 1])) % 180.0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                elongation[idx] = np.where(short_len > 0, long_len / short_len, np.nan)
+
+    return {
+        'azimuth_deg': azimuth,
+        'elongation': elongation,
+        'compactness': compactness
+    }
+
+
+def process_id_range(collection_name, id_range, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Calcula y guarda los descriptores de forma para un rango de _id
+
+    Args:
+        collection_name (str): Colección de edificaciones
+        id_range (tuple): Rango (lower, upper) de _id
+        batch_size (int): Documentos por lote vectorizado
+
+    Returns:
+        dict: Estadísticas del rango
+    """
+    db = get_database()
+    collection = db[collection_name]
+    transformer = get_transformer()
+
+    stats = {'processed': 0, 'updated': 0}
+
+    cursor = collection.find(
+        id_range_query(id_range),
+        {'geometry': 1}
+    ).sort('_id', 1).batch_size(batch_size)
+
+    for batch in iter_batches(cursor, batch_size):
+        geoms_m = project_geometries(polygons_from_docs(batch), transformer)
+        descriptors = compute_shape_descriptors(geoms_m)
+
+        operations = []
+        for i, doc in enumerate(batch):
+            values = {
+                f'properties.{name}': round(float(column[i]), 4)
+                for name, column in descriptors.items()
+                if np.isfinite(column[i])
+            }
+            if values:
+                operations.append(UpdateOne({'_id': doc['_id']}, {'$set': values}))
+
+        if operations:
+            result = collection.bulk_write(operations, ordered=False)
+            stats['updated'] += result.modified_count
+        stats['processed'] += len(batch)
+
+    return stats
+
+
+def summarize_distribution(facet_result):
+    """Convierte el $facet de descriptores en histogramas por municipio"""
+    return {
+        name: bucket_counts(facet_result.get(name, []), bins)
+        for name, bins in DESCRIPTOR_FIELDS.items()
+    }
+
+
+def aggregate_by_municipality(db, dataset):
+    """
+    Resume los descriptores como distribuciones por municipio PDET
+
+    Args:
+        db: Conexión a MongoDB
+        dataset (str): 'microsoft' o 'google'
+
+    Returns:
+        int: Municipios actualizados
+    """
+    facets = {
+        name: bucket_facet(f'properties.{name}', bins)
+        for name, bins in DESCRIPTOR_FIELDS.items()
+    }
+    return rollup_by_municipality(
+        db, dataset, facets, summarize_distribution, 'shape_distribution'
+    )
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Descriptores de orientación y forma de techos')
+    parser.add_argument(
+        '--dataset',
+        nargs='+',
+        default=['microsoft', 'google'],
+        help='Datasets a procesar (default: microsoft google)'
+    )
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Documentos por lote')
+    parser.add_argument('--skip-compute', action='store_true',
+                        help='Solo recalcular distribuciones por municipio')
+
+    args = parser.parse_args()
+    db = get_database()
+
+    for dataset in args.dataset:
+        collection_name = f'{dataset}_buildings'
+        logger.info("=" * 70)
+        logger.info(f"DESCRIPTORES DE FORMA: {collection_name}")
+        logger.info("=" * 70)
+
+        if not args.skip_compute:
+            results = run_partitioned(
+                process_id_range,
+                collection_name,
+                num_workers=args.workers,
+                batch_size=args.batch_size
+            )
+            processed = sum(r['processed'] for r in results)
+            updated = sum(r['updated'] for r in results)
+            logger.info(f"Edificaciones procesadas: {processed:,}")
+            logger.info(f"Edificaciones actualizadas: {updated:,}")
+
+        munis = aggregate_by_municipality(db, dataset)
+        logger.info(f"Distribuciones guardadas para {munis} municipios")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Motor de área útil de techo por edificación
+
+Reemplaza el factor plano de eficiencia (0.476) aplicado a totales
+municipales por un cálculo geométrico por edificación:
+
+1. Retiro perimetral (setback): buffer negativo del polígono en metros
+2. Ajuste de filas de paneles: rectángulo mínimo rotado del área interior,
+   filas de paneles paralelas al lado largo
+3. Factor de obstrucciones (chimeneas, tanques, antenas)
+4. Corte por tamaño mínimo de instalación
+
+Todo se calcula con operaciones vectorizadas de shapely 2.0 sobre lotes
+de geometrías, en paralelo por rangos de _id. El resultado se guarda en
+properties.useful_area_m2 y el join espacial lo suma por municipio.
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+from pathlib import Path
+from datetime import datetime
+import logging
+
+import numpy as np
+import shapely
+from pymongo import UpdateOne
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.database.partitioning import id_range_query, iter_batches, run_partitioned
+from src.utils.geometry_arrays import polygons_from_docs, project_geometries, get_transformer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Parámetros geométricos (metros)
+SETBACK_M = 0.5              # Retiro perimetral para mantenimiento/seguridad
+PANEL_DEPTH_M = 1.0          # Profundidad de una fila de paneles
+ROW_GAP_M = 0.3              # Pasillo entre filas
+OBSTRUCTION_FACTOR = 0.85    # Obstrucciones (mismo supuesto de METODOLOGIA)
+MIN_USEFUL_AREA_M2 = 10.0    # Instalación mínima viable (~2 kWp)
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def compute_useful_area(geoms_m,
+                        setback_m=SETBACK_M,
+                        panel_depth_m=PANEL_DEPTH_M,
+                        row_gap_m=ROW_GAP_M,
+                        obstruction_factor=OBSTRUCTION_FACTOR,
+                        min_area_m2=MIN_USEFUL_AREA_M2):
+    """
+    Calcula el área útil para paneles de un arreglo de techos proyectados
+
+    Args:
+        geoms_m (np.ndarray): Polígonos en un CRS métrico
+        setback_m (float): Retiro perimetral
+        panel_depth_m (float): Profundidad de fila de paneles
+        row_gap_m (float): Separación entre filas
+        obstruction_factor (float): Fracción libre de obstrucciones
+        min_area_m2 (float): Área útil mínima; por debajo se descarta
+
+    Returns:
+        np.ndarray: Área útil en m² por geometría (0 si no es apta)
+    """
+    geoms_m = np.asarray(geoms_m, dtype=object)
+    useful = np.zeros(len(geoms_m))
+
+    # 1. Retiro perimetral (buffer negativo, esquinas rectas)
+    inner = shapely.buffer(geoms_m, -setback_m, join_style='mitre')
+    inner_area = shapely.area(inner)
+    inner_area = np.nan_to_num(inner_area, nan=0.0)
+
+    candidates = inner_area > 0
+    if not candidates.any():
+        return useful
+
+    # 2. Rectángulo mínimo rotado: lados largo y corto de cada techo
+    rects = shapely.oriented_envelope(inner[candidates])
+    is_rect = shapely.get_num_coordinates(rects) == 5
+    sides = np.zeros((len(rects), 2))
+    if is_rect.any():
+        corners = shapely.get_coordinates(rects[is_rect]).reshape(-1, 5, 2)
+        edges = np.diff(corners[:, :3, :], axis=1)
+        sides[is_rect] = np.hypot(edges[..., 0], edges[..., 1])
+
+    short_side = sides.min(axis=1)
+
+    # Filas completas de paneles que caben a lo ancho del lado corto
+    pitch = panel_depth_m + row_gap_m
+    n_rows = np.floor((short_side + row_gap_m) / pitch)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        row_fill = np.where(short_side > 0, n_rows * panel_depth_m / short_side, 0.0)
+    row_fill = np.clip(row_fill, 0.0, 1.0)
+
+    # 3. Área útil = área interior × cobertura de filas × obstrucciones
+    area = inner_area[candidates] * row_fill * obstruction_factor
+
+    # 4. Corte por tamaño mínimo
+    area[area < min_area_m2] = 0.0
+    useful[candidates] = area
+
+    return useful
+
+
+def process_id_range(collection_name, id_range, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Calcula y guarda properties.useful_area_m2 para un rango de _id
+
+    Se ejecuta dentro de un proceso worker: abre su propia conexión,
+    recorre el rango con un cursor ordenado y escribe con bulk_write.
+
+    Args:
+        collection_name (str): Colección de edificaciones
+        id_range (tuple): Rango (lower, upper) de _id
+        batch_size (int): Documentos por lote vectorizado
+
+    Returns:
+        dict: Estadísticas del rango
+    """
+    db = get_database()
+    collection = db[collection_name]
+    transformer = get_transformer()
+
+    stats = {'processed': 0, 'updated': 0, 'useful_area_m2': 0.0, 'viable': 0}
+
+    cursor = collection.find(
+        id_range_query(id_range),
+        {'geometry': 1}
+    ).sort('_id', 1).batch_size(batch_size)
+
+    for batch in iter_batches(cursor, batch_size):
+        geoms = polygons_from_docs(batch)
+        geoms_m = project_geometries(geoms, transformer)
+        useful = compute_useful_area(geoms_m)
+        updated_at = datetime.utcnow()
+
+        operations = [
+            UpdateOne(
+                {'_id': doc['_id']},
+                {'$set': {'properties.useful_area_m2': round(float(area), 2), 'updated_at': updated_at}}
+            )
+            for doc, area in zip(batch, useful)
+        ]
+        result = collection.bulk_write(operations, ordered=False)
+
+        stats['processed'] += len(batch)
+        stats['updated'] += result.modified_count
+        stats['useful_area_m2'] += float(useful.sum())
+        stats['viable'] += int((useful > 0).sum())
+
+    return stats
+
+
+def calculate_useful_area(collection_name, num_workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Ejecuta el motor de área útil sobre una colección completa
+
+    Args:
+        collection_name (str): 'microsoft_buildings' o 'google_buildings'
+        num_workers (int, optional): Procesos paralelos
+        batch_size (int): Documentos por lote vectorizado
+
+    Returns:
+        dict: Estadísticas agregadas
+    """
+    logger.info("=" * 70)
+    logger.info(f"ÁREA ÚTIL POR EDIFICACIÓN: {collection_name}")
+    logger.info("=" * 70)
+    logger.info(f"Retiro perimetral: {SETBACK_M} m")
+    logger.info(f"Filas de paneles: {PANEL_DEPTH_M} m + pasillo {ROW_GAP_M} m")
+    logger.info(f"Factor de obstrucciones: {OBSTRUCTION_FACTOR}")
+    logger.info(f"Área útil mínima: {MIN_USEFUL_AREA_M2} m²")
+
+    results = run_partitioned(
+        process_id_range,
+        collection_name,
+        num_workers=num_workers,
+        batch_size=batch_size
+    )
+
+    totals = {
+        key: sum(r[key] for r in results)
+        for key in ('processed', 'updated', 'useful_area_m2', 'viable')
+    }
+
+    # Marca de actualización consultada por density_grid.py para invalidar su caché
+    get_database()[collection_name].create_index('updated_at')
+
+    logger.info("")
+    logger.info(f"Edificaciones procesadas: {totals['processed']:,}")
+    logger.info(f"Edificaciones con techo viable: {totals['viable']:,}")
+    logger.info(f"Área útil total: {totals['useful_area_m2'] / 1_000_000:.2f} km²")
+    logger.info("=" * 70)
+
+    return totals
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Área útil de techo por edificación')
+    parser.add_argument(
+        '--collection',
+        nargs='+',
+        default=['microsoft_buildings', 'google_buildings'],
+        help='Colecciones a procesar (default: microsoft_buildings google_buildings)'
+    )
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Documentos por lote')
+
+    args = parser.parse_args()
+
+    for collection_name in args.collection:
+        calculate_useful_area(collection_name, num_workers=args.workers, batch_size=args.batch_size)
+
+    logger.info("Siguiente paso: ejecutar el join espacial para sumar useful_area_m2 por municipio")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Motor de exportación paralela de colecciones MongoDB
+
+Divide la colección en rangos de _id (src/database/partitioning.py) y
+cada proceso recorre su rango con un cursor ordenado por _id (sin skip),
+escribiendo directamente a un archivo comprimido:
+
+- ndjson: un documento Extended JSON (relaxed) por línea; _id y fechas
+  conservan su tipo al reimportar
+- bson: documentos BSON concatenados (formato de mongodump), sin
+  decodificar: se copian los bytes crudos (RawBSONDocument)
+
+Compresión: gzip (default, biblioteca estándar), zstd (paquete opcional
+zstandard, más rápido y compacto) o ninguna.
+
+Al final escribe manifest.json con el conteo y el SHA-256 de cada
+archivo, más la definición de índices para restaurarlos al importar.
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import gzip
+import json
+import hashlib
+import time
+from pathlib import Path
+from datetime import datetime
+import logging
+
+from bson import json_util
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.database.partitioning import id_range_query, run_partitioned
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+FORMATS = ('ndjson', 'bson')
+COMPRESSIONS = {'zstd': '.zst', 'gzip': '.gz', 'none': ''}
+ZSTD_LEVEL = 3
+
+
+class HashingWriter:
+    """Archivo de salida que calcula SHA-256 y tamaño de lo escrito"""
+
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def open_compressed_writer(raw, compression):
+    """Envuelve un archivo binario con el compresor pedido"""
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Compresión zstd requiere el paquete 'zstandard' (o usar --compression gzip)")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6)
+    return raw
+
+
+def open_compressed_reader(path):
+    """Abre un archivo de exportación para lectura según su extensión"""
+    path = Path(path)
+    if path.suffix == '.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Archivos .zst requieren el paquete 'zstandard'")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def part_filename(collection_name, id_range, fmt, compression):
+    """Nombre de archivo de un rango (límite inferior del _id)"""
+    lower = id_range[0]
+    label = str(lower) if lower is not None else 'inicio'
+    return f'{collection_name}_{label}.{fmt}{COMPRESSIONS[compression]}'
+
+
+def export_range(collection_name, id_range, output_dir, fmt='ndjson', compression='gzip'):
+    """
+    Worker: exporta un rango de _id a un archivo comprimido
+
+    Args:
+        collection_name (str): Colección a exportar
+        id_range (tuple): Rango (lower, upper) de _id
+        output_dir (str): Directorio de salida
+        fmt (str): 'ndjson' o 'bson'
+        compression (str): 'gzip', 'zstd' o 'none'
+
+    Returns:
+        dict: Entrada del manifiesto para el archivo
+    """
+    db = get_database()
+    collection = db[collection_name]
+    if fmt == 'bson':
+        collection = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+
+    filename = part_filename(collection_name, id_range, fmt, compression)
+    raw = HashingWriter(Path(output_dir) / filename)
+    writer = open_compressed_writer(raw, compression)
+
+    cursor = collection.find(id_range_query(id_range)).sort('_id', 1).batch_size(10000)
+    count = 0
+    try:
+        for doc in cursor:
+            if fmt == 'bson':
+                writer.write(doc.raw)
+            else:
+                writer.write(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS).encode('utf-8'))
+                writer.write(b'\n')
+            count += 1
+    finally:
+        if writer is not raw:
+            writer.close()
+        raw.close()
+
+    return {
+        'file': filename,
+        'count': count,
+        'bytes': raw.bytes,
+        'sha256': raw.sha256.hexdigest(),
+        'lower': str(id_range[0]) if id_range[0] is not None else None,
+        'upper': str(id_range[1]) if id_range[1] is not None else None
+    }
+
+
+def index_definitions(collection):
+    """Definición de índices (excepto _id) para recrearlos al importar"""
+    indexes = []
+    for name, info in collection.index_information().items():
+        if name == '_id_':
+            continue
+        options = {k: v for k, v in info.items() if k not in ('key', 'v', 'ns')}
+        indexes.append({'name': name, 'key': [list(k) for k in info['key']], 'options': options})
+    return indexes
+
+
+def export_collection(collection_name, output_dir, fmt='ndjson', compression='gzip', num_workers=None):
+    """
+    Exporta una colección completa en paralelo por rangos de _id
+
+    Args:
+        collection_name (str): Colección a exportar
+        output_dir (Path): Directorio de salida
+        fmt (str): 'ndjson' o 'bson'
+        compression (str): 'gzip', 'zstd' o 'none'
+        num_workers (int, optional): Procesos paralelos
+
+    Returns:
+        dict: Manifiesto escrito en output_dir/manifest.json
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt} (usar {', '.join(FORMATS)})")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compresión no soportada: {compression} (usar {', '.join(COMPRESSIONS)})")
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    db = get_database()
+    collection = db[collection_name]
+    expected = collection.estimated_document_count()
+
+    logger.info(f"Exportando {collection_name}: ~{expected:,} documentos ({fmt}, {compression})")
+    start = time.perf_counter()
+
+    parts = run_partitioned(
+        export_range,
+        collection_name,
+        num_workers=num_workers,
+        output_dir=str(output_dir),
+        fmt=fmt,
+        compression=compression
+    )
+    parts.sort(key=lambda p: (p['lower'] is not None, p['lower'] or ''))
+
+    manifest = {
+        'collection': collection_name,
+        'database': db.name,
+        'format': fmt,
+        'compression': compression,
+        'total_documents': sum(p['count'] for p in parts),
+        'total_bytes': sum(p['bytes'] for p in parts),
+        'parts': parts,
+        'indexes': index_definitions(collection),
+        'exported_at': datetime.now().isoformat(),
+        'elapsed_seconds': round(time.perf_counter() - start, 1)
+    }
+
+    with open(output_dir / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    logger.info(
+        f"Exportados {manifest['total_documents']:,} documentos en {len(parts)} archivos "
+        f"({manifest['total_bytes'] / (1024 ** 2):.1f} MB, {manifest['elapsed_seconds']} s)"
+    )
+    return manifest
@@ -0,0 +1,249 @@
+"""
+Importación paralela de colecciones desde archivos de exportación
+
+Restaura lo que escribe src/utils/collection_export.py (NDJSON o BSON,
+comprimido con zstd/gzip) y también los lotes JSON anteriores
+(microsoft_buildings_batch_*.json):
+
+1. Un pool de procesos verifica el SHA-256 de cada archivo contra el
+   manifiesto, lo decodifica en streaming a documentos BSON ya codificados
+   (bytes) e inserta cada lote de RawBSONDocument con
+   insert_many(ordered=False) desde el mismo proceso: cada worker tiene a
+   lo sumo un lote en memoria y al proceso principal solo vuelven conteos
+2. Los índices del manifiesto se crean al final, con la colección ya cargada
+3. Se verifica el conteo por archivo y el total contra el manifiesto
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import io
+import os
+import json
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import logging
+
+import bson
+from bson import json_util, ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import BulkWriteError
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.utils.collection_export import MANIFEST_NAME, open_compressed_reader
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+HASH_CHUNK = 1 << 20
+
+
+def file_sha256(path):
+    """SHA-256 de un archivo leído por bloques"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def iter_raw_documents(path, fmt):
+    """
+    Documentos de un archivo de exportación como bytes BSON
+
+    Args:
+        path (Path): Archivo .ndjson/.bson (opcionalmente .zst/.gz) o lote .json
+        fmt (str): 'ndjson', 'bson' o 'json' (lotes anteriores)
+
+    Yields:
+        bytes: Documento BSON codificado
+    """
+    if fmt == 'json':
+        # Lotes anteriores: lista JSON con _id y created_at como texto
+        with open(path, 'r', encoding='utf-8') as f:
+            for doc in json.load(f):
+                if isinstance(doc.get('_id'), str):
+                    doc['_id'] = ObjectId(doc['_id'])
+                if isinstance(doc.get('created_at'), str):
+                    doc['created_at'] = datetime.fromisoformat(doc['created_at'])
+                yield bson.encode(doc)
+        return
+
+    # BufferedReader: read(n) completo y lectura por líneas también sobre zstd
+    with io.BufferedReader(open_compressed_reader(path)) as f:
+        if fmt == 'bson':
+            # Documentos concatenados: int32 little-endian con el tamaño total
+            while True:
+                header = f.read(4)
+                if not header:
+                    break
+                size = int.from_bytes(header, 'little')
+                yield header + f.read(size - 4)
+        else:
+            for line in f:
+                if line.strip():
+                    yield bson.encode(json_util.loads(line))
+
+
+def _insert_batch(collection, batch):
+    """Inserta un lote de bytes BSON; devuelve (insertados, errores)"""
+    docs = [RawBSONDocument(raw) for raw in batch]
+    try:
+        return len(collection.insert_many(docs, ordered=False).inserted_ids), 0
+    except BulkWriteError as e:
+        return e.details.get('nInserted', 0), len(e.details.get('writeErrors', []))
+
+
+def import_part(collection_name, path, fmt, batch_size=DEFAULT_BATCH_SIZE, expected_sha256=None):
+    """
+    Worker: verifica un archivo y lo inserta por lotes en la colección
+
+    Returns:
+        dict: file, count, inserted, write_errors, checksum_ok
+    """
+    result = {'file': Path(path).name, 'count': 0, 'inserted': 0, 'write_errors': 0, 'checksum_ok': None}
+    if expected_sha256:
+        result['checksum_ok'] = file_sha256(path) == expected_sha256
+        if not result['checksum_ok']:
+            return result
+
+    collection = get_database()[collection_name]
+    batch = []
+    for raw in iter_raw_documents(path, fmt):
+        batch.append(raw)
+        result['count'] += 1
+        if len(batch) >= batch_size:
+            inserted, errors = _insert_batch(collection, batch)
+            result['inserted'] += inserted
+            result['write_errors'] += errors
+            batch = []
+    if batch:
+        inserted, errors = _insert_batch(collection, batch)
+        result['inserted'] += inserted
+        result['write_errors'] += errors
+
+    return result
+
+
+def discover_parts(input_dir):
+    """
+    Lista de archivos a importar y manifiesto (si existe)
+
+    Returns:
+        tuple: (manifiesto o None, lista de (ruta, formato, sha256, conteo esperado))
+    """
+    input_dir = Path(input_dir)
+    manifest_path = input_dir / MANIFEST_NAME
+
+    if manifest_path.exists():
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        parts = [
+            (input_dir / p['file'], manifest['format'], p['sha256'], p['count'])
+            for p in manifest['parts']
+        ]
+        return manifest, parts
+
+    # Lotes anteriores sin manifiesto
+    parts = [(p, 'json', None, None) for p in sorted(input_dir.glob('*_batch_*.json'))]
+    return None, parts
+
+
+def import_collection(collection_name, input_dir, num_workers=None, batch_size=DEFAULT_BATCH_SIZE, drop=True):
+    """
+    Importa una colección en paralelo desde un directorio de exportación
+
+    Args:
+        collection_name (str): Colección destino
+        input_dir (Path): Directorio con manifest.json y archivos (o lotes JSON)
+        num_workers (int, optional): Procesos de importación (decodifican e insertan)
+        batch_size (int): Documentos por insert_many
+        drop (bool): Eliminar la colección antes de importar
+
+    Returns:
+        dict: Resumen (insertados, errores, verificación contra el manifiesto)
+    """
+    manifest, parts = discover_parts(input_dir)
+    if not parts:
+        raise FileNotFoundError(f"No hay archivos para importar en {input_dir}")
+
+    num_workers = num_workers or os.cpu_count() or 1
+    expected_total = manifest['total_documents'] if manifest else None
+
+    db = get_database()
+    collection = db[collection_name]
+    if drop:
+        logger.info(f"Eliminando colección existente: {collection_name}")
+        collection.drop()
+
+    logger.info(f"Archivos: {len(parts)} | procesos: {num_workers}")
+
+    progress = tqdm(total=expected_total, desc=f"Importando {collection_name}", unit=' docs')
+    file_results = []
+    expected_counts = {path.name: count for path, _, _, count in parts}
+    pending_parts = list(parts)
+
+    # Cada worker inserta sus propios lotes; solo vuelven los conteos por archivo
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        in_flight = set()
+        while pending_parts or in_flight:
+            while pending_parts and len(in_flight) < num_workers * 2:
+                path, fmt, sha256, _ = pending_parts.pop(0)
+                in_flight.add(executor.submit(import_part, collection_name, str(path), fmt, batch_size, sha256))
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                progress.update(result['count'])
+                file_results.append(result)
+    progress.close()
+
+    # Índices al final (la carga sin índices secundarios es mucho más rápida)
+    if manifest:
+        for index in manifest.get('indexes', []):
+            collection.create_index(
+                [tuple(k) for k in index['key']],
+                name=index['name'],
+                **index.get('options', {})
+            )
+            logger.info(f"Índice creado: {index['name']}")
+
+    bad_checksums = [r['file'] for r in file_results if r['checksum_ok'] is False]
+    bad_counts = [
+        r['file'] for r in file_results
+        if expected_counts.get(r['file']) is not None and r['count'] != expected_counts[r['file']]
+    ]
+    final_count = collection.count_documents({})
+
+    summary = {
+        'files': len(file_results),
+        'decoded': sum(r['count'] for r in file_results),
+        'inserted': sum(r['inserted'] for r in file_results),
+        'write_errors': sum(r['write_errors'] for r in file_results),
+        'collection_count': final_count,
+        'expected_total': expected_total,
+        'bad_checksums': bad_checksums,
+        'bad_counts': bad_counts,
+        'verified': (
+            not bad_checksums and not bad_counts
+            and (expected_total is None or final_count == expected_total)
+        )
+    }
+
+    logger.info(f"Insertados: {summary['inserted']:,} | en colección: {final_count:,}")
+    if expected_total is not None:
+        logger.info(f"Esperados según manifiesto: {expected_total:,}")
+    if bad_checksums:
+        logger.error(f"Checksum inválido (no importados): {', '.join(bad_checksums)}")
+    if bad_counts:
+        logger.error(f"Conteo distinto al manifiesto: {', '.join(bad_counts)}")
+    logger.info(f"Verificación: {'OK' if summary['verified'] else 'FALLÓ'}")
+
+    return summary
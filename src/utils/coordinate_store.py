@@ -0,0 +1,391 @@
+"""
+Almacén plano de coordenadas con memoria mapeada (estilo GeoArrow)
+
+Las geometrías como diccionarios GeoJSON en Python ocupan cientos de
+bytes por vértice. Este almacén guarda todas las huellas de un dataset
+en arreglos binarios contiguos que se abren con np.memmap:
+
+    coords.f8           (n_coords, 2) float64 lon/lat
+    ring_offsets.i8     anillo i -> coords[ring_offsets[i]:ring_offsets[i+1]]
+    part_offsets.i8     polígono j -> anillos [part_offsets[j], part_offsets[j+1])
+    geom_offsets.i8     edificación k -> polígonos [geom_offsets[k], geom_offsets[k+1])
+    <atributo>.f8       un valor por edificación (centroid_lon, area_m2, ...)
+    ids.S24             _id como texto hexadecimal
+    store.json          conteos, atributos y origen
+
+Todo polígono se guarda como MultiPolygon de una o más partes. Los
+accesores devuelven vistas sin copia sobre los archivos mapeados; solo
+se lee del disco lo que se toca.
+
+Fuentes: la colección MongoDB (cursor por _id) o un snapshot GeoParquet
+(src/utils/geoparquet_snapshot.py).
+
+Uso:
+    python src/utils/coordinate_store.py --dataset microsoft
+    store = CoordinateStore('data/processed/coordinate_store/microsoft')
+    store.coords(10)                   # vista (m, 2) de la edificación 10
+    geoms = store.to_shapely(0, 100000)
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import json
+from pathlib import Path
+from datetime import datetime
+import logging
+
+import numpy as np
+import shapely
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.analysis.size_distribution import AREA_FIELDS
+from src.utils.geometry_arrays import polygons_from_docs, points_from_docs
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = PROJECT_ROOT / 'data' / 'processed' / 'coordinate_store'
+STORE_META = 'store.json'
+OFFSET_FILES = ('ring_offsets', 'part_offsets', 'geom_offsets')
+ATTRIBUTES = ('centroid_lon', 'centroid_lat', 'area_m2', 'useful_area_m2', 'confidence')
+ID_DTYPE = 'S24'
+DEFAULT_BATCH_SIZE = 50000
+
+
+class StoreWriter:
+    """Escritura incremental del almacén (archivos binarios en modo append)"""
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._files = {
+            'coords': open(self.output_dir / 'coords.f8', 'wb'),
+            'ids': open(self.output_dir / f'ids.{ID_DTYPE}', 'wb'),
+            **{name: open(self.output_dir / f'{name}.i8', 'wb') for name in OFFSET_FILES},
+            **{name: open(self.output_dir / f'{name}.f8', 'wb') for name in ATTRIBUTES}
+        }
+        # Totales acumulados para rebasar los offsets de cada lote
+        self.n_coords = 0
+        self.n_rings = 0
+        self.n_parts = 0
+        self.n_geoms = 0
+        self.n_empty = 0
+        for name in OFFSET_FILES:
+            self._files[name].write(np.zeros(1, dtype=np.int64).tobytes())
+
+    def append(self, geoms, ids, attributes):
+        """
+        Agrega un lote de edificaciones
+
+        Args:
+            geoms (np.ndarray): Geometrías Shapely (Polygon/MultiPolygon/None)
+            ids (list): _id de cada edificación
+            attributes (dict): nombre -> arreglo alineado con geoms (faltantes = NaN)
+        """
+        if len(geoms) == 0:
+            return
+
+        geoms = np.asarray(geoms, dtype=object)
+        if (shapely.is_missing(geoms) | shapely.is_empty(geoms)).all():
+            # Lote sin ninguna geometría: to_ragged_array no infiere el tipo
+            geom_type = shapely.GeometryType.MULTIPOLYGON
+            coords = np.empty((0, 2))
+            offsets = (np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64),
+                       np.zeros(len(geoms) + 1, dtype=np.int64))
+        else:
+            geom_type, coords, offsets = shapely.to_ragged_array(geoms)
+
+        if geom_type == shapely.GeometryType.POLYGON:
+            ring_offsets, part_offsets = offsets
+            geom_offsets = np.arange(len(part_offsets), dtype=np.int64)
+        elif geom_type == shapely.GeometryType.MULTIPOLYGON:
+            ring_offsets, part_offsets, geom_offsets = offsets
+        else:
+            raise ValueError(f"Tipo de geometría no soportado en el almacén: {geom_type!r}")
+
+        # Geometrías faltantes o vacías llegan como polígonos sin anillos:
+        # se quitan esas partes para que la edificación quede con cero
+        # partes (from_ragged_array no admite polígonos sin anillos)
+        keep = np.diff(part_offsets) > 0
+        if not keep.all():
+            part_offsets = np.concatenate([part_offsets[:1], part_offsets[1:][keep]])
+            kept_before = np.concatenate([[0], np.cumsum(keep)])
+            geom_offsets = kept_before[geom_offsets]
+        self.n_empty += int((np.diff(geom_offsets) == 0).sum())
+
+        self._files['coords'].write(np.ascontiguousarray(coords[:, :2], dtype=np.float64).tobytes())
+        self._files['ring_offsets'].write((ring_offsets[1:].astype(np.int64) + self.n_coords).tobytes())
+        self._files['part_offsets'].write((part_offsets[1:].astype(np.int64) + self.n_rings).tobytes())
+        self._files['geom_offsets'].write((geom_offsets[1:].astype(np.int64) + self.n_parts).tobytes())
+        self._files['ids'].write(np.asarray([str(i) for i in ids], dtype=ID_DTYPE).tobytes())
+        for name in ATTRIBUTES:
+            values = attributes.get(name)
+            if values is None:
+                values = np.full(len(geoms), np.nan)
+            self._files[name].write(np.asarray(values, dtype=np.float64).tobytes())
+
+        self.n_coords += len(coords)
+        self.n_rings += len(ring_offsets) - 1
+        self.n_parts += len(part_offsets) - 1
+        self.n_geoms += len(geoms)
+
+    def close(self, source):
+        """Cierra los archivos y escribe store.json"""
+        for f in self._files.values():
+            f.close()
+        meta = {
+            'buildings': self.n_geoms,
+            'polygons': self.n_parts,
+            'rings': self.n_rings,
+            'coordinates': self.n_coords,
+            'empty_geometries': self.n_empty,
+            'attributes': list(ATTRIBUTES),
+            'source': source,
+            'created_at': datetime.now().isoformat()
+        }
+        with open(self.output_dir / STORE_META, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        logger.info(
+            f"Almacén escrito: {self.output_dir} ({self.n_geoms:,} edificaciones, "
+            f"{self.n_coords:,} coordenadas)"
+        )
+        return meta
+
+
+def _nested_values(docs, dotted):
+    values = []
+    for doc in docs:
+        value = doc
+        for key in dotted.split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+        values.append(np.nan if value is None else value)
+    return np.asarray(values, dtype=np.float64)
+
+
+def build_from_collection(dataset, output_dir=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Construye el almacén recorriendo la colección por _id
+
+    Args:
+        dataset (str): 'microsoft' o 'google'
+        output_dir (Path, optional): Directorio del almacén
+        batch_size (int): Documentos por lote
+
+    Returns:
+        dict: Metadatos del almacén
+    """
+    output_dir = Path(output_dir or STORE_DIR / dataset)
+    collection = get_database()[f'{dataset}_buildings']
+    area_field = AREA_FIELDS[dataset]
+    projection = {
+        'geometry': 1,
+        'centroid': 1,
+        area_field: 1,
+        'properties.useful_area_m2': 1,
+        'properties.confidence': 1
+    }
+
+    writer = StoreWriter(output_dir)
+    total = collection.estimated_document_count()
+    last_id = None
+
+    with tqdm(total=total, desc=f"Almacén {dataset}", unit=" docs") as pbar:
+        while True:
+            query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+            docs = list(collection.find(query, projection).sort('_id', 1).limit(batch_size))
+            if not docs:
+                break
+            last_id = docs[-1]['_id']
+
+            lonlat = points_from_docs(docs)
+            writer.append(
+                polygons_from_docs(docs),
+                [d['_id'] for d in docs],
+                {
+                    'centroid_lon': lonlat[:, 0],
+                    'centroid_lat': lonlat[:, 1],
+                    'area_m2': _nested_values(docs, area_field),
+                    'useful_area_m2': _nested_values(docs, 'properties.useful_area_m2'),
+                    'confidence': _nested_values(docs, 'properties.confidence')
+                }
+            )
+            pbar.update(len(docs))
+
+    return writer.close({'type': 'mongodb', 'collection': collection.name})
+
+
+def build_from_snapshot(parquet_path, output_dir, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Construye el almacén desde un snapshot GeoParquet (sin MongoDB)
+
+    Args:
+        parquet_path (Path): Archivo de src/utils/geoparquet_snapshot.py
+        output_dir (Path): Directorio del almacén
+        batch_size (int): Filas por lote
+
+    Returns:
+        dict: Metadatos del almacén
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Leer snapshots GeoParquet requiere el paquete 'pyarrow'")
+
+    parquet = pq.ParquetFile(parquet_path)
+    writer = StoreWriter(output_dir)
+    columns = ['id', 'geometry', *ATTRIBUTES]
+
+    with tqdm(total=parquet.metadata.num_rows, desc="Almacén desde snapshot", unit=" filas") as pbar:
+        for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+            data = batch.to_pydict()
+            writer.append(
+                shapely.from_wkb(np.asarray(data['geometry'], dtype=object)),
+                data['id'],
+                {name: np.asarray(data[name], dtype=np.float64) for name in ATTRIBUTES}
+            )
+            pbar.update(batch.num_rows)
+
+    return writer.close({'type': 'geoparquet', 'path': str(parquet_path)})
+
+
+class CoordinateStore:
+    """
+    Lectura de un almacén con np.memmap (vistas sin copia)
+
+    Los offsets siguen la convención de GeoArrow: el elemento i ocupa
+    [offsets[i], offsets[i + 1]) del nivel inferior.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / STORE_META, 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+        n = self.meta['buildings']
+        self.coords_array = self._map('coords.f8', np.float64, (self.meta['coordinates'], 2))
+        self.ring_offsets = self._map('ring_offsets.i8', np.int64, (self.meta['rings'] + 1,))
+        self.part_offsets = self._map('part_offsets.i8', np.int64, (self.meta['polygons'] + 1,))
+        self.geom_offsets = self._map('geom_offsets.i8', np.int64, (n + 1,))
+        self.ids = self._map(f'ids.{ID_DTYPE}', ID_DTYPE, (n,))
+        self.attributes = {
+            name: self._map(f'{name}.f8', np.float64, (n,)) for name in self.meta['attributes']
+        }
+
+    def _map(self, filename, dtype, shape):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self.path / filename, dtype=dtype, mode='r', shape=shape)
+
+    def __len__(self):
+        return self.meta['buildings']
+
+    def __getitem__(self, name):
+        """Atributo por edificación (vista), p. ej. store['area_m2']"""
+        return self.attributes[name]
+
+    def _coord_range(self, start, stop):
+        ring_start = self.part_offsets[self.geom_offsets[start]]
+        ring_stop = self.part_offsets[self.geom_offsets[stop]]
+        return self.ring_offsets[ring_start], self.ring_offsets[ring_stop]
+
+    def coords(self, i):
+        """Todas las coordenadas (todos los anillos) de la edificación i, como vista"""
+        lo, hi = self._coord_range(i, i + 1)
+        return self.coords_array[lo:hi]
+
+    def rings(self, i):
+        """Lista de vistas (m, 2), una por anillo de la edificación i"""
+        ring_start = self.part_offsets[self.geom_offsets[i]]
+        ring_stop = self.part_offsets[self.geom_offsets[i + 1]]
+        offsets = self.ring_offsets[ring_start:ring_stop + 1]
+        return [self.coords_array[offsets[k]:offsets[k + 1]] for k in range(len(offsets) - 1)]
+
+    def slice(self, start, stop):
+        """
+        Tramo [start, stop) de edificaciones como arreglos de GeoArrow
+
+        Returns:
+            tuple: (coords, ring_offsets, part_offsets, geom_offsets); coords
+            es una vista y los offsets quedan rebasados a 0
+        """
+        part_lo, part_hi = self.geom_offsets[start], self.geom_offsets[stop]
+        ring_lo, ring_hi = self.part_offsets[part_lo], self.part_offsets[part_hi]
+        coord_lo, coord_hi = self.ring_offsets[ring_lo], self.ring_offsets[ring_hi]
+        return (
+            self.coords_array[coord_lo:coord_hi],
+            self.ring_offsets[ring_lo:ring_hi + 1] - coord_lo,
+            self.part_offsets[part_lo:part_hi + 1] - ring_lo,
+            self.geom_offsets[start:stop + 1] - part_lo
+        )
+
+    def to_shapely(self, start=0, stop=None):
+        """Geometrías Shapely (MultiPolygon) del tramo [start, stop)"""
+        stop = len(self) if stop is None else stop
+        coords, ring_offsets, part_offsets, geom_offsets = self.slice(start, stop)
+        return shapely.from_ragged_array(
+            shapely.GeometryType.MULTIPOLYGON,
+            np.asarray(coords),
+            offsets=(ring_offsets, part_offsets, geom_offsets)
+        )
+
+    def bounds(self, start=0, stop=None):
+        """
+        Bbox (n, 4) de cada edificación con reduceat, sin crear geometrías
+
+        Útil para construir un STRtree o filtrar por extensión sobre todo el país.
+        """
+        stop = len(self) if stop is None else stop
+        coords, ring_offsets, part_offsets, geom_offsets = self.slice(start, stop)
+        starts = ring_offsets[part_offsets[geom_offsets[:-1]]]
+        ends = ring_offsets[part_offsets[geom_offsets[1:]]]
+
+        result = np.full((stop - start, 4), np.nan)
+        nonempty = ends > starts
+        if nonempty.any():
+            idx = starts[nonempty]
+            result[nonempty, 0] = np.minimum.reduceat(coords[:, 0], idx)
+            result[nonempty, 1] = np.minimum.reduceat(coords[:, 1], idx)
+            result[nonempty, 2] = np.maximum.reduceat(coords[:, 0], idx)
+            result[nonempty, 3] = np.maximum.reduceat(coords[:, 1], idx)
+        return result
+
+    def iter_chunks(self, chunk_size=DEFAULT_BATCH_SIZE):
+        """Recorre el almacén en tramos (start, stop) de tamaño fijo"""
+        for start in range(0, len(self), chunk_size):
+            yield start, min(start + chunk_size, len(self))
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Almacén de coordenadas con memoria mapeada")
+    parser.add_argument('--dataset', choices=['microsoft', 'google'], required=True)
+    parser.add_argument('--from-snapshot', type=str, default=None,
+                        help='Construir desde un snapshot GeoParquet en lugar de MongoDB')
+    parser.add_argument('--output-dir', type=str, default=None,
+                        help='Directorio del almacén (default: data/processed/coordinate_store/<dataset>)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir) if args.output_dir else STORE_DIR / args.dataset
+
+    logger.info("=" * 70)
+    logger.info(f"ALMACÉN DE COORDENADAS: {args.dataset.upper()}")
+    logger.info("=" * 70)
+
+    if args.from_snapshot:
+        build_from_snapshot(args.from_snapshot, output_dir, batch_size=args.batch_size)
+    else:
+        build_from_collection(args.dataset, output_dir, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 """
 Script para exportar Microsoft Buildings a archivo JSON
 Para compartir con compañeros del equipo
+
+--full usa el motor paralelo de src/utils/collection_export.py
+(rangos de _id, NDJSON/BSON comprimido y manifest.json con checksums).
 """
 import sys
 import json
@@ -11,6 +14,7 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.database.connection import get_database
+from src.utils.collection_export import export_collection, FORMATS, COMPRESSIONS
 from tqdm import tqdm
 
 
@@ -40,17 +44,19 @@ def export_to_json_batches(output_dir, batch_size=100000):
     output_path = PROJECT_ROOT / output_dir
     output_path.mkdir(parents=True, exist_ok=True)
 
-    # Exportar en lotes
+    # Exportar en lotes (paginación por _id: cada lote continúa donde terminó el anterior)
     batch_num = 0
-    skip = 0
+    last_id = None
 
     with tqdm(total=total, desc="Exportando", unit=" docs") as pbar:
-        while skip < total:
+        while True:
             # Leer lote
-            batch = list(collection.find().skip(skip).limit(batch_size))
+            query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+            batch = list(collection.find(query).sort('_id', 1).limit(batch_size))
 
             if not batch:
                 break
+            last_id = batch[-1]['_id']
 
             # Guardar lote
             batch_file = output_path / f"microsoft_buildings_batch_{batch_num:04d}.json"
@@ -66,7 +72,6 @@ def export_to_json_batches(output_dir, batch_size=100000):
             print(f"\n  Guardado: {batch_file.name} ({len(batch):,} docs)")
 
             batch_num += 1
-            skip += batch_size
             pbar.update(len(batch))
 
     # Crear archivo de metadata
@@ -148,16 +153,33 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Exportar Microsoft Buildings")
     parser.add_argument('--sample', action='store_true', help='Exportar solo muestra de 10,000')
     parser.add_argument('--full', action='store_true', help='Exportar coleccion completa')
-    parser.add_argument('--batch-size', type=int, default=100000, help='Tamano de lote')
+    parser.add_argument('--batch-size', type=int, default=100000, help='Tamano de lote (--legacy-json)')
+    parser.add_argument('--format', choices=FORMATS, default='ndjson', help='Formato de --full')
+    parser.add_argument('--compression', choices=list(COMPRESSIONS), default='gzip',
+                        help='Compresion de --full (default: gzip; zstd requiere zstandard)')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos de --full')
+    parser.add_argument('--legacy-json', action='store_true',
+                        help='Con --full: lotes JSON microsoft_buildings_batch_*.json (formato anterior)')
 
     args = parser.parse_args()
 
     if args.sample:
         create_sample_export('backup_deliverable_3/microsoft_buildings_sample.json')
-    elif args.full:
+    elif args.full and args.legacy_json:
         export_to_json_batches('backup_deliverable_3/full', batch_size=args.batch_size)
+    elif args.full:
+        import logging
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        export_collection(
+            'microsoft_buildings',
+            PROJECT_ROOT / 'backup_deliverable_3' / 'full',
+            fmt=args.format,
+            compression=args.compression,
+            num_workers=args.workers
+        )
     else:
         print("Usar --sample para muestra o --full para exportacion completa")
         print("\nEjemplos:")
         print("  py src/utils/export_microsoft_buildings.py --sample")
-        print("  py src/utils/export_microsoft_buildings.py --full --batch-size 100000")
+        print("  py src/utils/export_microsoft_buildings.py --full --workers 8")
+        print("  py src/utils/export_microsoft_buildings.py --full --legacy-json --batch-size 100000")
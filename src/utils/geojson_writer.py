@@ -0,0 +1,140 @@
+"""
+Escritor GeoJSON en streaming
+
+Escribe features a medida que avanza el cursor de MongoDB, sin construir
+la FeatureCollection completa en memoria:
+
+- separadores compactos (sin indentación)
+- precisión de coordenadas configurable (6 decimales ≈ 0.1 m)
+- formato FeatureCollection (.geojson) o GeoJSONSeq / NDJSON (.geojsonl),
+  un feature por línea
+- escritura a <archivo>.tmp que reemplaza al destino solo si el bloque
+  with termina sin error: una exportación fallida no deja un archivo
+  truncado que parezca válido
+
+Uso:
+    with GeoJSONWriter(path, precision=6) as writer:
+        for doc in cursor:
+            writer.write(feature)
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import os
+import json
+from pathlib import Path
+
+DEFAULT_PRECISION = 6
+
+CRS84 = {
+    'type': 'name',
+    'properties': {'name': 'urn:ogc:def:crs:OGC:1.3:CRS84'}
+}
+
+FORMATS = {
+    'geojson': '.geojson',
+    'geojsonseq': '.geojsonl'
+}
+
+
+def quantize_coordinates(coords, precision=DEFAULT_PRECISION):
+    """
+    Redondea recursivamente un arreglo de coordenadas GeoJSON
+
+    Args:
+        coords (list): Posición o arreglo anidado de posiciones
+        precision (int): Decimales a conservar
+
+    Returns:
+        list: Coordenadas redondeadas con la misma estructura
+    """
+    if coords and isinstance(coords[0], (int, float)):
+        return [round(c, precision) for c in coords]
+    return [quantize_coordinates(c, precision) for c in coords]
+
+
+def quantize_geometry(geometry, precision=DEFAULT_PRECISION):
+    """Copia de una geometría GeoJSON con coordenadas redondeadas"""
+    if geometry is None or precision is None:
+        return geometry
+    if geometry.get('type') == 'GeometryCollection':
+        return {
+            'type': 'GeometryCollection',
+            'geometries': [quantize_geometry(g, precision) for g in geometry['geometries']]
+        }
+    return {
+        'type': geometry['type'],
+        'coordinates': quantize_coordinates(geometry['coordinates'], precision)
+    }
+
+
+class GeoJSONWriter:
+    """Escritor de features GeoJSON en streaming (memoria constante)"""
+
+    def __init__(self, path, precision=DEFAULT_PRECISION, fmt='geojson', name=None, crs=CRS84):
+        """
+        Args:
+            path (Path): Archivo de salida
+            precision (int): Decimales de coordenadas (None = sin redondeo)
+            fmt (str): 'geojson' (FeatureCollection) o 'geojsonseq' (un feature por línea)
+            name (str, optional): Nombre de la FeatureCollection
+            crs (dict, optional): Miembro crs de la FeatureCollection
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato no soportado: {fmt} (usar {', '.join(FORMATS)})")
+
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + '.tmp')
+        self.precision = precision
+        self.fmt = fmt
+        self.name = name
+        self.crs = crs
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+        if self.fmt == 'geojson':
+            header = {'type': 'FeatureCollection'}
+            if self.name:
+                header['name'] = self.name
+            if self.crs:
+                header['crs'] = self.crs
+            # Encabezado sin cerrar: los features se agregan a continuación
+            self._file.write(self._dumps(header)[:-1] + ',"features":[\n')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._file.close()
+            self.tmp_path.unlink(missing_ok=True)
+            return False
+
+        if self.fmt == 'geojson':
+            self._file.write('\n]}\n')
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+        return False
+
+    @staticmethod
+    def _dumps(obj):
+        # default=str: fechas y ObjectId de MongoDB dentro de properties
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=str)
+
+    def write(self, feature):
+        """
+        Escribe un feature
+
+        Args:
+            feature (dict): Feature GeoJSON (la geometría se redondea al escribir)
+        """
+        feature = dict(feature, geometry=quantize_geometry(feature.get('geometry'), self.precision))
+
+        if self.fmt == 'geojson' and self.count:
+            self._file.write(',\n')
+        self._file.write(self._dumps(feature))
+        if self.fmt == 'geojsonseq':
+            self._file.write('\n')
+
+        self.count += 1
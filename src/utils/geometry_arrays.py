@@ -0,0 +1,153 @@
+"""
+Conversión vectorizada de geometrías GeoJSON de MongoDB a arreglos Shapely
+
+Los documentos de edificaciones guardan geometrías como diccionarios
+GeoJSON. Estas utilidades las convierten por lotes en arreglos de
+shapely 2.0 (vía from_ragged_array) y las proyectan a metros con
+pyproj, para que los cálculos posteriores sean operaciones vectorizadas
+en lugar de bucles por objeto.
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import numpy as np
+import pyproj
+import shapely
+from shapely.geometry import shape
+
+# WGS84 (EPSG:4326) -> Colombia MAGNA-SIRGAS (EPSG:3116), igual que los cargadores
+WGS84 = 'EPSG:4326'
+COLOMBIA_CRS = 'EPSG:3116'
+
+
+def _is_2d_polygon(geom):
+    """True si es un Polygon cuyos vértices son todos [lon, lat]"""
+    if geom.get('type') != 'Polygon':
+        return False
+    try:
+        return all(len(pt) == 2 for ring in geom['coordinates'] for pt in ring)
+    except TypeError:
+        return False
+
+
+def polygons_from_docs(docs, field='geometry'):
+    """
+    Construye un arreglo de polígonos Shapely a partir de documentos MongoDB
+
+    Los Polygon 2D (caso general) se ensamblan en un solo llamado a
+    shapely.from_ragged_array; los MultiPolygon, otros tipos y polígonos
+    con vértices que no son [lon, lat] (p. ej. con altura) se convierten
+    individualmente con shape() y se llevan a 2D. Documentos sin geometría
+    o con coordenadas inválidas quedan como None.
+
+    Args:
+        docs (list): Documentos con geometría GeoJSON
+        field (str): Campo de la geometría
+
+    Returns:
+        np.ndarray: Arreglo de geometrías Shapely (dtype=object), alineado con docs
+    """
+    geoms = np.empty(len(docs), dtype=object)
+
+    coords = []
+    ring_offsets = [0]
+    geom_offsets = [0]
+    polygon_idx = []
+
+    for i, doc in enumerate(docs):
+        geom = doc.get(field)
+        if not geom or not geom.get('coordinates'):
+            continue
+
+        if _is_2d_polygon(geom):
+            for ring in geom['coordinates']:
+                coords.extend(ring)
+                ring_offsets.append(len(coords))
+            geom_offsets.append(len(ring_offsets) - 1)
+            polygon_idx.append(i)
+        else:
+            # Un solo vértice 3D rompería el arreglo de coordenadas del lote
+            try:
+                if geom.get('type') == 'Polygon':
+                    geom = {'type': 'Polygon', 'coordinates': [[pt[:2] for pt in ring] for ring in geom['coordinates']]}
+                geoms[i] = shapely.force_2d(shape(geom))
+            except Exception:
+                geoms[i] = None
+
+    if polygon_idx:
+        coords_arr = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        polygons = shapely.from_ragged_array(
+            shapely.GeometryType.POLYGON,
+            coords_arr,
+            offsets=(
+                np.asarray(ring_offsets, dtype=np.int64),
+                np.asarray(geom_offsets, dtype=np.int64)
+            )
+        )
+        geoms[np.asarray(polygon_idx)] = polygons
+
+    return geoms
+
+
+def points_from_docs(docs, field='centroid'):
+    """
+    Extrae coordenadas de un campo Point GeoJSON como arreglo (n, 2)
+
+    Args:
+        docs (list): Documentos con el campo Point
+        field (str): Campo del punto
+
+    Returns:
+        np.ndarray: Coordenadas lon/lat; NaN donde falta el punto
+    """
+    xy = np.full((len(docs), 2), np.nan)
+    for i, doc in enumerate(docs):
+        point = doc.get(field)
+        if point and point.get('coordinates'):
+            xy[i] = point['coordinates'][:2]
+    return xy
+
+
+def get_transformer(src_crs=WGS84, dst_crs=COLOMBIA_CRS):
+    """Transformer pyproj con orden lon/lat (always_xy)"""
+    return pyproj.Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
+
+def project_geometries(geoms, transformer=None):
+    """
+    Proyecta un arreglo de geometrías a metros (EPSG:3116 por defecto)
+
+    Todas las coordenadas del arreglo se transforman en un único llamado
+    a pyproj a través de shapely.transform.
+
+    Args:
+        geoms (np.ndarray): Geometrías en WGS84
+        transformer (pyproj.Transformer, optional): Transformación a usar
+
+    Returns:
+        np.ndarray: Geometrías proyectadas
+    """
+    transformer = transformer or get_transformer()
+
+    def _transform(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+
+    return shapely.transform(geoms, _transform)
+
+
+def project_points(xy, transformer=None):
+    """
+    Proyecta coordenadas (n, 2) lon/lat a metros
+
+    Args:
+        xy (np.ndarray): Coordenadas en WGS84
+        transformer (pyproj.Transformer, optional): Transformación a usar
+
+    Returns:
+        np.ndarray: Coordenadas proyectadas (n, 2)
+    """
+    transformer = transformer or get_transformer()
+    x, y = transformer.transform(xy[:, 0], xy[:, 1])
+    return np.column_stack([x, y])
@@ -0,0 +1,104 @@
+"""
+Geometrías simplificadas en varias resoluciones para mapas web
+
+Los polígonos municipales a resolución completa hacen que los mapas HTML
+de folium pesen varios MB. Este módulo genera versiones simplificadas que
+preservan la topología de la cobertura (municipios vecinos siguen
+compartiendo el mismo borde, sin huecos ni traslapes):
+
+- shapely.coverage_simplify (shapely >= 2.1 / GEOS >= 3.12) simplifica
+  cada borde compartido una sola vez
+- en versiones anteriores se usa simplify(preserve_topology=True) por
+  polígono (válido, pero los bordes vecinos pueden no coincidir)
+
+Opcionalmente escribe TopoJSON con arcos compartidos (paquete topojson).
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import logging
+
+import numpy as np
+import shapely
+from shapely.geometry import shape, mapping
+
+logger = logging.getLogger(__name__)
+
+# Tolerancias en grados (WGS84): ~1.1 km, ~330 m, ~110 m
+SIMPLIFY_TOLERANCES = {
+    'low': 0.01,
+    'medium': 0.003,
+    'high': 0.001
+}
+
+# Resolución usada por los mapas de 05_generate_visualizations.py
+MAP_RESOLUTION = 'medium'
+
+
+def simplify_coverage(geoms, tolerance):
+    """
+    Simplifica un arreglo de polígonos que forman una cobertura
+
+    Args:
+        geoms (np.ndarray): Polígonos/multipolígonos sin traslapes entre sí
+        tolerance (float): Tolerancia en unidades del CRS
+
+    Returns:
+        np.ndarray: Geometrías simplificadas
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    if hasattr(shapely, 'coverage_simplify'):
+        try:
+            return shapely.coverage_simplify(geoms, tolerance)
+        except shapely.errors.GEOSException as e:
+            # Cobertura inválida (traslapes en la fuente): simplificación por polígono
+            logger.warning(f"coverage_simplify falló ({e}); se usa simplify por polígono")
+    return shapely.simplify(geoms, tolerance, preserve_topology=True)
+
+
+def simplify_features(features, tolerance):
+    """
+    Copia de una lista de features GeoJSON con geometrías simplificadas
+
+    Args:
+        features (list): Features GeoJSON
+        tolerance (float): Tolerancia en grados
+
+    Returns:
+        list: Features con la misma estructura y properties
+    """
+    geoms = np.array([shape(f['geometry']) for f in features], dtype=object)
+    simplified = simplify_coverage(geoms, tolerance)
+    return [
+        dict(feature, geometry=mapping(geom))
+        for feature, geom in zip(features, simplified)
+    ]
+
+
+def write_topojson(features, path, quantization=1e5):
+    """
+    Escribe una colección de features como TopoJSON (arcos compartidos)
+
+    Args:
+        features (list): Features GeoJSON (ya simplificados)
+        path (Path): Archivo de salida (.topojson)
+        quantization (float): Cuantización de coordenadas del TopoJSON
+
+    Returns:
+        bool: True si se escribió, False si el paquete topojson no está instalado
+    """
+    try:
+        import topojson
+    except ImportError:
+        logger.warning("Paquete 'topojson' no instalado: se omite la salida TopoJSON")
+        return False
+
+    topology = topojson.Topology(
+        {'type': 'FeatureCollection', 'features': features},
+        topology=True,
+        prequantize=quantization
+    )
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(topology.to_json())
+    return True
@@ -0,0 +1,380 @@
+"""
+Snapshot columnar (GeoParquet) de las colecciones de edificaciones
+
+Exporta microsoft_buildings / google_buildings a un archivo GeoParquet
+para que notebooks y análisis lean localmente en lugar de volver a
+consultar MongoDB:
+
+- geometry: WKB (GeoParquet 1.1, CRS OGC:CRS84)
+- bbox: struct xmin/ymin/xmax/ymax por edificación (covering de GeoParquet 1.1)
+- centroid_lon, centroid_lat, area_m2, useful_area_m2, confidence, cell
+- Compresión zstd
+- Un row group por celda de la grilla (CELL_SIZE grados): las estadísticas
+  min/max de centroid_lon/centroid_lat de cada row group permiten saltar
+  las celdas fuera de un bbox sin leerlas
+
+Cada celda se consulta en MongoDB con $geoWithin sobre el índice 2dsphere
+de centroid (con margen) y se filtra exactamente por la celda del centroide,
+así cada edificación queda en un solo row group. Las celdas se procesan en
+paralelo con un número acotado de celdas en vuelo y se escriben a medida
+que terminan (el orden de los row groups no es el de la grilla).
+
+Las edificaciones sin centroide o con centroide fuera de COLOMBIA_BBOX no
+caen en ninguna celda: el total de la colección se compara con las filas
+escritas y las descartadas se reportan en el resumen.
+
+Uso:
+    python src/utils/geoparquet_snapshot.py --dataset microsoft
+    from src.utils.geoparquet_snapshot import read_snapshot
+    df = read_snapshot(path, columns=['area_m2'], bbox=(-75.6, 1.5, -75.4, 1.7))
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import os
+import json
+import math
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import logging
+
+import numpy as np
+import shapely
+from tqdm import tqdm
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.analysis.size_distribution import AREA_FIELDS
+from src.database.partitioning import cell_query, cell_owned
+from src.analysis.density_grid import COLOMBIA_BBOX
+from src.utils.geometry_arrays import polygons_from_docs
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = PROJECT_ROOT / 'data' / 'processed' / 'snapshots'
+CELL_SIZE = 0.5                 # Grados por celda / row group
+CELL_MARGIN = 0.01              # Margen de la consulta $geoWithin (bordes geodésicos)
+COMPRESSION_LEVEL = 9
+GEOPARQUET_VERSION = '1.1.0'
+
+BBOX_FIELDS = ('xmin', 'ymin', 'xmax', 'ymax')
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Snapshots GeoParquet requieren el paquete 'pyarrow' (pip install pyarrow)")
+
+
+def snapshot_schema():
+    """Esquema Arrow del snapshot (igual para ambos datasets)"""
+    _require_pyarrow()
+    return pa.schema([
+        ('id', pa.string()),
+        ('geometry', pa.binary()),
+        ('bbox', pa.struct([(name, pa.float64()) for name in BBOX_FIELDS])),
+        ('centroid_lon', pa.float64()),
+        ('centroid_lat', pa.float64()),
+        ('area_m2', pa.float64()),
+        ('useful_area_m2', pa.float64()),
+        ('confidence', pa.float64()),
+        ('cell', pa.int32())
+    ])
+
+
+def grid_cells(bbox=COLOMBIA_BBOX, cell_size=CELL_SIZE):
+    """Índices (cx, cy) de las celdas que cubren el bbox, en orden de fila"""
+    minx, miny, maxx, maxy = bbox
+    xs = range(math.floor(minx / cell_size), math.ceil(maxx / cell_size))
+    ys = range(math.floor(miny / cell_size), math.ceil(maxy / cell_size))
+    return [(cx, cy) for cy in ys for cx in xs]
+
+
+def cell_id(cx, cy):
+    """Identificador entero estable de una celda (columna 'cell')"""
+    return (cy + 1000) * 10000 + (cx + 1000)
+
+
+def _nested(doc, dotted):
+    value = doc
+    for key in dotted.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def export_cell(dataset, cell, cell_size=CELL_SIZE):
+    """
+    Worker: lee las edificaciones cuyo centroide cae en una celda
+
+    Args:
+        dataset (str): 'microsoft' o 'google'
+        cell (tuple): (cx, cy)
+        cell_size (float): Tamaño de celda en grados
+
+    Returns:
+        pa.Table o None si la celda no tiene edificaciones
+    """
+    area_field = AREA_FIELDS[dataset]
+    projection = {
+        'geometry': 1,
+        'centroid': 1,
+        area_field: 1,
+        'properties.useful_area_m2': 1,
+        'properties.confidence': 1
+    }
+
+    db = get_database()
+    docs = list(db[f'{dataset}_buildings'].find(
+        cell_query(cell, cell_size, CELL_MARGIN),
+        projection
+    ).sort('_id', 1))
+    if not docs:
+        return None
+
+    lonlat = np.array([d['centroid']['coordinates'][:2] for d in docs], dtype=np.float64)
+    inside = cell_owned(lonlat, cell, cell_size)
+    if not inside.any():
+        return None
+    docs = [d for d, keep in zip(docs, inside) if keep]
+    lonlat = lonlat[inside]
+
+    geoms = polygons_from_docs(docs)
+    bounds = shapely.bounds(geoms)
+
+    def column(field):
+        return np.array([_nested(d, field) for d in docs], dtype=np.float64)
+
+    bbox_array = pa.StructArray.from_arrays(
+        [pa.array(bounds[:, i]) for i in range(4)],
+        names=list(BBOX_FIELDS)
+    )
+
+    return pa.Table.from_arrays(
+        [
+            pa.array([str(d['_id']) for d in docs]),
+            pa.array(shapely.to_wkb(geoms), type=pa.binary()),
+            bbox_array,
+            pa.array(lonlat[:, 0]),
+            pa.array(lonlat[:, 1]),
+            pa.array(column(area_field)),
+            pa.array(column('properties.useful_area_m2'), from_pandas=True),
+            pa.array(column('properties.confidence'), from_pandas=True),
+            pa.array(np.full(len(docs), cell_id(*cell), dtype=np.int32))
+        ],
+        schema=snapshot_schema()
+    )
+
+
+def geo_metadata():
+    """
+    Metadatos 'geo' de GeoParquet 1.1
+
+    geometry_types vacío = tipos no declarados (Polygon y MultiPolygon);
+    el bbox por fila queda declarado como covering para lectores externos.
+    """
+    return {
+        'version': GEOPARQUET_VERSION,
+        'primary_column': 'geometry',
+        'columns': {
+            'geometry': {
+                'encoding': 'WKB',
+                'geometry_types': [],
+                'covering': {
+                    'bbox': {name: ['bbox', name] for name in BBOX_FIELDS}
+                }
+            }
+        }
+    }
+
+
+def export_snapshot(dataset, output_path=None, cell_size=CELL_SIZE, num_workers=None):
+    """
+    Exporta una colección de edificaciones a GeoParquet
+
+    Args:
+        dataset (str): 'microsoft' o 'google'
+        output_path (Path, optional): Archivo de salida
+        cell_size (float): Tamaño de celda (un row group por celda)
+        num_workers (int, optional): Procesos paralelos
+
+    Returns:
+        dict: path, rows, row_groups, source_documents y descartadas
+            (dropped, dropped_no_centroid, dropped_outside_grid)
+    """
+    _require_pyarrow()
+    output_path = Path(output_path or SNAPSHOT_DIR / f'{dataset}_buildings.parquet')
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    num_workers = num_workers or os.cpu_count() or 1
+
+    collection = get_database()[f'{dataset}_buildings']
+    source_documents = collection.count_documents({})
+
+    cells = grid_cells(cell_size=cell_size)
+    logger.info(f"Snapshot {dataset}: {len(cells)} celdas de {cell_size}° con {num_workers} procesos")
+
+    schema = snapshot_schema().with_metadata({b'geo': json.dumps(geo_metadata()).encode('utf-8')})
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    rows = 0
+    row_groups = 0
+
+    # Se escribe a un temporal: un snapshot a medias nunca reemplaza al anterior
+    with pq.ParquetWriter(tmp_path, schema, compression='zstd', compression_level=COMPRESSION_LEVEL) as writer:
+        progress = tqdm(total=len(cells), desc=f"Celdas {dataset}")
+        pending_cells = list(cells)
+
+        # Máximo 2 celdas por proceso en memoria a la vez; cada tabla se
+        # escribe apenas termina su celda
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            in_flight = set()
+            while pending_cells or in_flight:
+                while pending_cells and len(in_flight) < num_workers * 2:
+                    in_flight.add(executor.submit(export_cell, dataset, pending_cells.pop(0), cell_size))
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    table = future.result()
+                    progress.update(1)
+                    if table is None:
+                        continue
+                    writer.write_table(table.replace_schema_metadata(schema.metadata), row_group_size=table.num_rows)
+                    rows += table.num_rows
+                    row_groups += 1
+        progress.close()
+
+    os.replace(tmp_path, output_path)
+
+    # Documentos que no quedaron en ninguna celda
+    dropped = source_documents - rows
+    dropped_no_centroid = collection.count_documents({'centroid': None}) if dropped else 0
+
+    size_mb = output_path.stat().st_size / (1024 ** 2)
+    logger.info(f"Snapshot escrito: {output_path} ({rows:,} filas, {row_groups} row groups, {size_mb:.1f} MB)")
+    if dropped:
+        logger.warning(
+            f"Edificaciones no exportadas: {dropped:,} de {source_documents:,} "
+            f"(sin centroide: {dropped_no_centroid:,}, "
+            f"fuera de la grilla: {dropped - dropped_no_centroid:,})"
+        )
+
+    return {
+        'path': output_path,
+        'rows': rows,
+        'row_groups': row_groups,
+        'source_documents': source_documents,
+        'dropped': dropped,
+        'dropped_no_centroid': dropped_no_centroid,
+        'dropped_outside_grid': dropped - dropped_no_centroid
+    }
+
+
+def _row_group_overlaps(row_group, bbox):
+    """Compara las estadísticas min/max de centroide de un row group con el bbox"""
+    minx, miny, maxx, maxy = bbox
+    stats = {}
+    for i in range(row_group.num_columns):
+        column = row_group.column(i)
+        if column.path_in_schema in ('centroid_lon', 'centroid_lat'):
+            if column.statistics is None or not column.statistics.has_min_max:
+                return True
+            stats[column.path_in_schema] = (column.statistics.min, column.statistics.max)
+    if len(stats) < 2:
+        return True
+    lon_min, lon_max = stats['centroid_lon']
+    lat_min, lat_max = stats['centroid_lat']
+    return lon_max >= minx and lon_min <= maxx and lat_max >= miny and lat_min <= maxy
+
+
+def read_snapshot(path, columns=None, bbox=None, as_geometry=False):
+    """
+    Lee un snapshot con proyección de columnas y poda por bbox
+
+    Args:
+        path (Path): Archivo GeoParquet (o 'microsoft'/'google' para el default)
+        columns (list, optional): Columnas a leer (default todas)
+        bbox (tuple, optional): (minx, miny, maxx, maxy) sobre el centroide;
+            solo se leen los row groups cuyas estadísticas lo intersectan
+        as_geometry (bool): Convertir la columna geometry de WKB a Shapely
+
+    Returns:
+        pd.DataFrame
+    """
+    _require_pyarrow()
+    if path in AREA_FIELDS:
+        path = SNAPSHOT_DIR / f'{path}_buildings.parquet'
+
+    parquet = pq.ParquetFile(path)
+    names = parquet.schema_arrow.names
+    read_columns = list(columns) if columns else list(names)
+    if bbox is not None:
+        for name in ('centroid_lon', 'centroid_lat'):
+            if name not in read_columns:
+                read_columns.append(name)
+
+    row_groups = list(range(parquet.num_row_groups))
+    if bbox is not None:
+        row_groups = [i for i in row_groups if _row_group_overlaps(parquet.metadata.row_group(i), bbox)]
+
+    if row_groups:
+        table = parquet.read_row_groups(row_groups, columns=read_columns)
+    else:
+        table = parquet.schema_arrow.empty_table().select(read_columns)
+
+    df = table.to_pandas()
+    if bbox is not None:
+        minx, miny, maxx, maxy = bbox
+        inside = df['centroid_lon'].between(minx, maxx) & df['centroid_lat'].between(miny, maxy)
+        df = df[inside].reset_index(drop=True)
+        df = df[list(columns)] if columns else df
+
+    if as_geometry and 'geometry' in df.columns:
+        df['geometry'] = shapely.from_wkb(df['geometry'].values)
+
+    logger.debug(f"{path}: {len(row_groups)}/{parquet.num_row_groups} row groups leídos")
+    return df
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Snapshot GeoParquet de edificaciones")
+    parser.add_argument('--dataset', choices=['microsoft', 'google', 'all'], default='all')
+    parser.add_argument('--cell-size', type=float, default=CELL_SIZE,
+                        help=f'Grados por row group (default: {CELL_SIZE})')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos')
+    parser.add_argument('--output-dir', type=str, default=None,
+                        help='Directorio de salida (default: data/processed/snapshots)')
+    args = parser.parse_args()
+
+    datasets = ['microsoft', 'google'] if args.dataset == 'all' else [args.dataset]
+    output_dir = Path(args.output_dir) if args.output_dir else SNAPSHOT_DIR
+
+    logger.info("=" * 70)
+    logger.info("SNAPSHOT GEOPARQUET DE EDIFICACIONES")
+    logger.info("=" * 70)
+
+    for dataset in datasets:
+        export_snapshot(
+            dataset,
+            output_dir / f'{dataset}_buildings.parquet',
+            cell_size=args.cell_size,
+            num_workers=args.workers
+        )
+
+
+if __name__ == "__main__":
+    main()
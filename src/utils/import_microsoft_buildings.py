@@ -1,6 +1,10 @@
 """
 Script para importar Microsoft Buildings desde archivos JSON
 Para que los compañeros restauren los datos
+
+Si el directorio de --batches tiene manifest.json (export_microsoft_buildings.py
+--full) o se pasa --parallel, se usa la importación paralela de
+src/utils/collection_import.py con verificación contra el manifiesto.
 """
 import sys
 import json
@@ -12,6 +16,8 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.database.connection import get_database
+from src.utils.collection_export import MANIFEST_NAME
+from src.utils.collection_import import import_collection
 from tqdm import tqdm
 
 
@@ -135,11 +141,23 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Importar Microsoft Buildings")
     parser.add_argument('--sample', type=str, help='Importar desde archivo de muestra')
     parser.add_argument('--batches', type=str, help='Importar desde directorio de lotes')
+    parser.add_argument('--parallel', action='store_true',
+                        help='Importacion paralela (automatica si hay manifest.json)')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos de importacion')
 
     args = parser.parse_args()
 
     if args.sample:
         import_from_json(args.sample)
+    elif args.batches and (args.parallel or (PROJECT_ROOT / args.batches / MANIFEST_NAME).exists()):
+        import logging
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        summary = import_collection(
+            'microsoft_buildings',
+            PROJECT_ROOT / args.batches,
+            num_workers=args.workers
+        )
+        sys.exit(0 if summary['verified'] else 1)
     elif args.batches:
         import_from_batches(args.batches)
     else:
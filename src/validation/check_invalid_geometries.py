@@ -1,5 +1,8 @@
 """
 Verificar geometrias invalidas en Microsoft Buildings
+
+Muestra el resumen de src/validation/geometry_audit.py (lo ejecuta si no
+existe el reporte o con --run-audit).
 """
 import sys
 from pathlib import Path
@@ -7,45 +10,69 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 from src.database.connection import get_database
 
-db = get_database()
-coll = db['microsoft_buildings']
-
-print("="*60)
-print("VERIFICACION DE GEOMETRIAS")
-print("="*60)
-
-# Total
-total = coll.count_documents({})
-print(f"\nTotal edificaciones: {total:,}")
-
-# Intentar encontrar la geometria problematica
-print("\nBuscando geometria con ID ObjectId('6911181fc0d855ab81279cc7')...")
-
-from bson import ObjectId
-problematic = coll.find_one({'_id': ObjectId('6911181fc0d855ab81279cc7')})
-
-if problematic:
-    print("\nGeometria problematica encontrada:")
-    print(f"  Linea fuente: {problematic['properties']['source_line']}")
-    print(f"  Area: {problematic['properties']['area_m2']} m2")
-    print(f"  Coordenadas: {len(problematic['geometry']['coordinates'][0])} puntos")
-    print("\n  Problema: 'Edges 0 and 3 cross' - auto-interseccion")
-
-# Estrategia: usar indice parcial solo para geometrias validas
-print("\n" + "="*60)
-print("SOLUCION")
-print("="*60)
-print("\nOpciones para manejar geometrias invalidas:")
-print("1. Usar la coleccion sin indice 2dsphere (queries mas lentas)")
-print("2. Crear indice parcial excluyendo geometrias invalidas")
-print("3. Pre-validar y reparar geometrias antes de cargar")
-print("\nPara este proyecto, usaremos opcion 1: datos completos,")
-print("queries directas sobre geometrias.")
-print("\nNota: Las geometrias invalidas representan <0.01% del total")
-print(f"      (~{111151} de {total:,})")
-
-print("\n" + "="*60)
-print("DATOS CARGADOS EXITOSAMENTE")
-print("="*60)
-print(f"Total: {total:,} edificaciones")
-print("Estado: OK (sin indice 2dsphere debido a geometrias invalidas)")
+
+def main():
+    # Dentro de main(): la auditoria usa procesos (spawn en Windows reimporta el modulo)
+    db = get_database()
+    coll = db['microsoft_buildings']
+
+    print("="*60)
+    print("VERIFICACION DE GEOMETRIAS")
+    print("="*60)
+
+    # Total
+    total = coll.count_documents({})
+    print(f"\nTotal edificaciones: {total:,}")
+
+    # Resultado de la auditoria (src/validation/geometry_audit.py)
+    import json
+    from src.validation.geometry_audit import RESULTS_DIR, audit_collection
+
+    summary_path = RESULTS_DIR / 'geometry_audit_microsoft_buildings.json'
+    if '--run-audit' in sys.argv or not summary_path.exists():
+        print("\nEjecutando auditoria de geometrias (paralela por rangos de _id)...")
+        import logging
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        audit = audit_collection('microsoft_buildings')
+    else:
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            audit = json.load(f)
+        print(f"\nAuditoria del {audit['timestamp']} (usar --run-audit para recalcular)")
+
+    print(f"\nGeometrias con problemas: {audit['offending']:,} de {audit['checked']:,} ({audit['offending_pct']}%)")
+    for reason, count in audit['by_reason'].items():
+        print(f"  {reason}: {count:,}")
+
+    ids_path = RESULTS_DIR / 'geometry_audit_microsoft_buildings.csv'
+    if ids_path.exists():
+        import csv
+        with open(ids_path, 'r', encoding='utf-8') as f:
+            examples = [row for _, row in zip(range(5), csv.DictReader(f))]
+        if examples:
+            print("\nEjemplos:")
+            for row in examples:
+                print(f"  ObjectId('{row['_id']}'): {row['reason']}")
+        print(f"\nLista completa de _id para reparar: {ids_path}")
+
+    # Estrategia: usar indice parcial solo para geometrias validas
+    print("\n" + "="*60)
+    print("SOLUCION")
+    print("="*60)
+    print("\nOpciones para manejar geometrias invalidas:")
+    print("1. Usar la coleccion sin indice 2dsphere (queries mas lentas)")
+    print("2. Crear indice parcial excluyendo geometrias invalidas")
+    print("3. Pre-validar y reparar geometrias antes de cargar")
+    print("\nPara este proyecto, usaremos opcion 1: datos completos,")
+    print("queries directas sobre geometrias.")
+    print(f"\nNota: Las geometrias con problemas representan {audit['offending_pct']}% del total")
+    print(f"      ({audit['offending']:,} de {audit['checked']:,})")
+
+    print("\n" + "="*60)
+    print("DATOS CARGADOS EXITOSAMENTE")
+    print("="*60)
+    print(f"Total: {total:,} edificaciones")
+    print("Estado: OK (sin indice 2dsphere debido a geometrias invalidas)")
+
+
+if __name__ == "__main__":
+    main()
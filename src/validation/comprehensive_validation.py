@@ -20,6 +20,7 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.database.connection import get_database
+from src.validation.validation_engine import collection_profile, COLOMBIA_VALIDATION_BBOX
 
 def validate_microsoft_buildings():
     """Valida datos de Microsoft Buildings"""
@@ -30,56 +31,53 @@ def validate_microsoft_buildings():
     db = get_database()
     collection = db.microsoft_buildings
 
+    # Todos los chequeos en un solo recorrido de la colección
+    print("Calculando perfil de validación (un solo recorrido)...")
+    required_fields = ['geometry', 'properties', 'data_source', 'created_at']
+    profile = collection_profile(
+        collection,
+        required_fields=required_fields + ['properties.area_m2'],
+        bbox=COLOMBIA_VALIDATION_BBOX
+    )
+
     # 1. Conteo total
-    total = collection.count_documents({})
+    total = profile['total']
     print(f"✅ Total de documentos: {total:,}")
 
     # 2. Verificar campos requeridos
     print("\nVerificando campos requeridos...")
-    sample = collection.find_one({})
-    if sample:
-        required_fields = ['geometry', 'properties', 'data_source', 'created_at']
-        for field in required_fields:
-            if field in sample:
-                print(f"  [OK] Campo '{field}' presente")
-            else:
-                print(f"  [FALTA] Campo '{field}' FALTANTE")
+    for field in required_fields:
+        missing = profile['fields'][field]['missing']
+        if missing == 0:
+            print(f"  [OK] Campo '{field}' presente")
+        else:
+            print(f"  [FALTA] Campo '{field}' FALTANTE en {missing:,} documentos")
 
     # 3. Verificar geometrías
     print("\nVerificando geometrias...")
-    geom_check = collection.count_documents({'geometry.type': 'Polygon'})
+    geom_check = profile['polygons']
     print(f"  [OK] Geometrias tipo Polygon: {geom_check:,}")
 
     # 4. Verificar áreas
     print("\nVerificando areas...")
-    with_area = collection.count_documents({'properties.area_m2': {'$exists': True}})
+    with_area = total - profile['fields']['properties.area_m2']['missing']
     print(f"  [OK] Documentos con area_m2: {with_area:,}")
 
-    # Estadísticas de área
-    pipeline_area = [
-        {'$match': {'properties.area_m2': {'$gt': 0}}},
-        {'$group': {
-            '_id': None,
-            'avg': {'$avg': '$properties.area_m2'},
-            'min': {'$min': '$properties.area_m2'},
-            'max': {'$max': '$properties.area_m2'}
-        }}
-    ]
-    area_stats = list(collection.aggregate(pipeline_area))
-    if area_stats:
-        stats = area_stats[0]
-        print(f"  📊 Área promedio: {stats['avg']:.2f} m²")
-        print(f"  📊 Área mínima: {stats['min']:.2f} m²")
-        print(f"  📊 Área máxima: {stats['max']:.2f} m²")
+    # Estadísticas de área (solo áreas > 0)
+    area = profile['area']
+    if area['positive_count']:
+        print(f"  📊 Área promedio: {area['positive_avg']:.2f} m²")
+        print(f"  📊 Área mínima: {area['positive_min']:.2f} m²")
+        print(f"  📊 Área máxima: {area['max']:.2f} m²")
 
     # 5. Verificar data_source
     print("\n🔍 Verificando fuente de datos...")
-    sources = collection.distinct('data_source')
+    sources = profile['data_sources']
     print(f"  ✅ Fuentes únicas: {sources}")
 
     # 6. Verificar fechas de creación
     print("\n📅 Verificando timestamps...")
-    with_timestamp = collection.count_documents({'created_at': {'$exists': True}})
+    with_timestamp = total - profile['fields']['created_at']['missing']
     print(f"  ✅ Documentos con created_at: {with_timestamp:,}")
 
     # 7. Verificar índices
@@ -91,20 +89,7 @@ def validate_microsoft_buildings():
 
     # 8. Distribución de coordenadas (verificar que estén en Colombia)
     print("\n🌎 Verificando coordenadas (deben estar en Colombia)...")
-    colombia_bbox = {
-        'min_lon': -82.0, 'max_lon': -66.0,
-        'min_lat': -5.0, 'max_lat': 14.0
-    }
-
-    # Contar edificaciones fuera de bbox de Colombia
-    outside_colombia = collection.count_documents({
-        '$or': [
-            {'geometry.coordinates.0.0.0': {'$lt': colombia_bbox['min_lon']}},
-            {'geometry.coordinates.0.0.0': {'$gt': colombia_bbox['max_lon']}},
-            {'geometry.coordinates.0.0.1': {'$lt': colombia_bbox['min_lat']}},
-            {'geometry.coordinates.0.0.1': {'$gt': colombia_bbox['max_lat']}}
-        ]
-    })
+    outside_colombia = profile['outside_bbox']
 
     if outside_colombia == 0:
         print(f"  ✅ Todas las edificaciones dentro de bbox Colombia")
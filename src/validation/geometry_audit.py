@@ -0,0 +1,314 @@
+"""
+Auditoría paralela de validez de geometrías
+
+Recorre una colección de edificaciones por rangos de _id
+(src/database/partitioning.py) y en cada lote aplica chequeos
+vectorizados:
+
+- Estructura GeoJSON: tipo soportado, anillos cerrados, mínimo 4 vértices
+  por anillo y máximo razonable de vértices por edificación
+- Validez OGC con shapely.is_valid_reason (auto-intersecciones, anillos
+  auto-tocados, huecos fuera del exterior, ...)
+- Sanidad de área: área proyectada (EPSG:3116) fuera de rango o muy
+  distinta del área almacenada
+
+Salida:
+    results/validation/geometry_audit_<colección>.json   resumen por motivo
+    results/validation/geometry_audit_<colección>.csv    _id y motivo de cada
+                                                         edificación con problema
+
+Uso:
+    python src/validation/geometry_audit.py --collection microsoft_buildings --workers 8
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import csv
+import json
+import time
+from pathlib import Path
+from datetime import datetime
+from collections import Counter
+import logging
+
+import numpy as np
+import shapely
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.database.partitioning import id_range_query, iter_batches, run_partitioned
+from src.analysis.size_distribution import AREA_FIELDS
+from src.utils.geometry_arrays import polygons_from_docs, project_geometries, get_transformer
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = PROJECT_ROOT / 'results' / 'validation'
+DEFAULT_BATCH_SIZE = 5000
+
+MIN_RING_VERTICES = 4          # Triángulo cerrado
+MAX_VERTICES = 5000            # Huellas de edificaciones: más vértices es sospechoso
+MIN_AREA_M2 = 1.0
+MAX_AREA_M2 = 100000.0         # 10 ha
+AREA_MISMATCH_TOLERANCE = 0.2  # Diferencia relativa con el área almacenada
+
+SUPPORTED_TYPES = ('Polygon', 'MultiPolygon')
+
+
+def _geometry_rings(geom):
+    """Lista de anillos (listas de coordenadas) de un Polygon/MultiPolygon GeoJSON"""
+    if geom['type'] == 'Polygon':
+        return geom['coordinates']
+    return [ring for polygon in geom['coordinates'] for ring in polygon]
+
+
+def structural_reasons(docs):
+    """
+    Chequeos de estructura sobre las coordenadas GeoJSON crudas
+
+    Las coordenadas de todos los anillos del lote se aplanan en un arreglo
+    y los chequeos de cierre y conteo de vértices se hacen con NumPy.
+
+    Returns:
+        list: Motivo por documento (None si la estructura es correcta)
+    """
+    reasons = [None] * len(docs)
+    coords = []
+    ring_offsets = [0]
+    ring_doc = []
+
+    for i, doc in enumerate(docs):
+        geom = doc.get('geometry')
+        if not geom or not geom.get('coordinates'):
+            reasons[i] = 'missing_geometry'
+            continue
+        if geom.get('type') not in SUPPORTED_TYPES:
+            reasons[i] = 'unsupported_type'
+            continue
+        # Los anillos se arman en listas locales y solo se agregan al lote
+        # si todo el documento es legible: un anillo roto a medias no debe
+        # quedar pegado al primer anillo del documento siguiente
+        try:
+            doc_rings = []
+            for ring in _geometry_rings(geom):
+                points = []
+                for point in ring:
+                    if len(point) < 2:
+                        raise ValueError('punto con menos de 2 coordenadas')
+                    points.append((float(point[0]), float(point[1])))
+                doc_rings.append(points)
+        except (TypeError, IndexError, ValueError, KeyError):
+            reasons[i] = 'malformed_coordinates'
+            continue
+
+        for points in doc_rings:
+            coords.extend(points)
+            ring_offsets.append(len(coords))
+            ring_doc.append(i)
+
+    if not ring_doc:
+        return reasons
+
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(ring_offsets, dtype=np.int64)
+    ring_doc = np.asarray(ring_doc, dtype=np.int64)
+    ring_sizes = np.diff(offsets)
+
+    too_few = ring_sizes < MIN_RING_VERTICES
+    starts = offsets[:-1]
+    ends = np.maximum(offsets[1:] - 1, starts)
+    not_closed = np.any(coords[starts] != coords[ends], axis=1) & ~too_few
+
+    doc_vertices = np.bincount(ring_doc, weights=ring_sizes, minlength=len(docs))
+
+    for mask, reason in ((too_few, 'too_few_vertices'), (not_closed, 'ring_not_closed')):
+        for i in np.unique(ring_doc[mask]):
+            if reasons[i] is None:
+                reasons[i] = reason
+    for i in np.flatnonzero(doc_vertices > MAX_VERTICES):
+        if reasons[i] is None:
+            reasons[i] = 'too_many_vertices'
+
+    return reasons
+
+
+def validity_reason_category(reason):
+    """'Self-intersection[-75.1 2.3]' -> 'Self-intersection'"""
+    return reason.split('[', 1)[0].strip()
+
+
+def audit_batch(docs, area_field, transformer):
+    """
+    Audita un lote de documentos
+
+    Returns:
+        list: Tuplas (_id, motivo) de los documentos con problemas
+    """
+    reasons = structural_reasons(docs)
+
+    ok = np.array([r is None for r in reasons])
+    if ok.any():
+        subset = [doc for doc, keep in zip(docs, ok) if keep]
+        idx = np.flatnonzero(ok)
+        geoms = polygons_from_docs(subset)
+
+        valid = shapely.is_valid(geoms)
+        for k in np.flatnonzero(~valid):
+            reason = shapely.is_valid_reason(geoms[k]) if geoms[k] is not None else 'missing_geometry'
+            reasons[idx[k]] = validity_reason_category(reason)
+
+        # Área sanity solo sobre geometrías válidas
+        if valid.any():
+            area = shapely.area(project_geometries(geoms[valid], transformer))
+            valid_idx = idx[valid]
+            stored = np.array([
+                (subset[k].get('properties') or {}).get(area_field.split('.')[-1], np.nan)
+                for k in np.flatnonzero(valid)
+            ], dtype=np.float64)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mismatch = np.abs(area - stored) / stored > AREA_MISMATCH_TOLERANCE
+
+            for k in np.flatnonzero(area < MIN_AREA_M2):
+                reasons[valid_idx[k]] = 'area_too_small'
+            for k in np.flatnonzero(area > MAX_AREA_M2):
+                reasons[valid_idx[k]] = 'area_too_large'
+            for k in np.flatnonzero(mismatch & (area >= MIN_AREA_M2) & (area <= MAX_AREA_M2)):
+                reasons[valid_idx[k]] = 'area_mismatch'
+
+    return [(doc['_id'], reason) for doc, reason in zip(docs, reasons) if reason is not None]
+
+
+def audit_id_range(collection_name, id_range, area_field, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Worker: audita un rango de _id
+
+    Returns:
+        dict: checked, reasons (Counter), offending [(_id str, motivo)]
+    """
+    db = get_database()
+    collection = db[collection_name]
+    transformer = get_transformer()
+
+    checked = 0
+    offending = []
+
+    cursor = collection.find(
+        id_range_query(id_range),
+        {'geometry': 1, area_field: 1}
+    ).sort('_id', 1).batch_size(batch_size)
+
+    for batch in iter_batches(cursor, batch_size):
+        offending.extend((str(_id), reason) for _id, reason in audit_batch(batch, area_field, transformer))
+        checked += len(batch)
+
+    return {
+        'checked': checked,
+        'reasons': Counter(reason for _, reason in offending),
+        'offending': offending
+    }
+
+
+def audit_collection(collection_name, num_workers=None, batch_size=DEFAULT_BATCH_SIZE, output_dir=None):
+    """
+    Audita todas las geometrías de una colección en paralelo
+
+    Args:
+        collection_name (str): 'microsoft_buildings' o 'google_buildings'
+        num_workers (int, optional): Procesos paralelos
+        batch_size (int): Documentos por lote vectorizado
+        output_dir (Path, optional): Directorio de reportes
+
+    Returns:
+        dict: Resumen (también escrito en JSON)
+    """
+    dataset = collection_name.replace('_buildings', '')
+    area_field = AREA_FIELDS.get(dataset, 'properties.area_m2')
+    output_dir = Path(output_dir or RESULTS_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    logger.info("=" * 70)
+    logger.info(f"AUDITORÍA DE GEOMETRÍAS: {collection_name}")
+    logger.info("=" * 70)
+    start = time.perf_counter()
+
+    results = run_partitioned(
+        audit_id_range,
+        collection_name,
+        num_workers=num_workers,
+        area_field=area_field,
+        batch_size=batch_size
+    )
+
+    checked = sum(r['checked'] for r in results)
+    reasons = Counter()
+    offending = []
+    for r in results:
+        reasons.update(r['reasons'])
+        offending.extend(r['offending'])
+    offending.sort()
+
+    summary = {
+        'collection': collection_name,
+        'checked': checked,
+        'offending': len(offending),
+        'offending_pct': round(100 * len(offending) / checked, 4) if checked else 0.0,
+        'by_reason': dict(reasons.most_common()),
+        'thresholds': {
+            'min_ring_vertices': MIN_RING_VERTICES,
+            'max_vertices': MAX_VERTICES,
+            'min_area_m2': MIN_AREA_M2,
+            'max_area_m2': MAX_AREA_M2,
+            'area_mismatch_tolerance': AREA_MISMATCH_TOLERANCE
+        },
+        'elapsed_seconds': round(time.perf_counter() - start, 1),
+        'timestamp': datetime.now().isoformat()
+    }
+
+    summary_path = output_dir / f'geometry_audit_{collection_name}.json'
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    ids_path = output_dir / f'geometry_audit_{collection_name}.csv'
+    with open(ids_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['_id', 'reason'])
+        writer.writerows(offending)
+
+    logger.info(f"Geometrías revisadas: {checked:,}")
+    logger.info(f"Con problemas: {len(offending):,} ({summary['offending_pct']}%)")
+    for reason, count in reasons.most_common():
+        logger.info(f"  {reason}: {count:,}")
+    logger.info(f"Tiempo: {summary['elapsed_seconds']} s")
+    logger.info(f"Resumen: {summary_path}")
+    logger.info(f"_id con problemas: {ids_path}")
+
+    return summary
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='Auditoría de validez de geometrías')
+    parser.add_argument(
+        '--collection',
+        nargs='+',
+        default=['microsoft_buildings'],
+        help='Colecciones a auditar (default: microsoft_buildings)'
+    )
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Documentos por lote')
+    args = parser.parse_args()
+
+    for collection_name in args.collection:
+        audit_collection(collection_name, num_workers=args.workers, batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,12 +6,27 @@ import csv
 from pathlib import Path
 from pymongo import MongoClient
 
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.analysis.confidence_histogram import (
+    confidence_histogram_facet, cumulative_histogram, value_at_threshold
+)
+
 DB_NAME = "pdet_solar_analysis"
 MUNI_COLL = "pdet_municipalities"
 MS_COLL = "microsoft_buildings"
 GOOGLE_COLL = "google_buildings"
 CSV_OUT = Path(__file__).parent.parent / "results" / "conteos_edificios_por_muni.csv"
 CSV_OUT.parent.mkdir(parents=True, exist_ok=True)
+# Umbral reportado en el CSV; el histograma permite consultar cualquier otro
+GOOGLE_MIN_CONFIDENCE = 0.80
+
+def google_confidence_histogram(gg, geom):
+    """Histograma acumulado de confianza de Google en una sola agregación"""
+    pipeline = [{"$match": {"geometry": {"$geoWithin": {"$geometry": geom}}}}]
+    pipeline += confidence_histogram_facet("$properties.area_in_meters")
+    return cumulative_histogram(list(gg.aggregate(pipeline, allowDiskUse=True)))
 
 def spatial_join_counts():
     client = MongoClient()
@@ -29,8 +44,9 @@ def spatial_join_counts():
             print(f"[!] Municipio {code} sin geom, skip")
             continue
         ms_count = ms.count_documents({"geometry": {"$geoWithin": {"$geometry": geom}}})
-        ggl_count = gg.count_documents({"geometry": {"$geoWithin": {"$geometry": geom}}, "properties.confidence": {"$gte": 0.80}})
-        print(f"{code} ({name}): MS={ms_count} GOOGLE>0.8={ggl_count}")
+        ggl_hist = google_confidence_histogram(gg, geom)
+        ggl_count = value_at_threshold(ggl_hist, GOOGLE_MIN_CONFIDENCE)
+        print(f"{code} ({name}): MS={ms_count} GOOGLE>={GOOGLE_MIN_CONFIDENCE}={ggl_count}")
         rows.append((code, name, ms_count, ggl_count))
     with open(CSV_OUT, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
@@ -2,6 +2,8 @@
 Script de validación para Microsoft Building Footprints
 
 Verifica la integridad de la carga y genera estadísticas finales.
+Los chequeos de campos, áreas y geometrías salen de un solo recorrido
+(src/validation/validation_engine.py).
 """
 
 import sys
@@ -11,6 +13,7 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from src.database.connection import get_database
+from src.validation.validation_engine import collection_profile, REQUIRED_FIELDS
 
 
 def validate_microsoft_buildings():
@@ -23,10 +26,14 @@ def validate_microsoft_buildings():
     db = get_database()
     collection = db['microsoft_buildings']
 
+    # Perfil completo en un solo recorrido (campos, áreas, geometrías)
+    print("\nCalculando perfil de validación (un solo recorrido, puede tomar 1-2 minutos)...")
+    profile = collection_profile(collection, required_fields=REQUIRED_FIELDS)
+
     # 1. Conteo de documentos
     print("\n1. CONTEO DE DOCUMENTOS")
     print("-"*80)
-    count = collection.count_documents({})
+    count = profile['total']
     print(f"Total de edificaciones: {count:,}")
     expected = 6_083_821
     if count == expected:
@@ -61,27 +68,12 @@ def validate_microsoft_buildings():
     # 3. Estadísticas de áreas
     print("\n3. ESTADÍSTICAS DE ÁREAS")
     print("-"*80)
-    pipeline = [
-        {
-            '$group': {
-                '_id': None,
-                'avg_area': {'$avg': '$properties.area_m2'},
-                'min_area': {'$min': '$properties.area_m2'},
-                'max_area': {'$max': '$properties.area_m2'},
-                'total_area_m2': {'$sum': '$properties.area_m2'}
-            }
-        }
-    ]
-
-    print("Calculando estadísticas (puede tomar 1-2 minutos)...")
-    result = list(collection.aggregate(pipeline))
-
-    if result:
-        stats = result[0]
-        print(f"\nÁrea promedio: {stats['avg_area']:.2f} m²")
-        print(f"Área mínima: {stats['min_area']:.2f} m²")
-        print(f"Área máxima: {stats['max_area']:.2f} m²")
-        print(f"Área total: {stats['total_area_m2']/1_000_000:.2f} km²")
+    stats = profile['area']
+    if stats['count']:
+        print(f"\nÁrea promedio: {stats['avg']:.2f} m²")
+        print(f"Área mínima: {stats['min']:.2f} m²")
+        print(f"Área máxima: {stats['max']:.2f} m²")
+        print(f"Área total: {stats['sum']/1_000_000:.2f} km²")
 
     # 4. Muestra de documentos
     print("\n4. MUESTRA DE DOCUMENTOS")
@@ -101,17 +93,10 @@ def validate_microsoft_buildings():
     print("\n5. VALIDACIÓN DE CAMPOS REQUERIDOS")
     print("-"*80)
 
-    fields_to_check = [
-        'geometry',
-        'properties.area_m2',
-        'data_source',
-        'dataset',
-        'created_at'
-    ]
-
-    for field in fields_to_check:
-        missing = collection.count_documents({field: {'$exists': False}})
-        null_count = collection.count_documents({field: None})
+    for field in REQUIRED_FIELDS:
+        missing = profile['fields'][field]['missing']
+        # Igual que count_documents({field: None}): nulos + faltantes
+        null_count = profile['fields'][field]['null'] + missing
 
         if missing == 0 and null_count == 0:
             print(f"✓ {field}: OK (sin valores faltantes o nulos)")
@@ -123,18 +108,18 @@ def validate_microsoft_buildings():
     print("-"*80)
 
     # Tipos de geometría
-    geom_types = collection.distinct("geometry.type")
+    geom_types = profile['geometry_types']
     print(f"Tipos de geometría: {geom_types}")
 
     # Geometrías sin coordenadas
-    no_coords = collection.count_documents({"geometry.coordinates": {"$exists": False}})
+    no_coords = profile['without_coordinates']
     print(f"Geometrías sin coordenadas: {no_coords}")
 
     if no_coords == 0:
         print("✓ Todas las geometrías tienen coordenadas")
 
     # Áreas <= 0
-    invalid_area = collection.count_documents({"properties.area_m2": {"$lte": 0}})
+    invalid_area = stats['non_positive']
     print(f"Áreas <= 0: {invalid_area}")
 
     if invalid_area == 0:
@@ -0,0 +1,159 @@
+"""
+Motor de validación en una sola pasada
+
+Los scripts de validación hacían un count_documents por cada chequeo
+($exists por campo, nulos, geometry.type, áreas, bbox de Colombia...),
+cada uno un recorrido completo de ~6M documentos. Aquí todos los
+chequeos se expresan como acumuladores $sum/$cond, $min/$max y
+$addToSet de un único $group: un solo recorrido de la colección.
+
+Uso:
+    from src.validation.validation_engine import collection_profile
+    profile = collection_profile(db.microsoft_buildings)
+    profile['fields']['created_at']['missing']
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ['geometry', 'properties.area_m2', 'data_source', 'dataset', 'created_at']
+
+# Bbox amplio de Colombia usado en la validación del Entregable 3
+COLOMBIA_VALIDATION_BBOX = {
+    'min_lon': -82.0, 'max_lon': -66.0,
+    'min_lat': -5.0, 'max_lat': 14.0
+}
+
+NUMERIC_TYPES = ['double', 'int', 'long', 'decimal']
+
+
+def _count_if(condition):
+    return {'$sum': {'$cond': [condition, 1, 0]}}
+
+
+def _first_vertex():
+    """Primer vértice [lon, lat] del primer anillo (Polygon o MultiPolygon)"""
+    first_ring = {'$arrayElemAt': ['$geometry.coordinates', 0]}
+    return {
+        '$cond': [
+            {'$eq': ['$geometry.type', 'MultiPolygon']},
+            {'$arrayElemAt': [{'$arrayElemAt': [first_ring, 0]}, 0]},
+            {'$arrayElemAt': [first_ring, 0]}
+        ]
+    }
+
+
+def profile_pipeline(required_fields=REQUIRED_FIELDS, area_field='properties.area_m2',
+                     bbox=COLOMBIA_VALIDATION_BBOX):
+    """
+    Pipeline de un solo $group con todos los chequeos
+
+    Args:
+        required_fields (list): Campos cuyos faltantes/nulos se cuentan
+        area_field (str): Campo de área
+        bbox (dict): min_lon, max_lon, min_lat, max_lat
+
+    Returns:
+        list: Stages de agregación
+    """
+    area = f'${area_field}'
+    area_is_number = {'$in': [{'$type': area}, NUMERIC_TYPES]}
+    area_positive = {'$and': [area_is_number, {'$gt': [area, 0]}]}
+
+    group = {
+        '_id': None,
+        'total': {'$sum': 1},
+        'geometry_types': {'$addToSet': '$geometry.type'},
+        'polygons': _count_if({'$eq': ['$geometry.type', 'Polygon']}),
+        'without_coordinates': _count_if({'$eq': [{'$type': '$geometry.coordinates'}, 'missing']}),
+        'data_sources': {'$addToSet': '$data_source'},
+        'area_count': _count_if(area_is_number),
+        'area_sum': {'$sum': {'$cond': [area_is_number, area, 0]}},
+        'area_min': {'$min': {'$cond': [area_is_number, area, None]}},
+        'area_max': {'$max': {'$cond': [area_is_number, area, None]}},
+        'area_positive_count': _count_if(area_positive),
+        'area_positive_sum': {'$sum': {'$cond': [area_positive, area, 0]}},
+        'area_positive_min': {'$min': {'$cond': [area_positive, area, None]}},
+        'area_non_positive': _count_if({'$and': [area_is_number, {'$lte': [area, 0]}]}),
+        'outside_bbox': _count_if({
+            '$let': {
+                'vars': {'v': _first_vertex()},
+                'in': {
+                    '$and': [
+                        {'$isArray': '$$v'},
+                        {'$or': [
+                            {'$lt': [{'$arrayElemAt': ['$$v', 0]}, bbox['min_lon']]},
+                            {'$gt': [{'$arrayElemAt': ['$$v', 0]}, bbox['max_lon']]},
+                            {'$lt': [{'$arrayElemAt': ['$$v', 1]}, bbox['min_lat']]},
+                            {'$gt': [{'$arrayElemAt': ['$$v', 1]}, bbox['max_lat']]}
+                        ]}
+                    ]
+                }
+            }
+        })
+    }
+
+    for i, field in enumerate(required_fields):
+        field_type = {'$type': f'${field}'}
+        group[f'missing_{i}'] = _count_if({'$eq': [field_type, 'missing']})
+        group[f'null_{i}'] = _count_if({'$eq': [field_type, 'null']})
+
+    return [{'$group': group}]
+
+
+def collection_profile(collection, required_fields=REQUIRED_FIELDS, area_field='properties.area_m2',
+                       bbox=COLOMBIA_VALIDATION_BBOX):
+    """
+    Ejecuta todos los chequeos de validación en un solo recorrido
+
+    Args:
+        collection: Colección MongoDB
+        required_fields (list): Campos requeridos
+        area_field (str): Campo de área
+        bbox (dict): Bbox de referencia para coordenadas
+
+    Returns:
+        dict: total, fields {campo: {missing, null}}, geometry_types,
+        polygons, without_coordinates, data_sources, area {...},
+        outside_bbox, elapsed_seconds
+    """
+    start = time.perf_counter()
+    result = list(collection.aggregate(profile_pipeline(required_fields, area_field, bbox)))
+    raw = result[0] if result else {}
+
+    total = raw.get('total', 0)
+    area_count = raw.get('area_count', 0)
+    positive_count = raw.get('area_positive_count', 0)
+
+    profile = {
+        'total': total,
+        'fields': {
+            field: {'missing': raw.get(f'missing_{i}', 0), 'null': raw.get(f'null_{i}', 0)}
+            for i, field in enumerate(required_fields)
+        },
+        'geometry_types': sorted(t for t in raw.get('geometry_types', []) if t is not None),
+        'polygons': raw.get('polygons', 0),
+        'without_coordinates': raw.get('without_coordinates', 0),
+        'data_sources': sorted(s for s in raw.get('data_sources', []) if s is not None),
+        'area': {
+            'count': area_count,
+            'sum': raw.get('area_sum', 0),
+            'avg': raw.get('area_sum', 0) / area_count if area_count else None,
+            'min': raw.get('area_min'),
+            'max': raw.get('area_max'),
+            'positive_count': positive_count,
+            'positive_avg': raw.get('area_positive_sum', 0) / positive_count if positive_count else None,
+            'positive_min': raw.get('area_positive_min'),
+            'non_positive': raw.get('area_non_positive', 0)
+        },
+        'outside_bbox': raw.get('outside_bbox', 0),
+        'elapsed_seconds': round(time.perf_counter() - start, 1)
+    }
+
+    logger.info(f"Perfil de {collection.name}: {total:,} documentos en {profile['elapsed_seconds']} s")
+    return profile
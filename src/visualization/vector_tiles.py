@@ -0,0 +1,503 @@
+"""
+Pirámide de teselas vectoriales (MVT) de huellas de edificaciones
+
+Los mapas de 05_generate_visualizations.py solo muestran agregados por
+municipio. Esta etapa genera teselas Mapbox Vector Tile de las huellas
+para un mapa interactivo a nivel de edificación:
+
+1. Lee las huellas de MongoDB una sola vez, las proyecta a Web Mercator y
+   las guarda en un spool SQLite indexado por tesela del zoom máximo
+2. Para cada zoom, workers paralelos recortan (con margen), simplifican
+   a ~1 píxel, descartan techos menores a un píxel y codifican la tesela
+3. Escribe un archivo MBTiles (SQLite) o una pirámide de directorios
+   {z}/{x}/{y}.pbf con un visor HTML local (MapLibre GL)
+
+Requiere el paquete opcional mapbox-vector-tile.
+
+Uso:
+    python src/visualization/vector_tiles.py --format dir
+    cd outputs/tiles/buildings && python -m http.server 8000
+    # abrir http://localhost:8000/viewer.html
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import sys
+import os
+import gzip
+import json
+import sqlite3
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import logging
+
+import numpy as np
+import shapely
+from tqdm import tqdm
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.database.connection import get_database
+from src.database.partitioning import iter_batches
+from src.utils.geometry_arrays import polygons_from_docs, project_geometries, get_transformer, WGS84
+
+try:
+    import mapbox_vector_tile
+except ImportError:
+    mapbox_vector_tile = None
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+WEB_MERCATOR = 'EPSG:3857'
+ORIGIN_SHIFT = 20037508.342789244    # Mitad del ancho del mundo en Web Mercator (m)
+
+DEFAULT_MIN_ZOOM = 12
+DEFAULT_MAX_ZOOM = 16
+TILE_EXTENT = 4096                   # Resolución interna de la tesela MVT
+TILE_BUFFER = 64                     # Margen de recorte (unidades de extent)
+TILES_PER_JOB = 64
+DEFAULT_BATCH_SIZE = 20000
+MBTILES_LIST_KEYS = ('bounds', 'center')   # Metadatos con listas separadas por comas
+
+OUTPUT_DIR = PROJECT_ROOT / 'deliverables' / 'deliverable_4' / 'outputs' / 'tiles'
+
+# Propiedades que viajan en las teselas (por dataset)
+TILE_PROPERTIES = {
+    'microsoft': ['area_m2', 'useful_area_m2', 'annual_kwh'],
+    'google': ['area_in_meters', 'confidence', 'useful_area_m2', 'annual_kwh']
+}
+
+
+def tile_size_m(zoom):
+    """Ancho de una tesela en metros Web Mercator"""
+    return 2 * ORIGIN_SHIFT / (1 << zoom)
+
+
+def tile_bounds(zoom, x, y):
+    """Límites (minx, miny, maxx, maxy) en Web Mercator de una tesela XYZ"""
+    size = tile_size_m(zoom)
+    minx = -ORIGIN_SHIFT + x * size
+    maxy = ORIGIN_SHIFT - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def tile_ranges(bounds, zoom):
+    """
+    Rango de teselas XYZ que cubre cada caja
+
+    Args:
+        bounds (np.ndarray): (n, 4) minx, miny, maxx, maxy en Web Mercator
+        zoom (int): Nivel de zoom
+
+    Returns:
+        tuple: Arreglos x0, y0, x1, y1 (inclusive)
+    """
+    size = tile_size_m(zoom)
+    last = (1 << zoom) - 1
+    x0 = np.clip(np.floor((bounds[:, 0] + ORIGIN_SHIFT) / size), 0, last).astype(np.int64)
+    x1 = np.clip(np.floor((bounds[:, 2] + ORIGIN_SHIFT) / size), 0, last).astype(np.int64)
+    y0 = np.clip(np.floor((ORIGIN_SHIFT - bounds[:, 3]) / size), 0, last).astype(np.int64)
+    y1 = np.clip(np.floor((ORIGIN_SHIFT - bounds[:, 1]) / size), 0, last).astype(np.int64)
+    return x0, y0, x1, y1
+
+
+def create_spool(spool_path):
+    """Crea el spool SQLite: features + índice por tesela del zoom máximo"""
+    if spool_path.exists():
+        spool_path.unlink()
+    conn = sqlite3.connect(spool_path)
+    conn.executescript("""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        CREATE TABLE features (id INTEGER PRIMARY KEY, layer TEXT, wkb BLOB, props TEXT);
+        CREATE TABLE tile_index (x INTEGER, y INTEGER, id INTEGER);
+    """)
+    return conn
+
+
+def spool_footprints(db, conn, datasets, max_zoom, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Lee las huellas de MongoDB una vez y las guarda proyectadas en el spool
+
+    Args:
+        db: Conexión a MongoDB
+        conn: Conexión SQLite del spool
+        datasets (list): 'microsoft' y/o 'google'
+        max_zoom (int): Zoom máximo (nivel del índice de teselas)
+        batch_size (int): Documentos por lote
+
+    Returns:
+        tuple: (features guardados, bbox WGS84 [minx, miny, maxx, maxy])
+    """
+    transformer = get_transformer(WGS84, WEB_MERCATOR)
+    next_id = 0
+    total_bounds = None
+
+    for dataset in datasets:
+        fields = TILE_PROPERTIES[dataset]
+        projection = {'geometry': 1, **{f'properties.{f}': 1 for f in fields}}
+        cursor = db[f'{dataset}_buildings'].find({}, projection).batch_size(batch_size)
+        total = db[f'{dataset}_buildings'].estimated_document_count()
+
+        with tqdm(total=total, desc=f"Spool {dataset}", unit=' edif') as pbar:
+            for batch in iter_batches(cursor, batch_size):
+                geoms = polygons_from_docs(batch)
+                valid = ~shapely.is_missing(geoms)
+
+                if valid.any():
+                    b = shapely.total_bounds(geoms[valid])
+                    total_bounds = b if total_bounds is None else np.r_[
+                        np.minimum(total_bounds[:2], b[:2]), np.maximum(total_bounds[2:], b[2:])
+                    ]
+
+                geoms_m = project_geometries(geoms, transformer)
+                bounds = shapely.bounds(geoms_m)
+                x0, y0, x1, y1 = tile_ranges(np.nan_to_num(bounds), max_zoom)
+
+                features, index = [], []
+                for i, doc in enumerate(batch):
+                    if not valid[i]:
+                        continue
+                    props = doc.get('properties', {})
+                    features.append((
+                        next_id,
+                        dataset,
+                        shapely.to_wkb(geoms_m[i]),
+                        json.dumps({f: props[f] for f in fields if props.get(f) is not None})
+                    ))
+                    for x in range(x0[i], x1[i] + 1):
+                        for y in range(y0[i], y1[i] + 1):
+                            index.append((x, y, next_id))
+                    next_id += 1
+
+                conn.executemany("INSERT INTO features VALUES (?, ?, ?, ?)", features)
+                conn.executemany("INSERT INTO tile_index VALUES (?, ?, ?)", index)
+                pbar.update(len(batch))
+
+    conn.execute("CREATE INDEX idx_tile ON tile_index (x, y)")
+    conn.commit()
+
+    if total_bounds is None:
+        total_bounds = np.zeros(4)
+    return next_id, [round(float(v), 6) for v in total_bounds]
+
+
+def encode_tile(rows, zoom, x, y):
+    """
+    Recorta, simplifica y codifica los features de una tesela
+
+    Args:
+        rows (list): Filas (layer, wkb, props) del spool
+        zoom, x, y (int): Tesela XYZ
+
+    Returns:
+        bytes: Tesela MVT (None si queda vacía)
+    """
+    bounds = tile_bounds(zoom, x, y)
+    pixel = tile_size_m(zoom) / TILE_EXTENT
+    margin = TILE_BUFFER * pixel
+    clip_box = (bounds[0] - margin, bounds[1] - margin, bounds[2] + margin, bounds[3] + margin)
+
+    layers = {}
+    geoms = shapely.from_wkb([r[1] for r in rows])
+    geoms = shapely.clip_by_rect(geoms, *clip_box)
+    geoms = shapely.simplify(geoms, pixel, preserve_topology=True)
+    keep = shapely.area(geoms) >= pixel * pixel
+
+    for (layer, _, props), geom, ok in zip(rows, geoms, keep):
+        if ok:
+            layers.setdefault(layer, []).append({'geometry': geom, 'properties': json.loads(props)})
+
+    if not layers:
+        return None
+
+    return mapbox_vector_tile.encode(
+        [{'name': name, 'features': features} for name, features in layers.items()],
+        default_options={'quantize_bounds': bounds, 'extents': TILE_EXTENT}
+    )
+
+
+def build_tiles(spool_path, tiles, max_zoom):
+    """
+    Worker: genera un grupo de teselas leyendo el spool
+
+    Args:
+        spool_path (str): Ruta del spool SQLite
+        tiles (list): Teselas (z, x, y)
+        max_zoom (int): Zoom del índice del spool
+
+    Returns:
+        list: (z, x, y, datos MVT)
+    """
+    conn = sqlite3.connect(f'file:{spool_path}?mode=ro', uri=True)
+    results = []
+
+    for zoom, x, y in tiles:
+        shift = max_zoom - zoom
+        rows = conn.execute(
+            """
+            SELECT f.layer, f.wkb, f.props FROM features f
+            WHERE f.id IN (
+                SELECT DISTINCT id FROM tile_index
+                WHERE x BETWEEN ? AND ? AND y BETWEEN ? AND ?
+            )
+            """,
+            (x << shift, ((x + 1) << shift) - 1, y << shift, ((y + 1) << shift) - 1)
+        ).fetchall()
+
+        data = encode_tile(rows, zoom, x, y) if rows else None
+        if data:
+            results.append((zoom, x, y, data))
+
+    conn.close()
+    return results
+
+
+class MBTilesWriter:
+    """Escritor MBTiles 1.3 (teselas pbf comprimidas con gzip)"""
+
+    def __init__(self, path):
+        if path.exists():
+            path.unlink()
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE metadata (name TEXT, value TEXT);
+            CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER,
+                                tile_row INTEGER, tile_data BLOB);
+            CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+        """)
+
+    def write(self, zoom, x, y, data):
+        # MBTiles usa filas TMS (origen abajo)
+        tms_y = (1 << zoom) - 1 - y
+        self.conn.execute(
+            "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)",
+            (zoom, x, tms_y, gzip.compress(data))
+        )
+
+    @staticmethod
+    def _metadata_value(key, value):
+        # MBTiles 1.3: bounds y center son listas separadas por comas
+        # ("minx,miny,maxx,maxy", "lon,lat,zoom"), no arreglos JSON
+        if key in MBTILES_LIST_KEYS:
+            return ','.join(str(v) for v in value)
+        return value if isinstance(value, str) else json.dumps(value)
+
+    def close(self, metadata):
+        self.conn.executemany(
+            "INSERT INTO metadata VALUES (?, ?)",
+            [(k, self._metadata_value(k, v)) for k, v in metadata.items()]
+        )
+        self.conn.commit()
+        self.conn.close()
+
+
+class DirectoryWriter:
+    """Escritor de pirámide {z}/{x}/{y}.pbf (sin comprimir, para http.server)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def write(self, zoom, x, y, data):
+        tile_path = self.path / str(zoom) / str(x)
+        tile_path.mkdir(parents=True, exist_ok=True)
+        (tile_path / f'{y}.pbf').write_bytes(data)
+
+    def close(self, metadata):
+        with open(self.path / 'metadata.json', 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        write_viewer(self.path, metadata)
+
+
+def write_viewer(path, metadata):
+    """Visor HTML local (MapLibre GL) para la pirámide de directorios"""
+    bounds = metadata['bounds']
+    center = [(bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2]
+    colors = {'microsoft': '#2b6cb0', 'google': '#dd6b20'}
+    layers = [
+        {
+            'id': name,
+            'type': 'fill',
+            'source': 'buildings',
+            'source-layer': name,
+            'paint': {'fill-color': colors.get(name, '#555555'), 'fill-opacity': 0.6}
+        }
+        for name in metadata['layers']
+    ]
+    style = {
+        'version': 8,
+        'sources': {
+            'osm': {
+                'type': 'raster',
+                'tiles': ['https://tile.openstreetmap.org/{z}/{x}/{y}.png'],
+                'tileSize': 256,
+                'attribution': '© OpenStreetMap'
+            },
+            'buildings': {
+                'type': 'vector',
+                'tiles': [],
+                'minzoom': metadata['minzoom'],
+                'maxzoom': metadata['maxzoom']
+            }
+        },
+        'layers': [{'id': 'osm', 'type': 'raster', 'source': 'osm'}] + layers
+    }
+
+    html = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{metadata['name']}</title>
+<link href="https://unpkg.com/maplibre-gl@4/dist/maplibre-gl.css" rel="stylesheet">
+<script src="https://unpkg.com/maplibre-gl@4/dist/maplibre-gl.js"></script>
+<style>body {{ margin: 0; }} #map {{ position: absolute; top: 0; bottom: 0; width: 100%; }}</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+const style = {json.dumps(style)};
+const origin = window.location.href.replace(/\\/[^\\/]*$/, '');
+style.sources.buildings.tiles = [origin + '/{{z}}/{{x}}/{{y}}.pbf'];
+const map = new maplibregl.Map({{container: 'map', style: style, center: {json.dumps(center)}, zoom: {metadata['minzoom']}}});
+map.addControl(new maplibregl.NavigationControl());
+{json.dumps(list(metadata['layers']))}.forEach(layer => {{
+  map.on('click', layer, e => {{
+    const props = e.features[0].properties;
+    const rows = Object.entries(props).map(([k, v]) => `<b>${{k}}</b>: ${{v}}`).join('<br>');
+    new maplibregl.Popup().setLngLat(e.lngLat).setHTML(`<b>${{layer}}</b><br>${{rows}}`).addTo(map);
+  }});
+}});
+</script>
+</body>
+</html>
+"""
+    with open(path / 'viewer.html', 'w', encoding='utf-8') as f:
+        f.write(html)
+
+
+def generate_tiles(db, datasets, output_path, fmt='mbtiles', min_zoom=DEFAULT_MIN_ZOOM,
+                   max_zoom=DEFAULT_MAX_ZOOM, num_workers=None):
+    """
+    Genera la pirámide de teselas vectoriales de edificaciones
+
+    Args:
+        db: Conexión a MongoDB
+        datasets (list): 'microsoft' y/o 'google'
+        output_path (Path): Archivo .mbtiles o directorio de salida
+        fmt (str): 'mbtiles' o 'dir'
+        min_zoom, max_zoom (int): Rango de zoom
+        num_workers (int, optional): Procesos paralelos
+
+    Returns:
+        int: Teselas escritas
+    """
+    if mapbox_vector_tile is None:
+        raise ImportError("Se requiere el paquete 'mapbox-vector-tile' (pip install mapbox-vector-tile)")
+
+    logger.info("=" * 70)
+    logger.info("TESELAS VECTORIALES DE EDIFICACIONES")
+    logger.info("=" * 70)
+    logger.info(f"Datasets: {', '.join(datasets)}")
+    logger.info(f"Zoom: {min_zoom} - {max_zoom}")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    spool_path = output_path.parent / f'{output_path.stem}_spool.sqlite'
+
+    # 1. Una sola pasada por MongoDB
+    conn = create_spool(spool_path)
+    count, bounds = spool_footprints(db, conn, datasets, max_zoom)
+    conn.close()
+    logger.info(f"Huellas en spool: {count:,}")
+
+    writer = MBTilesWriter(output_path) if fmt == 'mbtiles' else DirectoryWriter(output_path)
+    num_workers = num_workers or os.cpu_count()
+    written = 0
+
+    # 2. Teselas por zoom en paralelo
+    conn = sqlite3.connect(spool_path)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for zoom in range(min_zoom, max_zoom + 1):
+            shift = max_zoom - zoom
+            tiles = [
+                (zoom, x, y) for x, y in
+                conn.execute(f"SELECT DISTINCT x >> {shift}, y >> {shift} FROM tile_index")
+            ]
+            jobs = [
+                executor.submit(build_tiles, str(spool_path), tiles[i:i + TILES_PER_JOB], max_zoom)
+                for i in range(0, len(tiles), TILES_PER_JOB)
+            ]
+            for future in tqdm(as_completed(jobs), total=len(jobs), desc=f"Zoom {zoom}"):
+                for tile in future.result():
+                    writer.write(*tile)
+                    written += 1
+    conn.close()
+
+    writer.close({
+        'name': 'Edificaciones PDET',
+        'format': 'pbf',
+        'minzoom': min_zoom,
+        'maxzoom': max_zoom,
+        'bounds': bounds,
+        'center': [(bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2, min_zoom],
+        'layers': datasets,
+        'json': {'vector_layers': [
+            {'id': d, 'fields': {f: 'Number' for f in TILE_PROPERTIES[d]}} for d in datasets
+        ]}
+    })
+    spool_path.unlink()
+
+    logger.info(f"Teselas escritas: {written:,}")
+    logger.info(f"Salida: {output_path}")
+    logger.info("=" * 70)
+
+    return written
+
+
+def main():
+    """Función principal"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Teselas vectoriales (MVT) de edificaciones')
+    parser.add_argument('--dataset', nargs='+', default=['microsoft', 'google'],
+                        help='Datasets a incluir (default: microsoft google)')
+    parser.add_argument('--format', choices=['mbtiles', 'dir'], default='mbtiles',
+                        help='MBTiles (SQLite) o directorio {z}/{x}/{y}.pbf con visor HTML')
+    parser.add_argument('--min-zoom', type=int, default=DEFAULT_MIN_ZOOM)
+    parser.add_argument('--max-zoom', type=int, default=DEFAULT_MAX_ZOOM)
+    parser.add_argument('--workers', type=int, default=None, help='Procesos paralelos')
+    parser.add_argument('--output', type=str, default=None, help='Archivo o directorio de salida')
+
+    args = parser.parse_args()
+
+    if args.output:
+        output_path = Path(args.output)
+    elif args.format == 'mbtiles':
+        output_path = OUTPUT_DIR / 'buildings.mbtiles'
+    else:
+        output_path = OUTPUT_DIR / 'buildings'
+
+    db = get_database()
+    generate_tiles(
+        db,
+        args.dataset,
+        output_path,
+        fmt=args.format,
+        min_zoom=args.min_zoom,
+        max_zoom=args.max_zoom,
+        num_workers=args.workers
+    )
+
+    if args.format == 'dir':
+        logger.info(f"Visor: cd {output_path} && python -m http.server 8000")
+        logger.info("       http://localhost:8000/viewer.html")
+
+
+if __name__ == '__main__':
+    main()
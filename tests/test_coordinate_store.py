@@ -0,0 +1,32 @@
+"""
+Pruebas del almacén de coordenadas (src/utils/coordinate_store.py)
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import numpy as np
+import shapely
+
+from src.utils.coordinate_store import StoreWriter, CoordinateStore
+
+
+def test_missing_and_empty_geometries_have_no_parts(tmp_path):
+    writer = StoreWriter(tmp_path)
+    writer.append(np.array([None], dtype=object), ['a'], {})
+    writer.append(
+        np.array([shapely.box(0, 0, 1, 1), None, shapely.from_wkt('POLYGON EMPTY'), shapely.box(2, 2, 3, 3)]),
+        ['b', 'c', 'd', 'e'],
+        {}
+    )
+    meta = writer.close('test')
+
+    assert meta['buildings'] == 5
+    assert meta['empty_geometries'] == 3
+
+    store = CoordinateStore(tmp_path)
+    geoms = store.to_shapely()
+    assert list(shapely.is_empty(geoms)) == [True, False, True, True, False]
+    assert shapely.equals(geoms[1], shapely.multipolygons([shapely.box(0, 0, 1, 1)]))
+    assert np.isnan(store.bounds()[0]).all()
+    assert store.rings(2) == []
@@ -0,0 +1,25 @@
+"""
+Pruebas del hash canónico de huellas (src/preprocessing/footprint_dedup.py)
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import numpy as np
+import shapely
+
+from src.preprocessing.footprint_dedup import geometry_hashes
+
+
+def test_hash_tolerates_self_intersecting_footprints():
+    bow_tie = shapely.from_wkt('POLYGON ((0 0, 1 1, 1 0, 0 1, 0 0))')
+    square = shapely.box(0, 0, 1, 1)
+    # Mismo cuadrado con otro vértice inicial, orientación y ruido bajo la grilla
+    reordered = shapely.from_wkt('POLYGON ((1 1, 1.00000001 0, 0 0, 0 1, 1 1))')
+
+    hashes = geometry_hashes(np.array([bow_tie, square, reordered, None], dtype=object))
+
+    assert hashes[0] is not None
+    assert hashes[1] == hashes[2]
+    assert hashes[0] != hashes[1]
+    assert hashes[3] is None
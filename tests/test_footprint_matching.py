@@ -0,0 +1,39 @@
+"""
+Pruebas del emparejamiento de huellas (src/analysis/footprint_matching.py)
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import numpy as np
+
+from src.analysis.footprint_matching import best_partner
+
+
+def test_best_partner_takes_maximum_iou():
+    idx = np.array([0, 2, 0, 2, 0])
+    partner_idx = np.array([5, 6, 7, 8, 9])
+    iou = np.array([0.5, 0.9, 0.8, 0.3, 0.8])
+
+    best, best_iou = best_partner(4, idx, partner_idx, iou)
+
+    # Empate en 0.8 para el elemento 0: gana el primer par de la consulta
+    assert best.tolist() == [7, -1, 6, -1]
+    assert best_iou.tolist() == [0.8, 0.0, 0.9, 0.0]
+
+
+def test_best_partner_with_many_repeated_indices():
+    rng = np.random.default_rng(0)
+    idx = rng.integers(0, 50, 5000)
+    partner_idx = np.arange(5000)
+    iou = rng.random(5000)
+
+    best, best_iou = best_partner(60, idx, partner_idx, iou)
+
+    for i in range(60):
+        pairs = np.flatnonzero(idx == i)
+        if len(pairs):
+            assert best[i] == partner_idx[pairs[np.argmax(iou[pairs])]]
+            assert best_iou[i] == iou[pairs].max()
+        else:
+            assert best[i] == -1
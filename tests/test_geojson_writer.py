@@ -0,0 +1,43 @@
+"""
+Pruebas del escritor GeoJSON en streaming (src/utils/geojson_writer.py)
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import json
+
+import pytest
+
+from src.utils.geojson_writer import GeoJSONWriter
+
+FEATURE = {
+    'type': 'Feature',
+    'geometry': {'type': 'Point', 'coordinates': [-74.1234567891, 4.9876543219]},
+    'properties': {'id': 1}
+}
+
+
+def test_writes_feature_collection(tmp_path):
+    path = tmp_path / 'out.geojson'
+    with GeoJSONWriter(path, precision=6) as writer:
+        writer.write(FEATURE)
+        writer.write(FEATURE)
+
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert len(data['features']) == 2
+    assert data['features'][0]['geometry']['coordinates'] == [-74.123457, 4.987654]
+    assert not (tmp_path / 'out.geojson.tmp').exists()
+
+
+def test_failed_export_keeps_previous_file(tmp_path):
+    path = tmp_path / 'out.geojson'
+    path.write_text('anterior', encoding='utf-8')
+
+    with pytest.raises(RuntimeError):
+        with GeoJSONWriter(path) as writer:
+            writer.write(FEATURE)
+            raise RuntimeError('cursor interrumpido')
+
+    assert path.read_text(encoding='utf-8') == 'anterior'
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,33 @@
+"""
+Pruebas de conversión de geometrías (src/utils/geometry_arrays.py)
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import shapely
+
+from src.utils.geometry_arrays import polygons_from_docs
+
+SQUARE = [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+
+
+def polygon_doc(ring):
+    return {'geometry': {'type': 'Polygon', 'coordinates': [ring]}}
+
+
+def test_batch_with_3d_vertex():
+    docs = [
+        polygon_doc(SQUARE),
+        polygon_doc([[0, 0, 12.5], [2, 0, 12.5], [2, 2, 12.5], [0, 2, 12.5], [0, 0, 12.5]]),
+        polygon_doc([[0, 0], [3, 0, 1.0], [3, 3], [0, 3], [0, 0]]),
+        polygon_doc([[0, 0], [1], [1, 1], [0, 0]]),
+        polygon_doc([[0, 0], 5, [1, 1], [0, 0]]),
+        {'geometry': None},
+        polygon_doc(SQUARE)
+    ]
+    geoms = polygons_from_docs(docs)
+
+    assert shapely.area(geoms[[0, 1, 2, 6]]).tolist() == [1.0, 4.0, 9.0, 1.0]
+    assert not shapely.has_z(geoms[[0, 1, 2, 6]]).any()
+    assert geoms[3] is None and geoms[4] is None and geoms[5] is None
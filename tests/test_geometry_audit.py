@@ -0,0 +1,41 @@
+"""
+Pruebas de los chequeos estructurales (src/validation/geometry_audit.py)
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+from src.validation.geometry_audit import structural_reasons
+
+SQUARE = [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+
+
+def polygon(*rings):
+    return {'geometry': {'type': 'Polygon', 'coordinates': list(rings)}}
+
+
+def test_malformed_document_does_not_leak_into_next():
+    docs = [
+        polygon(SQUARE),
+        polygon(SQUARE, [[0, 0], [1, 0], 5]),     # anillo roto a medias
+        polygon(SQUARE),
+        polygon([[0, 0], [1], [1, 1], [0, 0]]),   # punto con una coordenada
+        polygon(SQUARE)
+    ]
+
+    assert structural_reasons(docs) == [
+        None, 'malformed_coordinates', None, 'malformed_coordinates', None
+    ]
+
+
+def test_structure_reasons():
+    docs = [
+        polygon([[0, 0], [1, 0], [0, 0]]),
+        polygon([[0, 0], [1, 0], [1, 1], [0, 1]]),
+        {'geometry': {'type': 'Point', 'coordinates': [0, 0]}},
+        {'geometry': None}
+    ]
+
+    assert structural_reasons(docs) == [
+        'too_few_vertices', 'ring_not_closed', 'unsupported_type', 'missing_geometry'
+    ]
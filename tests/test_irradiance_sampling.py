@@ -0,0 +1,83 @@
+"""
+Pruebas del muestreo por bloques (src/analysis/irradiance_sampling.py)
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from src.analysis.irradiance_sampling import BlockSampler
+from src.utils.geometry_arrays import get_transformer, WGS84
+
+NODATA = -9999.0
+
+
+def write_raster(path, crs, transform, width=70, height=50):
+    """GeoTIFF con bloques de 16x16 (bordes parciales) y una franja nodata"""
+    data = np.arange(width * height, dtype=np.float32).reshape(height, width)
+    data[10:13, :] = NODATA
+    with rasterio.open(
+        path, 'w', driver='GTiff', width=width, height=height, count=1, dtype='float32',
+        crs=crs, transform=transform, nodata=NODATA, tiled=True, blockxsize=16, blockysize=16
+    ) as dst:
+        dst.write(data, 1)
+
+
+def reference_values(path, xy):
+    """Valores esperados con rasterio.sample (NaN fuera del raster o nodata)"""
+    with rasterio.open(path) as src:
+        left, bottom, right, top = src.bounds
+        values = np.array([v[0] for v in src.sample(xy)], dtype=np.float64)
+    outside = (xy[:, 0] < left) | (xy[:, 0] >= right) | (xy[:, 1] <= bottom) | (xy[:, 1] > top)
+    values[outside | (values == NODATA)] = np.nan
+    return values
+
+
+def random_lonlat(rng, n, bounds, margin):
+    left, bottom, right, top = bounds
+    lon = rng.uniform(left - margin, right + margin, n)
+    lat = rng.uniform(bottom - margin, top + margin, n)
+    return np.column_stack([lon, lat])
+
+
+def test_block_sampler_matches_rasterio_sample(tmp_path):
+    path = tmp_path / 'ghi.tif'
+    write_raster(path, 'EPSG:4326', from_origin(-75.0, 5.0, 0.01, 0.01))
+
+    rng = np.random.default_rng(0)
+    lonlat = random_lonlat(rng, 2000, (-75.0, 4.5, -74.3, 5.0), margin=0.05)
+
+    sampler = BlockSampler(str(path), cache_blocks=4)
+    try:
+        values = sampler.sample(lonlat)
+        assert sampler.stats['blocks_read'] <= 5 * 4
+    finally:
+        sampler.close()
+
+    expected = reference_values(path, lonlat)
+    assert np.isnan(expected).any() and np.isfinite(expected).any()
+    np.testing.assert_array_equal(values, expected)
+
+
+def test_block_sampler_reprojects_lonlat(tmp_path):
+    path = tmp_path / 'pvout.tif'
+    write_raster(path, 'EPSG:3116', from_origin(1000000.0, 1100000.0, 100.0, 100.0))
+
+    to_lonlat = get_transformer('EPSG:3116', WGS84)
+    rng = np.random.default_rng(1)
+    x = rng.uniform(999000.0, 1008000.0, 1000)
+    y = rng.uniform(1094000.0, 1101000.0, 1000)
+    lonlat = np.column_stack(to_lonlat.transform(x, y))
+
+    sampler = BlockSampler(str(path))
+    try:
+        values = sampler.sample(lonlat)
+    finally:
+        sampler.close()
+
+    # Mismos puntos de vuelta en EPSG:3116 para la referencia
+    xy = np.column_stack(get_transformer(WGS84, 'EPSG:3116').transform(lonlat[:, 0], lonlat[:, 1]))
+    np.testing.assert_array_equal(values, reference_values(path, xy))
@@ -0,0 +1,33 @@
+"""
+Pruebas de métricas de vecindad (src/preprocessing/neighbour_density.py)
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import numpy as np
+
+from src.preprocessing.neighbour_density import neighbour_metrics
+
+
+def test_coincident_centroids_are_nearest_neighbours():
+    xy = np.array([[0.0, 0.0], [0.0, 0.0], [10.0, 0.0], [500.0, 500.0]])
+    counts, nearest = neighbour_metrics(xy, np.arange(4), radii_m=(25.0, 100.0))
+
+    assert counts[:, 0].tolist() == [2, 2, 2, 0]
+    assert nearest[:3].tolist() == [0.0, 0.0, 10.0]
+    assert np.isnan(nearest[3])
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(0, 300, size=(400, 2))
+    targets = np.arange(0, 400, 3)
+    counts, nearest = neighbour_metrics(xy, targets, radii_m=(25.0, 50.0), batch_size=50)
+
+    dist = np.hypot(*(xy[targets, None, :] - xy[None, :, :]).transpose(2, 0, 1))
+    dist[np.arange(len(targets)), targets] = np.inf
+    assert counts[:, 0].tolist() == (dist <= 25.0).sum(axis=1).tolist()
+    assert counts[:, 1].tolist() == (dist <= 50.0).sum(axis=1).tolist()
+    expected = np.where(dist.min(axis=1) <= 50.0, dist.min(axis=1), np.nan)
+    np.testing.assert_allclose(nearest, expected)
@@ -0,0 +1,39 @@
+"""
+Pruebas de sketches de área (src/analysis/size_distribution.py)
+
+Autor: Equipo PDET Solar Analysis
+Fecha: Octubre 2026
+"""
+
+import numpy as np
+
+from src.analysis.size_distribution import SKETCH_EDGES, area_sketch, merge_sketches, sketch_quantiles
+
+
+def sketch_of(areas):
+    """Sketch de un arreglo de áreas, como lo devolvería $bucket"""
+    edges = np.asarray(SKETCH_EDGES)
+    index = np.searchsorted(edges, areas, side='right') - 1
+    buckets = [
+        {'_id': SKETCH_EDGES[i] if 0 <= i < len(edges) - 1 else 'fuera_de_rango', 'count': 1}
+        for i in index
+    ]
+    return area_sketch(buckets)
+
+
+def test_merged_sketch_equals_sketch_of_union():
+    rng = np.random.default_rng(0)
+    small = rng.lognormal(3.0, 0.5, 3000)
+    large = rng.lognormal(5.0, 0.7, 1000)
+
+    merged = merge_sketches(sketch_of(small), None, sketch_of(large))
+    union = sketch_of(np.concatenate([small, large]))
+
+    assert merged == union
+    assert sketch_quantiles(merged) == sketch_quantiles(union)
+
+
+def test_merge_without_sketches():
+    assert merge_sketches() is None
+    assert merge_sketches(None, {}) is None
+    assert all(value is None for value in sketch_quantiles(merge_sketches(None)).values())